@@ -0,0 +1,77 @@
+"""Latency of adaptive quiz selection with many questions and sessions.
+
+Loads the in-memory question index with synthetic ``(id, category,
+difficulty)`` rows, then plays ``--sessions`` games interleaved round-robin,
+as if they were concurrent. Every pick goes through
+``QuestionIndex.adaptive_unseen`` with the session's history and a random
+answer record, the same work POST /quizzes does per request apart from
+loading the question row. ``--threads`` runs the sessions on several
+threads at once.
+
+    python benchmarks/bench_adaptive.py --questions 1000000 --sessions 5000
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flaskr.question_index import QuestionIndex
+
+
+def play(index, sessions, rounds, categories, seed, latencies):
+    rng = random.Random(seed)
+    games = [(rng.randint(0, categories), [], []) for _ in range(sessions)]
+    local = []
+    for _ in range(rounds):
+        for category_id, previous_questions, recent_answers in games:
+            started = time.perf_counter()
+            question_id = index.adaptive_unseen(category_id, previous_questions, recent_answers)
+            local.append(time.perf_counter() - started)
+            if question_id is not None:
+                previous_questions.append(question_id)
+                recent_answers.append(rng.random() < 0.6)
+    latencies.extend(local)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=1000000)
+    parser.add_argument('--categories', type=int, default=6)
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=20, help='questions per game')
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    index = QuestionIndex()
+    started = time.perf_counter()
+    index.load((i, rng.randint(1, args.categories), rng.randint(1, 5)) for i in range(1, args.questions + 1))
+    print(f"index of {args.questions} questions built in {time.perf_counter() - started:.2f} s")
+
+    latencies = []
+    per_thread = max(args.sessions // args.threads, 1)
+    threads = [threading.Thread(target=play, args=(index, per_thread, args.rounds, args.categories, seed, latencies))
+               for seed in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1e6
+
+    print(f"{len(latencies)} picks for {per_thread * args.threads} sessions on {args.threads} thread(s): "
+          f"{len(latencies) / elapsed:.0f} picks/s")
+    print(f"p50 {percentile(0.50):.1f} us   p99 {percentile(0.99):.1f} us   max {latencies[-1] * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""One client flooding POST /questions/search while others play normally.
+
+``--flood-threads`` threads send searches as fast as they can, all as one
+client; ``--players`` other clients each send a search and a quiz request
+every ``--think-time`` seconds. Clients are told apart by
+``X-Forwarded-For``, so start the server with
+``RATE_LIMIT_CLIENT_HEADER=X-Forwarded-For``. Run it once with the limits
+and once with ``RATE_LIMITS=off MAX_CONCURRENT_REQUESTS=0`` to compare
+the latency the players see. Prints status counts and p50/p99 per class and
+the server's admission counters.
+
+    RATE_LIMIT_CLIENT_HEADER=X-Forwarded-For gunicorn -c gunicorn.conf.py
+    python benchmarks/bench_admission.py --url http://localhost:5000 --seconds 20
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+class Client:
+
+    def __init__(self, base_url, address):
+        url = urlsplit(base_url)
+        self.connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        self.headers = {'Content-Type': 'application/json', 'X-Forwarded-For': address}
+
+    def post(self, path, body):
+        started = time.perf_counter()
+        try:
+            self.connection.request('POST', path, body=json.dumps(body), headers=self.headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (ConnectionError, http.client.HTTPException):
+            # The server may close an idle keep-alive connection, reconnect on the next request
+            self.connection.close()
+            return 'error', time.perf_counter() - started
+        return response.status, time.perf_counter() - started
+
+
+def run(base_url, address, deadline, think_time, results, lock, quiz=False):
+    client = Client(base_url, address)
+    statuses, latencies = Counter(), []
+    while time.monotonic() < deadline:
+        status, latency = client.post('/questions/search', {'searchTerm': 'e'})
+        statuses[status] += 1
+        latencies.append(latency)
+        if quiz:
+            status, latency = client.post('/quizzes', {'previous_questions': [], 'quiz_category': {'id': 0}})
+            statuses[status] += 1
+            latencies.append(latency)
+        if think_time:
+            time.sleep(think_time)
+    with lock:
+        results['statuses'].update(statuses)
+        results['latencies'].extend(latencies)
+
+
+def report(name, results, seconds):
+    latencies = sorted(results['latencies'])
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0.0
+
+    statuses = ' '.join(f'{status}:{count}' for status, count in sorted(results['statuses'].items(), key=str))
+    print(f"{name:>8} {len(latencies) / seconds:>10.1f} {percentile(0.5):>9.1f} {percentile(0.99):>9.1f}   {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--flood-threads', type=int, default=16)
+    parser.add_argument('--players', type=int, default=20)
+    parser.add_argument('--think-time', type=float, default=0.5)
+    args = parser.parse_args()
+
+    lock = threading.Lock()
+    flood = {'statuses': Counter(), 'latencies': []}
+    players = {'statuses': Counter(), 'latencies': []}
+    deadline = time.monotonic() + args.seconds
+    threads = [threading.Thread(target=run, args=(args.url, '10.0.0.1', deadline, 0, flood, lock))
+               for _ in range(args.flood_threads)]
+    threads += [threading.Thread(target=run, args=(args.url, f'10.1.0.{i}', deadline, args.think_time,
+                                                   players, lock, True))
+                for i in range(1, args.players + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"{'client':>8} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}   statuses")
+    report('flood', flood, args.seconds)
+    report('players', players, args.seconds)
+
+    url = urlsplit(args.url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    connection.request('GET', '/admission/stats')
+    stats = json.loads(connection.getresponse().read())
+    print('\nadmission (this worker): ' + ' '.join(f'{name}={value}' for name, value in sorted(stats.items())
+                                               if name != 'success'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Server-side answer checking: precomputed normalized answers vs. normalizing per check.
+
+Loads ``--questions`` generated questions, then times checking guesses
+(right, with a typo, wrong) against the stored normalized answer with the
+bounded edit distance, and against normalizing both sides on every check
+with a full Levenshtein matrix. Finally ``POST /quizzes/answers`` is called
+``--requests`` times from ``--clients`` threads through the app.
+
+    python benchmarks/bench_answers.py --questions 100000
+    python benchmarks/bench_answers.py --database-url postgresql://...
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.suite import dataset  # noqa: E402
+from flaskr.answers import check_answer, max_edits, normalize_answer  # noqa: E402
+from models import Question, db  # noqa: E402
+
+
+def levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        previous = current
+    return previous[-1]
+
+
+def naive_check(guess, answer):
+    expected = normalize_answer(answer)
+    return levenshtein(normalize_answer(guess), expected) <= max_edits(expected)
+
+
+def typo(rng, text):
+    position = rng.randrange(len(text))
+    return text[:position] + rng.choice('aeiou') + text[position + 1:]
+
+
+def guesses(rng, answers, count):
+    """``(answer, normalized, guess)``: a third right (case and articles changed), a third with a typo, a third wrong."""
+    cases = []
+    for _ in range(count):
+        answer, normalized = rng.choice(answers)
+        kind = rng.randrange(3)
+        if kind == 0:
+            guess = 'The ' + answer.upper()
+        elif kind == 1:
+            guess = typo(rng, answer)
+        else:
+            guess = rng.choice(answers)[0]
+        cases.append((answer, normalized, guess))
+    return cases
+
+
+def time_checks(cases, check):
+    started = time.perf_counter()
+    correct = sum(check(*case) for case in cases)
+    return (time.perf_counter() - started) / len(cases) * 1e6, correct
+
+
+def call_endpoint(app, question_ids, requests, clients):
+    latencies, lock = [], threading.Lock()
+
+    def client(count, seed):
+        rng, test_client, local = random.Random(seed), app.test_client(), []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = test_client.post('/quizzes/answers', json={
+                'question_id': rng.choice(question_ids), 'answer': 'a guess'})
+            local.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.status_code
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(requests // clients, i)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / seconds, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100000)
+    parser.add_argument('--checks', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    rows, seconds = dataset.load(database_url, args.questions, 20)
+    print(f'loaded {rows} questions with normalized answers in {seconds:.1f} s')
+
+    os.environ['DATABASE_URL'] = database_url
+    from flaskr import create_app
+    app = create_app({'RATE_LIMITS': 'off', 'MAX_CONCURRENT_REQUESTS': 0})
+    with app.app_context():
+        answers = db.session.query(Question.answer, Question.answer_normalized).limit(10000).all()
+        question_ids = [question_id for question_id, in db.session.query(Question.id).limit(10000)]
+
+    cases = guesses(random.Random(1), answers, args.checks)
+    precomputed, correct = time_checks(cases, lambda answer, normalized, guess: check_answer(guess, normalized))
+    naive, naive_correct = time_checks(cases, lambda answer, normalized, guess: naive_check(guess, answer))
+    assert correct == naive_correct, (correct, naive_correct)
+    print(f"{'check':<42} {'us/check':>9} {'checks/s':>12}")
+    for label, micros in (('precomputed + bounded edit distance', precomputed),
+                          ('normalize both + full Levenshtein', naive)):
+        print(f'{label:<42} {micros:>9.2f} {1e6 / micros:>12,.0f}')
+    print(f'{correct / len(cases):.0%} of the guesses accepted')
+
+    throughput, p50, p99 = call_endpoint(app, question_ids, args.requests, args.clients)
+    print(f'POST /quizzes/answers: {throughput:,.0f} req/s, p50 {p50:.2f} ms, p99 {p99:.2f} ms '
+          f'({args.clients} clients, in-process)')
+    app.extensions['scores'].stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Throughput of the bulk question import and the streaming export.
+
+Imports N generated NDJSON rows with several chunk sizes, then streams them
+back out through the export generator.
+
+    python benchmarks/bench_bulk.py --rows 50000 --chunk-sizes 100 1000 10000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from flaskr.bulk import export_questions, import_questions, parse_ndjson
+from models import setup_db, Question, Category, db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = Flask(__name__)
+    app.config['AUTO_MIGRATE'] = True
+    setup_db(app, database_url)
+    lines = [json.dumps({'question': f'Bulk question {i}?', 'answer': f'Answer {i}', 'category': 1, 'difficulty': i % 5 + 1})
+             for i in range(args.rows)]
+
+    with app.app_context():
+        db.session.query(Question).delete()
+        db.session.query(Category).delete()
+        db.session.add(Category(type='Science'))
+        db.session.commit()
+        categories = {category.id: category.type for category in Category.query}
+
+        print(f"{'chunk size':>10} {'rows/s':>12}")
+        for chunk_size in args.chunk_sizes:
+            db.session.query(Question).delete()
+            db.session.commit()
+            started = time.perf_counter()
+            import_questions(parse_ndjson(lines), categories, chunk_size)
+            print(f"{chunk_size:>10} {args.rows / (time.perf_counter() - started):>12.0f}")
+
+        started = time.perf_counter()
+        exported = sum(chunk.count('\n') for chunk in export_questions())
+        print(f"{'export':>10} {exported / (time.perf_counter() - started):>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Cold start of one process: import time, ``create_app()`` and the first request.
+
+Starts ``--runs`` fresh interpreters and times each phase: the bare
+interpreter, ``import flaskr``, ``create_app()`` and a first
+``GET /categories`` (which creates the engine and imports the driver).
+Then runs once more under ``python -X importtime`` and lists the ``--top``
+modules by cumulative import time. Exits with status 1 when the median of
+import plus ``create_app()`` exceeds ``--budget-ms``.
+
+    python benchmarks/bench_coldstart.py --runs 10 --top 15 --budget-ms 1000
+    python benchmarks/bench_coldstart.py --database-url postgresql://...
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+PHASES = ('interpreter', 'import flaskr', 'create_app()', 'first request')
+
+STARTUP = """
+import json, time
+started = time.perf_counter()
+import flaskr
+imported = time.perf_counter()
+app = flaskr.create_app()
+created = time.perf_counter()
+status = app.test_client().get('/categories').status_code
+answered = time.perf_counter()
+app.extensions['scores'].stop()
+print(json.dumps({'import flaskr': imported - started, 'create_app()': created - imported,
+                  'first request': answered - created, 'status': status}))
+"""
+
+
+def seed(database_url):
+    """Schema plus one category, so the first request has something to return."""
+    from flask import Flask
+    from models import setup_db, Category, db
+
+    app = Flask(__name__)
+    app.config['AUTO_MIGRATE'] = True
+    setup_db(app, database_url)
+    with app.app_context():
+        if db.session.query(Category.id).first() is None:
+            db.session.add(Category(type='Science'))
+            db.session.commit()
+        db.engine.dispose()
+
+
+def run(env, *options, code=STARTUP):
+    result = subprocess.run([sys.executable, *options, '-c', code], env=env, cwd=BACKEND,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return result
+
+
+def interpreter_time(env):
+    started = time.perf_counter()
+    run(env, code='pass')
+    return time.perf_counter() - started
+
+
+def slowest_imports(stderr, top):
+    """``(self_us, cumulative_us, module)`` of the ``top`` modules by cumulative time."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(own), int(cumulative), name.rstrip()))
+    return sorted(modules, key=lambda module: -module[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=1000)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    seed(database_url)
+    env = dict(os.environ, DATABASE_URL=database_url)
+    env.pop('AUTO_MIGRATE', None)
+
+    timings = {phase: [] for phase in PHASES}
+    for _ in range(args.runs):
+        timings['interpreter'].append(interpreter_time(env))
+        phases = json.loads(run(env).stdout)
+        if phases.pop('status') != 200:
+            raise RuntimeError('GET /categories failed, is the database reachable?')
+        for phase, seconds in phases.items():
+            timings[phase].append(seconds)
+
+    print(f"{'phase':<16} {'min ms':>8} {'median ms':>10} {'max ms':>8}")
+    for phase in PHASES:
+        values = [seconds * 1000 for seconds in timings[phase]]
+        print(f'{phase:<16} {min(values):>8.1f} {statistics.median(values):>10.1f} {max(values):>8.1f}')
+
+    print(f"\n{'self ms':>8} {'cumul. ms':>10}  module (python -X importtime)")
+    for own, cumulative, name in slowest_imports(run(env, '-X', 'importtime').stderr, args.top):
+        print(f'{own / 1000:>8.1f} {cumulative / 1000:>10.1f}  {name}')
+
+    startup = statistics.median(imported + created for imported, created
+                                in zip(timings['import flaskr'], timings['create_app()'])) * 1000
+    print(f'\nimport + create_app(): {startup:.1f} ms (budget {args.budget_ms:.0f} ms)')
+    if startup > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
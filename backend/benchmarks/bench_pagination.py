@@ -0,0 +1,77 @@
+"""Page latency of the pagination engine as the questions table grows.
+
+Seeds a throwaway database with N questions and times ``paginate_questions``
+plus ``count_questions`` for the first, a middle and the last page, both with
+OFFSET paging and with the ``after_id`` keyset cursor.
+
+    python benchmarks/bench_pagination.py --sizes 1000 10000 100000
+    python benchmarks/bench_pagination.py --database-url postgresql://...
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, request
+from sqlalchemy import insert
+
+from flaskr import QUESTIONS_PER_PAGE, paginate_questions, count_questions
+from models import setup_db, Question, Category, db
+
+
+def seed(size, categories=6):
+    db.session.query(Question).delete()
+    db.session.query(Category).delete()
+    db.session.execute(insert(Category), [{'id': i, 'type': f'cat {i}'} for i in range(1, categories + 1)])
+    rows = [
+        {'question': f'Question number {i}?', 'answer': f'Answer {i}',
+         'category': i % categories + 1, 'difficulty': i % 5 + 1}
+        for i in range(size)
+    ]
+    for start in range(0, size, 10000):
+        db.session.execute(insert(Question), rows[start:start + 10000])
+    db.session.commit()
+
+
+def time_page(app, query_string, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        with app.test_request_context(f'/questions?{query_string}'):
+            started = time.perf_counter()
+            selection = Question.query
+            paginate_questions(request, selection)
+            count_questions(selection)
+            best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = Flask(__name__)
+    app.config['AUTO_MIGRATE'] = True
+    setup_db(app, database_url)
+
+    print(f"{'rows':>10} {'page 1':>10} {'middle':>10} {'last':>10} {'cursor':>10}   (ms, best of {args.repeat})")
+    with app.app_context():
+        for size in args.sizes:
+            seed(size)
+            last_page = max(size // QUESTIONS_PER_PAGE, 1)
+            last_id = db.session.query(db.func.max(Question.id)).scalar() - QUESTIONS_PER_PAGE
+            print(f"{size:>10} "
+                  f"{time_page(app, 'page=1', args.repeat):>10.3f} "
+                  f"{time_page(app, f'page={last_page // 2}', args.repeat):>10.3f} "
+                  f"{time_page(app, f'page={last_page}', args.repeat):>10.3f} "
+                  f"{time_page(app, f'after_id={last_id}', args.repeat):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
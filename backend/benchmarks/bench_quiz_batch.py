@@ -0,0 +1,92 @@
+"""Requests and time per quiz game, one call per question vs. batch prefetch.
+
+Plays ``--games`` games of ``--questions-per-game`` questions against a
+running server twice: once the old way, one POST /quizzes per question with
+a growing history, and once with a single POST /quizzes/batch per game.
+``--concurrency`` clients play at the same time, each on its own
+keep-alive connection.
+
+    RATE_LIMITS=off MAX_CONCURRENT_REQUESTS=0 gunicorn -c gunicorn.conf.py
+    python benchmarks/bench_quiz_batch.py --url http://localhost:5000 --games 5000 --concurrency 50
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class HttpClient:
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+
+    def post(self, path, body):
+        self.connection.request('POST', path, body=json.dumps(body), headers={'Content-Type': 'application/json'})
+        response = self.connection.getresponse()
+        return json.loads(response.read())
+
+
+def play_single(client, questions_per_game):
+    previous_questions, requests = [], 0
+    while len(previous_questions) < questions_per_game:
+        requests += 1
+        question = client.post('/quizzes', {'previous_questions': previous_questions,
+                                            'quiz_category': {'id': 0, 'type': 'All'}})['question']
+        if question is None:
+            break
+        previous_questions.append(question['id'])
+    return requests
+
+
+def play_batch(client, questions_per_game):
+    questions = client.post('/quizzes/batch', {'previous_questions': [], 'quiz_category': {'id': 0, 'type': 'All'},
+                                               'count': questions_per_game})['questions']
+    assert len({question['id'] for question in questions}) == len(questions)
+    return 1
+
+
+def run(base_url, play, games, questions_per_game, concurrency):
+    requests, durations = [], []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = HttpClient(base_url)
+        local_requests, local_durations = 0, []
+        for _ in range(count):
+            started = time.perf_counter()
+            local_requests += play(client, questions_per_game)
+            local_durations.append(time.perf_counter() - started)
+        with lock:
+            requests.append(local_requests)
+            durations.extend(local_durations)
+
+    threads = [threading.Thread(target=worker, args=(games // concurrency,)) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return sum(requests) / len(durations), len(durations) / elapsed, sum(durations) / len(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--questions-per-game', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--url', default='http://localhost:5000')
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'requests/game':>14} {'games/s':>10} {'ms/game':>10}   (ms/game: network time spent fetching questions)")
+    for name, play in (('single', play_single), ('batch', play_batch)):
+        requests, games_per_second, ms_per_game = run(
+            args.url, play, args.games, args.questions_per_game, args.concurrency)
+        print(f"{name:>8} {requests:>14.1f} {games_per_second:>10.1f} {ms_per_game:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Cost of picking a random unseen quiz question as the player history grows.
+
+Works directly on the in-memory id index used by POST /quizzes, so no
+database is needed. Timings include turning ``previous_questions`` into a
+set, which is linear in the history the client sends on every request.
+
+    python benchmarks/bench_quiz_selection.py --questions 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flaskr.question_index import IdSet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100000)
+    parser.add_argument('--history', type=int, nargs='+', default=[0, 10, 100, 500, 1000])
+    parser.add_argument('--picks', type=int, default=10000)
+    args = parser.parse_args()
+
+    ids = IdSet(range(1, args.questions + 1))
+    print(f"{'history':>10} {'us/pick':>10}")
+    for history in args.history:
+        previous_questions = random.sample(ids.items, history)
+        started = time.perf_counter()
+        for _ in range(args.picks):
+            ids.choice_excluding(set(previous_questions))
+        elapsed = time.perf_counter() - started
+        print(f"{history:>10} {elapsed / args.picks * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Live rooms under load: thousands of event streams on one ASGI process.
+
+Starts one uvicorn worker (or uses ``--url``), creates a room, opens
+``--connections`` event streams and lets ``--players`` of them join and
+answer every question. For each broadcast the host sends, it measures how
+long it takes until every stream has received the event, plus the server's
+memory per connection.
+
+    python benchmarks/bench_rooms.py --database-url sqlite:///bench.db --connections 5000
+    python benchmarks/bench_rooms.py --url http://localhost:5001 --connections 2000
+
+The database needs questions, e.g. from ``python -m benchmarks.suite generate``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONNECT_BATCH = 500
+
+
+async def request(host, port, method, path, body=None):
+    reader, writer = await asyncio.open_connection(host, port)
+    payload = json.dumps(body).encode() if body is not None else b''
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode() + payload)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, content = data.partition(b'\r\n\r\n')
+    return int(head.split(b' ', 2)[1]), json.loads(content) if content else None
+
+
+class Stream:
+
+    def __init__(self):
+        self.arrivals = []
+        self.writer = None
+
+    async def open(self, host, port, code):
+        reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.write(f'GET /rooms/{code}/events HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+        await self.writer.drain()
+        await reader.readuntil(b'\r\n\r\n')
+        return reader
+
+    async def listen(self, reader, received):
+        # Chunk-size lines of the chunked encoding never start with "event: "
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b'event: '):
+                event = line[7:].strip().decode()
+                self.arrivals.append((event, time.perf_counter()))
+                received(event)
+                if event == 'finished':
+                    self.writer.close()
+                    return
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url, port):
+    env = dict(os.environ, DATABASE_URL=database_url, RATE_LIMITS='off', MAX_CONCURRENT_REQUESTS='0')
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', '--factory', 'flaskr.asgi:create_asgi_app',
+                               '--port', str(port), '--log-level', 'warning', '--backlog', '4096'],
+                              cwd=BACKEND, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('uvicorn did not start')
+
+
+def rss_mb(pid):
+    if pid is None:
+        return None
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] * 1000
+
+
+async def run(host, port, connections, players, questions, pid):
+    status, room = await request(host, port, 'POST', '/rooms',
+                                 {'quiz_category': {'id': 0, 'type': 'All'}, 'questions': questions})
+    if status != 201:
+        raise RuntimeError(f'POST /rooms returned {status}, is there data in the database?')
+    code, host_token = room['code'], room['host_token']
+    joined = await asyncio.gather(*(request(host, port, 'POST', f'/rooms/{code}/players', {'player': f'p{i}'})
+                                    for i in range(players)))
+    tokens = [body['player_token'] for status, body in joined]
+
+    memory_before = rss_mb(pid)
+    counts, waiting = {}, {}
+
+    def received(event):
+        counts[event] = counts.get(event, 0) + 1
+        if counts[event] == connections and event in waiting:
+            waiting.pop(event).set()
+
+    streams = [Stream() for _ in range(connections)]
+    started = time.perf_counter()
+    readers = []
+    for offset in range(0, connections, CONNECT_BATCH):
+        readers += await asyncio.gather(*(stream.open(host, port, code)
+                                          for stream in streams[offset:offset + CONNECT_BATCH]))
+    listeners = [asyncio.ensure_future(stream.listen(reader, received)) for stream, reader in zip(streams, readers)]
+    connect_seconds = time.perf_counter() - started
+    while counts.get('state', 0) < connections:
+        await asyncio.sleep(0.01)
+    memory_after = rss_mb(pid)
+    print(f'{connections} streams open in {connect_seconds:.2f} s', end='')
+    if memory_before is not None:
+        print(f', server RSS {memory_before:.0f} -> {memory_after:.0f} MB '
+              f'({(memory_after - memory_before) * 1024 / connections:.1f} KB per connection)')
+    else:
+        print()
+
+    fanout, answer_seconds = {'question': [], 'results': [], 'finished': []}, []
+    for index in range(questions + 1):
+        for event in ('question', 'results') if index < questions else ('finished',):
+            if event == 'results' and tokens:
+                started = time.perf_counter()
+                await asyncio.gather(*(request(host, port, 'POST', f'/rooms/{code}/answers',
+                                               {'player_token': token, 'answer': 'a guess'}) for token in tokens))
+                answer_seconds.append(time.perf_counter() - started)
+            done = waiting[event] = asyncio.Event()
+            counts[event] = 0
+            sent = time.perf_counter()
+            await request(host, port, 'POST', f'/rooms/{code}/next', {'host_token': host_token})
+            await asyncio.wait_for(done.wait(), 60)
+            # Arrival of this event on every stream, relative to the host's request
+            fanout[event].extend(arrival - sent for stream in streams
+                                 for name, arrival in stream.arrivals[-1:] if name == event)
+    await asyncio.gather(*listeners)
+
+    print(f"{'event':<10} {'streams':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for event, latencies in fanout.items():
+        if latencies:
+            print(f'{event:<10} {len(latencies):>8} {percentile(latencies, 0.5):>8.1f} '
+                  f'{percentile(latencies, 0.99):>8.1f} {max(latencies) * 1000:>8.1f}')
+    if answer_seconds:
+        print(f'{players} answers per question in {sum(answer_seconds) / len(answer_seconds) * 1000:.0f} ms '
+              f'({players * len(answer_seconds) / sum(answer_seconds):,.0f} answers/s)')
+    status, stats = await request(host, port, 'GET', '/rooms/stats')
+    print(f"broadcasts {stats['broadcasts']}, deliveries {stats['deliveries']}, dropped {stats['dropped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                        help='start a uvicorn worker against this database')
+    parser.add_argument('--url', help='use a running ASGI server instead')
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--players', type=int, default=200, help='streams that also join and answer')
+    parser.add_argument('--questions', type=int, default=5)
+    args = parser.parse_args()
+    if not args.url and not args.database_url:
+        parser.error('needs --database-url or --url')
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        server = start_server(args.database_url, port)
+    try:
+        asyncio.run(run(host, port, args.connections, args.players, args.questions,
+                        server.pid if server else None))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Score ingestion and leaderboard reads, per-row commits vs. the buffered pipeline.
+
+Writes ``--scores`` scores once with a commit per score (the way
+``Question.insert`` writes) and once through ``ScorePipeline`` with its
+background flush, then compares reading the top 10 of a category with
+``ORDER BY ... LIMIT`` against the in-memory leaderboard.
+
+    python benchmarks/bench_scores.py --scores 20000
+    python benchmarks/bench_scores.py --database-url postgresql://...
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from flaskr.scores import ScorePipeline
+from models import setup_db, Score, db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scores', type=int, default=20000)
+    parser.add_argument('--categories', type=int, default=6)
+    parser.add_argument('--reads', type=int, default=1000)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = Flask(__name__)
+    app.config['AUTO_MIGRATE'] = True
+    setup_db(app, database_url)
+    rng = random.Random(0)
+    games = [(f'player{rng.randint(1, 5000)}', rng.randint(0, args.categories), rng.randint(0, 5))
+             for _ in range(args.scores)]
+
+    with app.app_context():
+        db.session.query(Score).delete()
+        db.session.commit()
+        started = time.perf_counter()
+        for player, category_id, score in games:
+            db.session.add(Score(player=player, category=category_id, score=score, created_at=time.time()))
+            db.session.commit()
+        per_row = time.perf_counter() - started
+        db.session.query(Score).delete()
+        db.session.commit()
+
+    pipeline = ScorePipeline(app)
+    started = time.perf_counter()
+    for player, category_id, score in games:
+        pipeline.submit(player, category_id, score)
+    accepted = time.perf_counter() - started
+    pipeline.stop()
+    buffered = time.perf_counter() - started
+
+    print(f"{'writes':>24} {'scores/s':>12} {'total s':>10}")
+    print(f"{'commit per score':>24} {args.scores / per_row:>12.0f} {per_row:>10.2f}")
+    print(f"{'pipeline, accepted':>24} {args.scores / accepted:>12.0f} {accepted:>10.2f}")
+    print(f"{'pipeline, written':>24} {args.scores / buffered:>12.0f} {buffered:>10.2f}")
+
+    with app.app_context():
+        started = time.perf_counter()
+        for i in range(args.reads):
+            Score.query.filter(Score.category == i % (args.categories + 1)) \
+                .order_by(Score.score.desc(), Score.created_at).limit(10).all()
+        order_by = (time.perf_counter() - started) / args.reads
+    started = time.perf_counter()
+    for i in range(args.reads):
+        pipeline.top(i % (args.categories + 1), 10)
+    in_memory = (time.perf_counter() - started) / args.reads
+
+    print(f"\n{'top 10 read':>24} {'us/read':>12}")
+    print(f"{'ORDER BY ... LIMIT':>24} {order_by * 1e6:>12.1f}")
+    print(f"{'in-memory leaderboard':>24} {in_memory * 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
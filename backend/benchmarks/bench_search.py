@@ -0,0 +1,84 @@
+"""Compare ILIKE search with the indexed search modes as the table grows.
+
+Seeds N questions built from a random vocabulary and times the search
+modes of ``flaskr.search`` for a handful of terms. ``fulltext`` is only
+run against PostgreSQL.
+
+    python benchmarks/bench_search.py --sizes 10000 100000 1000000
+    python benchmarks/bench_search.py --database-url postgresql://...
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, request
+from sqlalchemy import insert
+
+from flaskr.search import create_search
+from models import setup_db, Question, Category, db
+
+TERMS = ['title', 'wor', 'river capital', 'zzz']
+
+
+def seed(size, rng):
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+                  for _ in range(5000)] + ['title', 'world', 'river', 'capital']
+    db.session.query(Question).delete()
+    db.session.query(Category).delete()
+    db.session.execute(insert(Category), [{'id': 1, 'type': 'Science'}])
+    for start in range(0, size, 10000):
+        db.session.execute(insert(Question), [
+            {'question': ' '.join(rng.choices(vocabulary, k=8)) + '?',
+             'answer': ' '.join(rng.choices(vocabulary, k=2)),
+             'category': 1, 'difficulty': 1}
+            for _ in range(start, min(start + 10000, size))
+        ])
+    db.session.commit()
+
+
+def time_search(app, search, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for term in TERMS:
+            with app.test_request_context('/questions/search'):
+                search.search(request, term)
+        best = min(best, time.perf_counter() - started)
+    return best / len(TERMS) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = Flask(__name__)
+    app.config['AUTO_MIGRATE'] = True
+    setup_db(app, database_url)
+    modes = ['like', 'memory'] + (['fulltext'] if database_url.startswith('postgres') else [])
+
+    print(f"{'rows':>10} " + ' '.join(f"{mode:>10}" for mode in modes) + f"   (ms per search, best of {args.repeat})")
+    with app.app_context():
+        for size in args.sizes:
+            seed(size, random.Random(size))
+            if database_url.startswith('postgres'):
+                db.session.execute(db.text('ANALYZE questions'))
+            timings = []
+            for mode in modes:
+                search = create_search(app, mode)
+                if mode == 'memory':
+                    search.ranked_ids('warm up the index')
+                timings.append(time_search(app, search, args.repeat))
+            print(f"{size:>10} " + ' '.join(f"{timing:>10.3f}" for timing in timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Cost of turning N questions into a JSON response body.
+
+Compares the old path (ORM objects, ``Question.format()`` and the standard
+library encoder) with the fast path (column tuples from ``QUESTION_COLUMNS``
+and the orjson encoder). Loading and encoding are timed separately.
+
+    python benchmarks/bench_serialization.py --sizes 10 1000 100000
+    python benchmarks/bench_serialization.py --database-url postgresql://...
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+
+from flaskr.encoding import get_encoder, orjson
+from models import QUESTION_COLUMNS, setup_db, Question, Category, db, question_dict
+
+
+def seed(size, categories=6):
+    db.session.query(Question).delete()
+    db.session.query(Category).delete()
+    db.session.execute(insert(Category), [{'id': i, 'type': f'cat {i}'} for i in range(1, categories + 1)])
+    rows = [
+        {'question': f'Question number {i}?', 'answer': f'Answer {i}',
+         'category': i % categories + 1, 'difficulty': i % 5 + 1}
+        for i in range(size)
+    ]
+    for start in range(0, size, 10000):
+        db.session.execute(insert(Question), rows[start:start + 10000])
+    db.session.commit()
+
+
+def load_objects(size):
+    return [question.format() for question in Question.query.order_by(Question.id).limit(size)]
+
+
+def load_tuples(size):
+    return [question_dict(row) for row in db.session.query(*QUESTION_COLUMNS).order_by(Question.id).limit(size)]
+
+
+def best_of(repeat, function, *args):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = Flask(__name__)
+    app.config['AUTO_MIGRATE'] = True
+    setup_db(app, database_url)
+
+    stdlib = get_encoder('stdlib')
+    fast = get_encoder('orjson' if orjson is not None else 'stdlib')
+    if orjson is None:
+        print('orjson is not installed, the fast path uses the standard library encoder')
+
+    print(f"{'rows':>10} {'orm load':>10} {'stdlib':>10} {'total':>10} "
+          f"{'row load':>10} {'orjson':>10} {'total':>10} {'speedup':>8}   (ms, best of {args.repeat})")
+    with app.app_context():
+        seed(max(args.sizes))
+        for size in args.sizes:
+            orm_load, questions = best_of(args.repeat, load_objects, size)
+            orm_encode, _ = best_of(args.repeat, stdlib, {'questions': questions, 'success': True})
+            row_load, questions = best_of(args.repeat, load_tuples, size)
+            row_encode, _ = best_of(args.repeat, fast, {'questions': questions, 'success': True})
+            old, new = orm_load + orm_encode, row_load + row_encode
+            print(f"{size:>10} {orm_load:>10.3f} {orm_encode:>10.3f} {old:>10.3f} "
+                  f"{row_load:>10.3f} {row_encode:>10.3f} {new:>10.3f} {old / new:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
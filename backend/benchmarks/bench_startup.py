@@ -0,0 +1,149 @@
+"""Startup time and per-worker memory of the gunicorn launcher, with and without preloading.
+
+Seeds a SQLite database with ``--questions`` questions, then starts
+``gunicorn -c gunicorn.conf.py`` with ``--workers`` workers, once with
+``PRELOAD_APP=1`` (load in the master, fork) and once with ``PRELOAD_APP=0``
+(every worker loads on its own). Several workers need a shared cache
+store, ``--cache-store`` (a Redis server). Reports the time until the first response
+and until every worker is ready, and each worker's memory from
+``/proc/<pid>/smaps_rollup``: RSS, PSS (shared pages split between the
+processes mapping them) and USS (pages only this worker has). Linux only.
+
+    python benchmarks/bench_startup.py --questions 200000 --workers 4 --cache-store redis://localhost:6379/0
+    python benchmarks/bench_startup.py --database-url postgresql://...
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+
+def seed(database_url, questions, categories):
+    from flask import Flask
+    from models import setup_db, Category, Question, db
+
+    app = Flask(__name__)
+    app.config['AUTO_MIGRATE'] = True
+    setup_db(app, database_url)
+    rng = random.Random(0)
+    with app.app_context():
+        if db.session.query(Question.id).first() is not None:
+            return
+        db.session.add_all(Category(type=f'Category {i}') for i in range(1, categories + 1))
+        db.session.commit()
+        for start in range(0, questions, 10000):
+            db.session.execute(Question.__table__.insert(), [
+                {'question': f'Question number {i} about topic {rng.randint(1, 5000)}?',
+                 'answer': f'answer {rng.randint(1, 5000)}',
+                 'category': rng.randint(1, categories), 'difficulty': rng.randint(1, 5)}
+                for i in range(start, min(start + 10000, questions))])
+            db.session.commit()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def memory(pid):
+    """``(rss, pss, uss)`` of a process in MiB."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return values['Rss'], values['Pss'], values['Private_Clean'] + values['Private_Dirty']
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def launch(database_url, cache_store, workers, preload, requests):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, CACHE_STORE=cache_store, WEB_CONCURRENCY=str(workers),
+               PORT=str(port), PRELOAD_APP='1' if preload else '0',
+               SEARCH_MODE=os.environ.get('SEARCH_MODE', 'memory'))
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+                              cwd=BACKEND, env=env, stderr=subprocess.PIPE, text=True)
+    ready = []
+    all_ready = threading.Event()
+
+    def read_log():
+        for line in server.stderr:
+            if 'Worker ready' in line:
+                ready.append(time.perf_counter() - started)
+                if len(ready) == workers:
+                    all_ready.set()
+
+    threading.Thread(target=read_log, daemon=True).start()
+    first_response = None
+    try:
+        while first_response is None:
+            if server.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with {server.returncode}')
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/categories', timeout=5).read()
+                first_response = time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        if not all_ready.wait(120):
+            raise RuntimeError(f'only {len(ready)} of {workers} workers became ready')
+        # Traffic touches the loaded data, which is where copy-on-write copies pages
+        for i in range(requests):
+            path = ('/categories', f'/categories/{i % 6 + 1}/questions', '/questions?page=2')[i % 3]
+            urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=5).read()
+        for i in range(requests):
+            urllib.request.urlopen(urllib.request.Request(
+                f'http://127.0.0.1:{port}/questions/search', data=b'{"searchTerm": "topic 12"}',
+                headers={'Content-Type': 'application/json'}), timeout=5).read()
+        worker_memory = [memory(pid) for pid in children(server.pid)]
+        master_memory = memory(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+    return first_response, ready[-1], master_memory, worker_memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=200000)
+    parser.add_argument('--categories', type=int, default=6)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='requests sent before measuring memory')
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--cache-store', default=os.environ.get('CACHE_STORE', 'redis://localhost:6379/0'))
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    seed(database_url, args.questions, args.categories)
+
+    print(f"{'mode':>10} {'first resp s':>13} {'all ready s':>12} {'master RSS':>11} "
+          f"{'worker RSS':>11} {'worker PSS':>11} {'worker USS':>11} {'total PSS':>10}   (MiB)")
+    for name, preload in (('preload', True), ('no preload', False)):
+        first_response, all_ready, master, workers = launch(database_url, args.cache_store, args.workers, preload,
+                                                            args.requests)
+        rss, pss, uss = (sum(values) / len(workers) for values in zip(*workers))
+        total_pss = master[1] + sum(worker[1] for worker in workers)
+        print(f"{name:>10} {first_response:>13.2f} {all_ready:>12.2f} {master[0]:>11.1f} "
+              f"{rss:>11.1f} {pss:>11.1f} {uss:>11.1f} {total_pss:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Bytes on the wire and encode time of question lists per wire format.
+
+Encodes a list of N synthetic questions as keyed objects (the default) and
+in the columnar format, each uncompressed, gzip and, if the brotli package
+is installed, brotli. Times include JSON encoding and compression.
+
+    python benchmarks/bench_wire.py --sizes 10 100 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flaskr.compression import brotli, compress
+from flaskr.encoding import get_encoder, to_columnar
+
+WORDS = ('which', 'country', 'painted', 'planet', 'river', 'largest', 'first', 'invented', 'year',
+         'who', 'city', 'element', 'ocean', 'famous', 'novel', 'wrote', 'mountain', 'world')
+
+
+def make_payload(size, seed=0):
+    rng = random.Random(seed)
+    questions = [{
+        'id': i + 1,
+        'question': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 14))).capitalize() + '?',
+        'answer': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title(),
+        'category': rng.randint(1, 6),
+        'difficulty': rng.randint(1, 5),
+    } for i in range(size)]
+    return {'success': True, 'questions': questions, 'total_questions': size, 'current_category': None}
+
+
+def measure(repeat, encode, payload, encoding):
+    best, body = float('inf'), b''
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode(payload)
+        if encoding is not None:
+            body = compress(body, encoding)
+        best = min(best, time.perf_counter() - started)
+    return len(body), best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--encoder', default='auto', choices=['auto', 'orjson', 'stdlib'])
+    args = parser.parse_args()
+
+    encode = get_encoder(args.encoder)
+    encodings = [None, 'gzip'] + (['br'] if brotli is not None else [])
+
+    print(f"{'rows':>8} {'format':>9} {'coding':>9} {'bytes':>10} {'ratio':>7} {'ms':>8}   (best of {args.repeat})")
+    for size in args.sizes:
+        payload = make_payload(size)
+        baseline = len(encode(payload))
+        for name, body in (('objects', payload), ('columnar', to_columnar(payload))):
+            for encoding in encodings:
+                length, duration = measure(args.repeat, encode, body, encoding)
+                print(f"{size:>8} {name:>9} {encoding or 'identity':>9} {length:>10} "
+                      f"{length / baseline:>7.2f} {duration:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Load test comparing the sync (WSGI) and async (ASGI) serving modes.
+
+Start both servers against the same database, then point this script at
+them. Every client keeps one HTTP/1.1 connection open and replays a mix of
+listing, category, search and quiz requests for ``--duration`` seconds.
+
+    RATE_LIMITS=off MAX_CONCURRENT_REQUESTS=0 gunicorn -c gunicorn.conf.py
+    RATE_LIMITS=off MAX_CONCURRENT_REQUESTS=0 uvicorn --factory flaskr.asgi:create_asgi_app --workers 4 --port 5001
+    python benchmarks/loadtest.py --target sync=http://localhost:5000 \\
+        --target async=http://localhost:5001 --concurrency 50 200 500
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+REQUESTS = [
+    ('GET', '/questions', None),
+    ('GET', '/questions?page=2', None),
+    ('GET', '/categories', None),
+    ('GET', '/categories/1/questions', None),
+    ('POST', '/questions/search', {'searchTerm': 'title'}),
+    ('POST', '/quizzes', {'previous_questions': [], 'quiz_category': {'id': 0, 'type': 'All'}}),
+]
+
+
+def client(base_url, deadline, latencies, errors, lock):
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    local_latencies = []
+    local_errors = 0
+    while time.perf_counter() < deadline:
+        method, path, body = random.choice(REQUESTS)
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                local_errors += 1
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            continue
+        local_latencies.append(time.perf_counter() - started)
+    connection.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def run(base_url, concurrency, duration):
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client, args=(base_url, deadline, latencies, errors, lock))
+               for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else float('nan')
+
+    return {
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+        'errors': sum(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    targets = [target.split('=', 1) for target in args.target]
+    results = []
+    if not args.json:
+        print(f"{'target':>10} {'clients':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for concurrency in args.concurrency:
+        for name, base_url in targets:
+            result = dict(target=name, concurrency=concurrency, **run(base_url, concurrency, args.duration))
+            results.append(result)
+            if not args.json:
+                print(f"{name:>10} {concurrency:>8} {result['requests_per_second']:>10.1f} "
+                      f"{result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f} {result['errors']:>8}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
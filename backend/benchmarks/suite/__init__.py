@@ -0,0 +1,16 @@
+"""End-to-end benchmark suite: synthetic data, traffic replay, comparable results.
+
+Run from the ``backend`` folder:
+
+    python -m benchmarks.suite generate --database-url sqlite:////tmp/trivia.db --questions 1000000
+    python -m benchmarks.suite run --database-url sqlite:////tmp/trivia.db --mix read-heavy \\
+        --clients 8 --requests 20000 --output results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite run --url http://localhost:5000 --mix quiz --output results/server.json
+    python -m benchmarks.suite compare results/base.json results/head.json --threshold 10
+
+``generate`` bulk-loads a deterministic dataset (same ``--seed``, same rows).
+``run`` replays a traffic mix, in-process through the Flask app or against
+a running server, and writes per-route throughput, p50/p95/p99 latency and
+database time as JSON. ``compare`` lines up two result files and exits with
+status 1 when a route got slower than ``--threshold`` percent.
+"""
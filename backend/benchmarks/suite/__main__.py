@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from benchmarks.suite import __doc__ as usage  # noqa: E402
+from benchmarks.suite import dataset, report, runner  # noqa: E402
+from benchmarks.suite.traffic import MIXES  # noqa: E402
+
+
+def difficulty_weights(value):
+    return tuple(float(weight) for weight in value.split(','))
+
+
+def generate(args):
+    rows, seconds = dataset.load(args.database_url, args.questions, args.categories, args.seed,
+                                 args.difficulty_weights, reset=not args.append)
+    print(f"loaded {rows} questions in {args.categories} categories in {seconds:.1f} s "
+          f"({rows / seconds:,.0f} rows/s)")
+
+
+def run(args):
+    if not args.url and not args.database_url:
+        sys.exit('run needs --database-url (in-process) or --url (running server)')
+    result = runner.run(args.database_url, args.url, args.mix, args.clients, args.requests, args.warmup, args.seed)
+    result['meta'] = dict(report.environment(), target=result.pop('target'), dialect=result.pop('dialect'),
+                          dataset=result.pop('dataset'), mix=args.mix, clients=args.clients,
+                          requests=args.requests, warmup=args.warmup, seed=args.seed)
+    report.print_table(result)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2, sort_keys=True)
+        print(f'\nwritten to {args.output}')
+
+
+def compare(args):
+    with open(args.base) as file:
+        base = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+    regressions = report.compare(base, new, args.threshold)
+    if regressions:
+        print(f"\nregressed by more than {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=usage.splitlines()[0], epilog=usage,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_generate = commands.add_parser('generate', help='bulk-load a synthetic dataset')
+    parser_generate.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser_generate.add_argument('--questions', type=int, default=10000)
+    parser_generate.add_argument('--categories', type=int, default=20)
+    parser_generate.add_argument('--difficulty-weights', type=difficulty_weights, default=(1, 2, 3, 2, 1),
+                                 help='relative weight of difficulty 1, 2, ... (default 1,2,3,2,1)')
+    parser_generate.add_argument('--seed', type=int, default=1)
+    parser_generate.add_argument('--append', action='store_true', help='keep the existing rows')
+    parser_generate.set_defaults(handler=generate)
+
+    parser_run = commands.add_parser('run', help='replay a traffic mix and write the results')
+    parser_run.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                            help='run the app in this process against this database')
+    parser_run.add_argument('--url', help='run against a server, e.g. http://localhost:5000')
+    parser_run.add_argument('--mix', default='read-heavy',
+                            help=f"{', '.join(MIXES)} or weights like 'list=50,search=30,quiz=20'")
+    parser_run.add_argument('--clients', type=int, default=4)
+    parser_run.add_argument('--requests', type=int, default=5000)
+    parser_run.add_argument('--warmup', type=int, default=500)
+    parser_run.add_argument('--seed', type=int, default=1)
+    parser_run.add_argument('--output', help='write the results as JSON to this file')
+    parser_run.set_defaults(handler=run)
+
+    parser_compare = commands.add_parser('compare', help='compare two result files')
+    parser_compare.add_argument('base')
+    parser_compare.add_argument('new')
+    parser_compare.add_argument('--threshold', type=float, default=10.0,
+                                help='fail when p95 grows or throughput drops by more than this many percent')
+    parser_compare.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    if args.command == 'generate' and not args.database_url:
+        parser.error('generate needs --database-url or DATABASE_URL')
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
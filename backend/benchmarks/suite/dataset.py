@@ -0,0 +1,96 @@
+"""Deterministic synthetic questions, bulk-loaded through ``flaskr.bulk``.
+
+Question and answer texts are drawn from a made-up vocabulary with a Zipf
+distribution, so a few words match a large share of the rows and most
+match only a handful. That gives search terms of every selectivity.
+"""
+import itertools
+import random
+import time
+
+from flask import Flask
+from sqlalchemy import func, text
+
+from flaskr.bulk import import_questions
+from models import setup_db, Category, Question, Score, db
+
+SYLLABLES = ('ka', 'lo', 'mi', 'ren', 'tus', 'vo', 'shi', 'dan', 'pel', 'or', 'qui', 'zar', 'nem', 'bri', 'fo',
+             'gal', 'ut', 'hen', 'sto', 'wy', 'ax', 'jo', 'ce', 'dru', 'mon', 'is', 'tal', 'pre', 'gor', 'lin')
+VOCABULARY_SIZE = 5000
+ZIPF_EXPONENT = 1.1
+LOAD_CHUNK_SIZE = 10000
+
+
+def vocabulary(rng, size=VOCABULARY_SIZE):
+    words, seen = [], set()
+    while len(words) < size:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def generate_questions(count, category_ids, seed=1, difficulty_weights=(1, 2, 3, 2, 1)):
+    """Yield ``count`` question dicts; the same arguments always give the same rows."""
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    cum_weights = list(itertools.accumulate(1 / rank ** ZIPF_EXPONENT for rank in range(1, len(words) + 1)))
+    difficulties = range(1, len(difficulty_weights) + 1)
+    for _ in range(count):
+        question = ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(5, 12)))
+        yield {
+            'question': question.capitalize() + '?',
+            'answer': ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(1, 3))),
+            'category': rng.choice(category_ids),
+            'difficulty': rng.choices(difficulties, weights=difficulty_weights)[0],
+        }
+
+
+def create_loader_app(database_url):
+    app = Flask(__name__)
+    app.config['AUTO_MIGRATE'] = True
+    setup_db(app, database_url)
+    return app
+
+
+def load(database_url, questions, categories, seed=1, difficulty_weights=(1, 2, 3, 2, 1), reset=True):
+    """Fill the database with ``questions`` generated rows in ``categories`` categories.
+
+    Returns ``(rows, seconds)``. With ``reset`` all questions, categories and
+    scores are deleted first; category ids then start at 1.
+    """
+    app = create_loader_app(database_url)
+    with app.app_context():
+        if reset:
+            db.session.query(Score).delete()
+            db.session.query(Question).delete()
+            db.session.query(Category).delete()
+            db.session.commit()
+        db.session.add_all(Category(type=f'Category {i}') for i in range(1, categories + 1))
+        db.session.commit()
+        category_ids = [category_id for category_id, in db.session.query(Category.id).order_by(Category.id)]
+
+        started = time.perf_counter()
+        rows = ((line, row) for line, row in enumerate(
+            generate_questions(questions, category_ids, seed, difficulty_weights), 1))
+        imported = import_questions(rows, set(category_ids), LOAD_CHUNK_SIZE)
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+    with app.app_context():
+        db.engine.dispose()
+    return imported, elapsed
+
+
+def describe(database_url):
+    """Row counts recorded with every run, results are only comparable on the same data."""
+    app = create_loader_app(database_url)
+    with app.app_context():
+        description = {
+            'questions': db.session.query(func.count(Question.id)).scalar(),
+            'categories': db.session.query(func.count(Category.id)).scalar(),
+            'dialect': db.engine.dialect.name,
+        }
+        db.engine.dispose()
+    return description
@@ -0,0 +1,75 @@
+"""Result files: metadata for comparability, tables, and the comparison of two runs."""
+import os
+import platform
+import subprocess
+import sys
+
+# Runs that differ in any of these measure different things
+COMPARABLE = ('target', 'dialect', 'dataset', 'mix', 'clients', 'requests', 'seed')
+
+
+def git(*args):
+    try:
+        return subprocess.run(('git',) + args, capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    commit = git('rev-parse', 'HEAD')
+    return {
+        'commit': commit,
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')) if commit else None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+    }
+
+
+def print_table(result, file=sys.stdout):
+    print(f"{'route':<52} {'req':>7} {'err':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'db ms':>7} {'sql':>5}", file=file)
+    for label, summary in list(result['routes'].items()) + [('total', result['total'])]:
+        db_ms = summary['db_ms_per_request']
+        statements = summary['sql_statements_per_request']
+        print(f"{label:<52} {summary['requests']:>7} {summary['errors']:>5} {summary['throughput_rps']:>9.1f} "
+              f"{summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f} "
+              f"{'-' if db_ms is None else f'{db_ms:.2f}':>7} {'-' if statements is None else statements:>5}",
+              file=file)
+
+
+def change(base, new):
+    if base is None or new is None or base == 0:
+        return None
+    return (new - base) / base * 100
+
+
+def compare(base, new, threshold=10.0, file=sys.stdout):
+    """Print per-route changes; returns the routes whose p95 or throughput regressed beyond ``threshold`` %."""
+    for key in COMPARABLE:
+        if base['meta'].get(key) != new['meta'].get(key):
+            print(f"warning: {key} differs ({base['meta'].get(key)!r} vs {new['meta'].get(key)!r}), "
+                  f"the runs are not directly comparable", file=file)
+    print(f"base {str(base['meta'].get('commit'))[:10]}  new {str(new['meta'].get('commit'))[:10]}", file=file)
+    print(f"{'route':<52} {'p50 %':>8} {'p95 %':>8} {'p99 %':>8} {'req/s %':>8} {'db ms %':>8}", file=file)
+
+    def cell(value):
+        return f'{value:>+8.1f}' if value is not None else f"{'-':>8}"
+
+    regressions = []
+    labels = sorted(set(base['routes']) | set(new['routes'])) + ['total']
+    for label in labels:
+        old = base['total'] if label == 'total' else base['routes'].get(label)
+        current = new['total'] if label == 'total' else new['routes'].get(label)
+        if old is None or current is None:
+            print(f"{label:<52} only in {'new' if old is None else 'base'}", file=file)
+            continue
+        p95 = change(old['p95_ms'], current['p95_ms'])
+        throughput = change(old['throughput_rps'], current['throughput_rps'])
+        print(f"{label:<52} {cell(change(old['p50_ms'], current['p50_ms']))} {cell(p95)} "
+              f"{cell(change(old['p99_ms'], current['p99_ms']))} {cell(throughput)} "
+              f"{cell(change(old['db_ms_per_request'], current['db_ms_per_request']))}", file=file)
+        if (p95 is not None and p95 > threshold) or (throughput is not None and throughput < -threshold):
+            regressions.append(label)
+    return regressions
@@ -0,0 +1,237 @@
+"""Replay a traffic mix and measure every request.
+
+Two transports: ``FlaskTransport`` calls the app in this process through
+its test client, ``HTTPTransport`` talks to a running server over
+keep-alive connections. Database time comes from the app's own per-route
+metrics, read before and after the measured phase: straight from the
+registry in-process, from ``/metrics`` over HTTP. A server with several
+workers answers ``/metrics`` from whichever worker takes the scrape, so
+there the database time per request is a sample of that one worker.
+"""
+import http.client
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from .traffic import Catalog, Player, parse_mix
+
+CATALOG_PAGES = 5
+METRIC_LINE = re.compile(r'^(trivia_\w+)\{route="([^"]*)",method="([^"]*)"\} (\S+)$')
+WORD = re.compile(r'[^\W\d_]{3,}')
+
+
+class FlaskTransport:
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            # The server may close an idle keep-alive connection, reconnect on the next request
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            return None, None
+        if response.getheader('Content-Type', '').startswith('application/json'):
+            return response.status, json.loads(data)
+        return response.status, data
+
+    def close(self):
+        self.connection.close()
+
+
+def discover_catalog(transport, questions_per_page):
+    """Category ids, question count and search terms taken from the first listing pages."""
+    status, payload = transport.request('GET', '/questions')
+    if status != 200:
+        raise RuntimeError(f'GET /questions returned {status}, generate a dataset first')
+    category_ids = sorted(int(category_id) for category_id in payload['categories'])
+    words = []
+    for page in range(1, CATALOG_PAGES + 1):
+        status, page_payload = transport.request('GET', f'/questions?page={page}')
+        if status != 200:
+            break
+        for question in page_payload['questions']:
+            words.extend(word.lower() for word in WORD.findall(question['question']))
+    # Duplicates stay in: frequent words are searched more often
+    return Catalog(category_ids, payload['total_questions'], words or ['the'], questions_per_page)
+
+
+def route_counters_in_process(app):
+    metrics = app.extensions['metrics']
+    with metrics.lock:
+        return {(route, method): (stats.count, stats.sql_statements, stats.sql_duration)
+                for (route, method), stats in metrics.routes.items()}
+
+
+def route_counters_over_http(url):
+    transport = HTTPTransport(url)
+    status, text = transport.request('GET', '/metrics')
+    transport.close()
+    if status != 200:
+        return {}
+    values = defaultdict(dict)
+    for line in text.decode().splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            name, route, method, value = match.groups()
+            values[(route, method)][name] = float(value)
+    return {key: (metric.get('trivia_request_duration_seconds_count', 0),
+                  metric.get('trivia_sql_statements_total', 0),
+                  metric.get('trivia_sql_duration_seconds_total', 0.0))
+            for key, metric in values.items()}
+
+
+def play(transport, player, actions, weights, count, results, lock):
+    latencies, errors = defaultdict(list), defaultdict(int)
+    for _ in range(count):
+        request = player.next_request(actions, weights)
+        started = time.perf_counter()
+        status, payload = transport.request(request.method, request.path, request.body)
+        latencies[request.label].append(time.perf_counter() - started)
+        if status is None or status >= 400:
+            errors[request.label] += 1
+        if status is not None:
+            player.observe(request, status, payload)
+    transport.close()
+    with lock:
+        for label, values in latencies.items():
+            results['latencies'][label].extend(values)
+        for label, value in errors.items():
+            results['errors'][label] += value
+
+
+def replay(make_transport, catalog, mix, clients, requests, seed):
+    """Send ``requests`` requests of ``mix`` from ``clients`` threads; returns latencies, errors and seconds."""
+    weights = parse_mix(mix)
+    actions, action_weights = list(weights), list(weights.values())
+    results = {'latencies': defaultdict(list), 'errors': defaultdict(int)}
+    lock = threading.Lock()
+    threads, players = [], []
+    for i in range(clients):
+        player = Player(random.Random(seed * 1000 + i), catalog, f'bench-{seed}-{i}')
+        players.append(player)
+        count = requests // clients + (i < requests % clients)
+        threads.append(threading.Thread(
+            target=play, args=(make_transport(), player, actions, action_weights, count, results, lock)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results['seconds'] = time.perf_counter() - started
+    results['players'] = players
+    return results
+
+
+def clean_up(transport, players):
+    """Delete the questions the players created, so the next run sees the same dataset."""
+    for player in players:
+        for question_id in player.created:
+            transport.request('DELETE', f'/questions/{question_id}')
+    transport.close()
+
+
+def percentile(latencies, p):
+    return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0.0
+
+
+def summarize(latencies, errors, seconds, db_before=None, db_after=None):
+    """Throughput, percentiles and database time of one route (or all of them)."""
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / seconds, 1) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'db_ms_per_request': None,
+        'sql_statements_per_request': None,
+    }
+    if db_after is not None:
+        count, statements, duration = (after - before for after, before in zip(db_after, db_before or (0, 0, 0.0)))
+        if count > 0:
+            summary['db_ms_per_request'] = round(duration / count * 1000, 3)
+            summary['sql_statements_per_request'] = round(statements / count, 2)
+    return summary
+
+
+def run(database_url=None, url=None, mix='read-heavy', clients=4, requests=5000, warmup=500, seed=1):
+    """Replay ``mix`` in-process against ``database_url`` or over HTTP against ``url``; returns the results."""
+    app = None
+    if url:
+        make_transport = lambda: HTTPTransport(url)
+        counters = lambda: route_counters_over_http(url)
+    else:
+        os.environ['DATABASE_URL'] = database_url
+        from flaskr import create_app
+        app = create_app({'RATE_LIMITS': 'off', 'MAX_CONCURRENT_REQUESTS': 0})
+        make_transport = lambda: FlaskTransport(app)
+        counters = lambda: route_counters_in_process(app)
+
+    from flaskr.pagination import QUESTIONS_PER_PAGE
+    catalog = discover_catalog(make_transport(), QUESTIONS_PER_PAGE)
+    if warmup:
+        clean_up(make_transport(), replay(make_transport, catalog, mix, clients, warmup, seed + 1)['players'])
+
+    db_before = counters()
+    results = replay(make_transport, catalog, mix, clients, requests, seed)
+    db_after = counters()
+    clean_up(make_transport(), results['players'])
+
+    routes = {}
+    for label in sorted(results['latencies']):
+        method, route = label.split(' ', 1)
+        key = (route, method)
+        routes[label] = summarize(results['latencies'][label], results['errors'][label], results['seconds'],
+                                  db_before.get(key), db_after.get(key))
+    all_latencies = [latency for values in results['latencies'].values() for latency in values]
+    total = summarize(all_latencies, sum(results['errors'].values()), results['seconds'])
+    known = [summary for summary in routes.values() if summary['db_ms_per_request'] is not None]
+    if known:
+        total['db_ms_per_request'] = round(
+            sum(s['db_ms_per_request'] * s['requests'] for s in known) / sum(s['requests'] for s in known), 3)
+
+    dialect = None
+    if app is not None:
+        from models import db
+        with app.app_context():
+            dialect = db.engine.dialect.name
+        app.extensions['scores'].stop()
+        with app.app_context():
+            db.engine.dispose()
+
+    return {
+        'target': url or 'in-process',
+        'dialect': dialect,
+        'dataset': {'questions': catalog.total_questions, 'categories': len(catalog.category_ids)},
+        'seconds': round(results['seconds'], 3),
+        'total': total,
+        'routes': routes,
+    }
@@ -0,0 +1,170 @@
+"""Traffic mixes: weighted actions of simulated players.
+
+Every action returns one request labelled ``"METHOD rule"`` with the Flask
+URL rule, so results line up with the server's ``/metrics`` per route.
+Players keep a little state, the way the frontend does: a quiz game sends
+the ids it has already seen, and deletes remove questions the same player
+created earlier, so writes never eat into the generated dataset.
+"""
+import math
+from dataclasses import dataclass, field
+
+QUIZ_GAME_LENGTH = 5
+QUIZ_BATCH_SIZE = 5
+
+MIXES = {
+    'read-heavy': {'list': 35, 'categories': 10, 'category': 20, 'search': 10, 'quiz': 15, 'leaderboard': 5,
+                   'create': 3, 'delete': 2},
+    'search-heavy': {'search': 60, 'list': 20, 'category': 10, 'quiz': 10},
+    'quiz': {'quiz': 55, 'quiz_batch': 10, 'categories': 10, 'score': 10, 'leaderboard': 15},
+    'write-heavy': {'create': 40, 'delete': 30, 'score': 15, 'list': 15},
+}
+
+
+@dataclass
+class Request:
+    route: str
+    method: str
+    path: str
+    body: dict = None
+
+    @property
+    def label(self):
+        return f'{self.method} {self.route}'
+
+
+@dataclass
+class Catalog:
+    """What the players know about the data, read from the API before a run."""
+    category_ids: list
+    total_questions: int
+    search_terms: list
+    questions_per_page: int = 10
+
+    @property
+    def pages(self):
+        return max(1, math.ceil(self.total_questions / self.questions_per_page))
+
+
+def parse_mix(mix):
+    """A named mix from ``MIXES`` or ``'list=50,search=30,quiz=20'``."""
+    if mix in MIXES:
+        return dict(MIXES[mix])
+    weights = {}
+    for part in mix.split(','):
+        action, _, weight = part.partition('=')
+        if action.strip() not in ACTIONS:
+            raise ValueError(f'unknown action {action.strip()!r}, choose from {", ".join(sorted(ACTIONS))}')
+        weights[action.strip()] = float(weight or 1)
+    return weights
+
+
+@dataclass
+class Player:
+    rng: object
+    catalog: Catalog
+    name: str
+    created: list = field(default_factory=list)
+    game_category: int = None
+    game_seen: list = field(default_factory=list)
+    game_score: int = 0
+
+    def next_request(self, actions, weights):
+        return ACTIONS[self.rng.choices(actions, weights=weights)[0]](self)
+
+    def observe(self, request, status, payload):
+        """Update the player's state from a response."""
+        if status >= 400 or not isinstance(payload, dict):
+            if request.route == '/quizzes':
+                self.game_category = None
+            return
+        if request.route == '/quizzes':
+            question = payload.get('question')
+            if question is None or len(self.game_seen) + 1 >= QUIZ_GAME_LENGTH:
+                self.game_category = None
+            else:
+                self.game_seen.append(question['id'])
+                self.game_score += self.rng.random() < 0.6
+        elif request.route == '/questions' and request.method == 'POST':
+            self.created.append(payload['created'])
+
+    def _quiz_category(self):
+        if self.game_category is None:
+            # Most games are played across all categories, like the frontend's "ALL" button
+            self.game_category = 0 if self.rng.random() < 0.3 else self.rng.choice(self.catalog.category_ids)
+            self.game_seen = []
+            self.game_score = 0
+        return {'id': self.game_category}
+
+
+def list_questions(player):
+    # Early pages are read far more often than deep ones
+    page = min(player.catalog.pages, int(player.rng.paretovariate(1.2)))
+    return Request('/questions', 'GET', f'/questions?page={page}')
+
+
+def list_categories(player):
+    return Request('/categories', 'GET', '/categories')
+
+
+def category_questions(player):
+    category_id = player.rng.choice(player.catalog.category_ids)
+    return Request('/categories/<int:category_id>/questions', 'GET', f'/categories/{category_id}/questions')
+
+
+def search(player):
+    term = player.rng.choice(player.catalog.search_terms)
+    return Request('/questions/search', 'POST', '/questions/search', {'searchTerm': term})
+
+
+def quiz(player):
+    category = player._quiz_category()
+    return Request('/quizzes', 'POST', '/quizzes',
+                   {'previous_questions': list(player.game_seen), 'quiz_category': category})
+
+
+def quiz_batch(player):
+    category = {'id': player.rng.choice([0] + player.catalog.category_ids)}
+    return Request('/quizzes/batch', 'POST', '/quizzes/batch',
+                   {'previous_questions': [], 'quiz_category': category, 'count': QUIZ_BATCH_SIZE})
+
+
+def create_question(player):
+    return Request('/questions', 'POST', '/questions', {
+        'question': f'Benchmark question {player.rng.getrandbits(32):08x}?',
+        'answer': 'benchmark',
+        'category': player.rng.choice(player.catalog.category_ids),
+        'difficulty': player.rng.randint(1, 5),
+    })
+
+
+def delete_question(player):
+    if not player.created:
+        return create_question(player)
+    question_id = player.created.pop(player.rng.randrange(len(player.created)))
+    return Request('/questions/<int:question_id>', 'DELETE', f'/questions/{question_id}')
+
+
+def submit_score(player):
+    category = player._quiz_category()
+    return Request('/scores', 'POST', '/scores',
+                   {'player': player.name, 'score': player.game_score, 'quiz_category': category})
+
+
+def leaderboard(player):
+    category_id = player.rng.choice([0] + player.catalog.category_ids)
+    return Request('/categories/<int:category_id>/leaderboard', 'GET', f'/categories/{category_id}/leaderboard')
+
+
+ACTIONS = {
+    'list': list_questions,
+    'categories': list_categories,
+    'category': category_questions,
+    'search': search,
+    'quiz': quiz,
+    'quiz_batch': quiz_batch,
+    'create': create_question,
+    'delete': delete_question,
+    'score': submit_score,
+    'leaderboard': leaderboard,
+}
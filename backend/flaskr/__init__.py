@@ -1,31 +1,43 @@
+import atexit
 import os
-import string
-from unicodedata import category
-from unittest import result
-from flask import Flask, request, abort, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import load_only
+import logging
+from flask import Flask, Response, request, abort, jsonify, stream_with_context
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
 from flask_cors import CORS
-import random
-from models import setup_db, Question, Category, db
-
-QUESTIONS_PER_PAGE = 10
-
-#----------------------------------------------------------------
-# Pagination Funktion
-#----------------------------------------------------------------
-
-
-def paginate_questions(request, selection): 
-    page = request.args.get('page', 1, type=int)
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
-
-    questions = [question.format() for question in selection]
-    current_questions = questions[start:end]
-
-    return current_questions
-
+from migrations import db_cli
+from models import setup_db, pool_status, QUIZ_COLUMNS, Question, db
+from .admission import Overloaded, RateLimited, get_admission, init_admission, retry_after_header
+from .backends import create_backend
+from .bulk import (BULK_CHUNK_SIZE, BulkImportError, export_questions, import_questions,
+                   parse_csv, parse_ndjson, read_lines)
+from .answers import ANSWER_MAX_EDITS, ANSWER_MAX_LENGTH, check_answer, load_answer, normalize_answer
+from .cache import CACHE_TTL, Cache, cached_categories, get_cache
+from .compression import init_compression
+from .conditional import conditional
+from .encoding import get_encoder, questions_response
+from .log import configure_logging
+from .metrics import init_metrics
+from .pagination import (QUESTIONS_PER_PAGE, paginate_questions, count_questions, load_question, load_questions,
+                         page_cache_key)
+from .preload import refresh_indexes
+from .question_index import QUIZ_BATCH_MAX, QuestionIndex, get_question_index, is_id_list, quiz_category_id
+from .quiz_sessions import QuizSessions, SESSION_TTL
+from .rooms import (MAX_ROOMS, ROOM_BUFFER_SIZE, ROOM_KEEPALIVE, ROOM_MAX_PLAYERS, ROOM_QUESTIONS,
+                    ROOM_QUESTIONS_MAX, ROOM_TTL, ROOM_WSGI_STREAMS, RoomError, Rooms, event_stream, get_rooms)
+from .scores import (LEADERBOARD_SIZE, SCORE_BATCH_SIZE, SCORE_BUFFER_SIZE, SCORE_FLUSH_ATTEMPTS, SCORE_FLUSH_INTERVAL,
+                     SCORE_MAX, SCORE_SUBMIT_TIMEOUT, ScoreBufferFull, ScorePipeline, get_scores)
+from .search import create_search, get_search
+
+logger = logging.getLogger(__name__)
+
+READ_ONLY_POST_ROUTES = (
+    '/questions/search',
+    '/quizzes',
+    '/quizzes/batch',
+    '/quizzes/answers',
+    '/quizzes/sessions',
+    '/quizzes/sessions/<token>/next',
+)
 
 #----------------------------------------------------------------
 # Create App
@@ -35,7 +47,47 @@ def create_app(test_config=None):
     
     # App Kreators
     app = Flask(__name__)
+    if test_config:
+        app.config.from_mapping(test_config)
+    # POST routes that only read, a replica can answer them (GET and HEAD always qualify)
+    app.config.setdefault('REPLICA_READ_ROUTES', os.environ.get('REPLICA_READ_ROUTES', READ_ONLY_POST_ROUTES))
     setup_db(app)
+    app.cli.add_command(db_cli)
+    configure_logging(app)
+    metrics = init_metrics(app)
+    init_compression(app)
+    init_admission(app)
+    app.extensions['question_index'] = QuestionIndex()
+    app.extensions['search'] = create_search(app)
+    app.config.setdefault('QUIZ_SESSION_STORE', os.environ.get('QUIZ_SESSION_STORE', 'memory://'))
+    app.extensions['quiz_sessions'] = QuizSessions(
+        create_backend(app.config['QUIZ_SESSION_STORE'], max_entries=20000, default_ttl=SESSION_TTL))
+    app.config.setdefault('BULK_CHUNK_SIZE', BULK_CHUNK_SIZE)
+    app.config.setdefault('ANSWER_MAX_EDITS', int(os.environ.get('ANSWER_MAX_EDITS', ANSWER_MAX_EDITS)))
+    app.config.setdefault('CACHE_STORE', os.environ.get('CACHE_STORE', 'memory://'))
+    app.config.setdefault('CACHE_TTL', int(os.environ.get('CACHE_TTL', CACHE_TTL)))
+    app.extensions['cache'] = Cache(
+        create_backend(app.config['CACHE_STORE'], max_entries=10000), ttl=app.config['CACHE_TTL'])
+    app.extensions['scores'] = ScorePipeline(
+        app,
+        max_pending=app.config.get('SCORE_BUFFER_SIZE', SCORE_BUFFER_SIZE),
+        batch_size=app.config.get('SCORE_BATCH_SIZE', SCORE_BATCH_SIZE),
+        flush_interval=app.config.get('SCORE_FLUSH_INTERVAL', SCORE_FLUSH_INTERVAL),
+        submit_timeout=app.config.get('SCORE_SUBMIT_TIMEOUT', SCORE_SUBMIT_TIMEOUT),
+        leaderboard_size=app.config.get('LEADERBOARD_SIZE', LEADERBOARD_SIZE),
+        flush_attempts=app.config.get('SCORE_FLUSH_ATTEMPTS', SCORE_FLUSH_ATTEMPTS))
+    app.config.setdefault('ROOM_WSGI_STREAMS', int(os.environ.get('ROOM_WSGI_STREAMS', ROOM_WSGI_STREAMS)))
+    app.extensions['rooms'] = Rooms(
+        max_rooms=app.config.get('MAX_ROOMS', MAX_ROOMS),
+        ttl=app.config.get('ROOM_TTL', ROOM_TTL),
+        max_players=app.config.get('ROOM_MAX_PLAYERS', ROOM_MAX_PLAYERS),
+        max_buffer=app.config.get('ROOM_BUFFER_SIZE', ROOM_BUFFER_SIZE),
+        keepalive=app.config.get('ROOM_KEEPALIVE', ROOM_KEEPALIVE),
+        max_edits=app.config['ANSWER_MAX_EDITS'],
+        dumps=get_encoder(app.config.get('JSON_ENCODER', 'auto')),
+        max_wsgi_streams=app.config['ROOM_WSGI_STREAMS'])
+    # Write the scores still buffered when the process exits
+    atexit.register(app.extensions['scores'].stop)
     CORS(app)
     CORS(app, resources={r"/api/*": {"origins": "*"}})
 
@@ -52,6 +104,11 @@ def create_app(test_config=None):
         response.headers.add('Access-Control-Allow-Methods', 'GET, POST, PATCH, DELETE, OPTIONS')
         response.headers.add('Access-Control-Allow-Origin', '*')    
         return response
+
+    @app.before_request
+    def refresh_local_indexes():
+        # Writes of other workers reach this process through the shared cache generations
+        refresh_indexes(app)
     
 
 
@@ -65,20 +122,23 @@ def create_app(test_config=None):
 
 
     @app.route('/questions')
+    @conditional('questions', 'categories')
     def get_questions():
-        questions = Question.query.all()
-        current_questions = paginate_questions(request, questions)
-        categories = Category.query.all()
-        formatted_categories = {category.id: category.type for category in categories}
+        cache = get_cache()
+        current_questions = cache.get_or_load(
+            f'questions:{page_cache_key(request)}', ('questions',),
+            lambda: paginate_questions(request, Question.query))
+        total_questions = cache.get_or_load(
+            'count:questions', ('questions',), lambda: count_questions(Question.query))
 
         if len(current_questions) == 0:
             abort(404)
 
-        return jsonify({
+        return questions_response({
             'success': True,
             'questions': current_questions,
-            'total_questions': len(questions),
-            'categories': formatted_categories
+            'total_questions': total_questions,
+            'categories': cached_categories()
         })  
 
 #----------------------------------------------------------------   
@@ -87,16 +147,12 @@ def create_app(test_config=None):
 
     @app.route('/questions/<int:question_id>', methods=['DELETE'])
     def delete_question(question_id):
-        question = Question.query.get(question_id)
+        question = db.session.get(Question, question_id)
 
         if question is None:
             abort(404)
 
         question.delete()
-        
-        total_questions = Question.query.all()
-        current_questions = paginate_questions(request, total_questions)
-
 
         return jsonify({
             'success': True,
@@ -122,16 +178,64 @@ def create_app(test_config=None):
         question = Question(question=new_question, answer=new_answer, category=new_category, difficulty=new_difficulty)
         question.insert()
 
-        total_questions = Question.query.all()
-        current_questions = paginate_questions(request, total_questions)
+        # Only the requested page and a COUNT, both shared with GET /questions
+        cache = get_cache()
+        current_questions = cache.get_or_load(
+            f'questions:{page_cache_key(request)}', ('questions',),
+            lambda: paginate_questions(request, Question.query))
+        total_questions = cache.get_or_load(
+            'count:questions', ('questions',), lambda: count_questions(Question.query))
 
         return jsonify({
             'success': True,
             'created': question.id,
-            'total_questions': len(total_questions),
+            'total_questions': total_questions,
             'questions': current_questions
         })
     
+#----------------------------------------------------------------
+# POST /questions/bulk
+#----------------------------------------------------------------
+
+    @app.route('/questions/bulk', methods=['POST'])
+    def bulk_import_questions():
+        chunk_size = request.args.get('chunk_size', app.config['BULK_CHUNK_SIZE'], type=int)
+        if chunk_size < 1:
+            abort(400)
+
+        lines = read_lines(request.stream)
+        if request.mimetype == 'text/csv':
+            rows = parse_csv(lines)
+        else:
+            rows = parse_ndjson(lines)
+
+        try:
+            imported = import_questions(rows, cached_categories(), chunk_size)
+        except BulkImportError as e:
+            return jsonify({
+                'success': False,
+                'error': 422,
+                'message': f'Unprocessable entity: {e}',
+                'line': e.line
+            }), 422
+
+        return jsonify({
+            'success': True,
+            'imported': imported
+        })
+
+#----------------------------------------------------------------
+# GET /questions/export
+#----------------------------------------------------------------
+
+    @app.route('/questions/export')
+    def export_all_questions():
+        category_id = request.args.get('category', None, type=int)
+        return Response(
+            stream_with_context(export_questions(category_id)),
+            mimetype='application/x-ndjson'
+        )
+
 #----------------------------------------------------------------
 # POST /questions/search
 #----------------------------------------------------------------
@@ -139,9 +243,7 @@ def create_app(test_config=None):
     @app.route('/questions/search', methods=['POST'])
     def search_questions():
         try:
-            print("Incoming Request:", request.data)  
             body = request.get_json()
-            print("Parsed JSON:", body)  
 
             if not body:
                 return jsonify({
@@ -151,8 +253,15 @@ def create_app(test_config=None):
                 }), 400
 
             # Extract search term
-            search_term = body.get('searchTerm', "").strip()
-            print("Extracted searchTerm:", search_term) 
+            search_term = body.get('searchTerm', "")
+            if not isinstance(search_term, str):
+                return jsonify({
+                    'success': False,
+                    'error': 422,
+                    'message': 'Unprocessable entity: searchTerm must be a string'
+                }), 422
+            search_term = search_term.strip()
+            logger.debug('search request', extra={'fields': {'search_term': search_term}})
 
             if not search_term or search_term == "":
                 return jsonify({
@@ -161,22 +270,23 @@ def create_app(test_config=None):
                     'message': 'Unprocessable entity: searchTerm is required'
                 }), 422
 
-            # Search for questions
-            questions = Question.query.filter(Question.question.ilike(f"%{search_term}%")).all()
-            print("Matched Questions:", questions)  
+            # Search for questions, ranked and paginated by the search mode
+            include_answers = bool(body.get('searchAnswers', False))
+            current_questions, total_questions = get_search().search(request, search_term, include_answers)
 
-            # Paginate results
-            current_questions = paginate_questions(request, questions)
-
-            return jsonify({
+            return questions_response({
                 'success': True,
                 'questions': current_questions,
-                'total_questions': len(questions),
+                'total_questions': total_questions,
                 'current_category': None  
             })
 
-        except Exception as e:
-            print(f"Error in search_questions: {e}") 
+        except (PoolTimeoutError, OperationalError):
+            # Overload is answered with a 503 by the error handler below
+            raise
+
+        except Exception:
+            logger.exception('search_questions failed')
             return jsonify({
                 'success': False,
                 'error': 500,
@@ -193,33 +303,39 @@ def create_app(test_config=None):
 #----------------------------------------------------------------
 
     @app.route('/categories')
+    @conditional('categories')
     def get_categories():
-        categories = db.session.query(Category).order_by(Category.id).all()
+        categories = cached_categories()
         
         if len(categories) == 0:
             abort(404)
         
         return jsonify({
             'success': True,
-            'categories': {category.id: category.type for category in categories}   
+            'categories': categories
         })
 
 #----------------------------------------------------------------
 # GET /categories/<int:category_id>/questions
 #----------------------------------------------------------------
     @app.route('/categories/<int:category_id>/questions')
+    @conditional('questions', 'categories')
     def get_questions_by_category(category_id):
-        category = Category.query.get(category_id)
-        if category is None:
+        if category_id not in cached_categories():
             abort(404)
 
-        questions = Question.query.filter(Question.category == category_id).all()
-        current_questions = paginate_questions(request, questions)
+        cache = get_cache()
+        questions = Question.query.filter(Question.category == category_id)
+        current_questions = cache.get_or_load(
+            f'category:{category_id}:questions:{page_cache_key(request)}', ('questions',),
+            lambda: paginate_questions(request, questions))
+        total_questions = cache.get_or_load(
+            f'count:category:{category_id}', ('questions',), lambda: count_questions(questions))
 
-        return jsonify({
+        return questions_response({
             'success': True,
             'questions': current_questions,
-            'total_questions': len(questions),
+            'total_questions': total_questions,
             'current_category': category_id
         })
         
@@ -233,29 +349,412 @@ def create_app(test_config=None):
     def play_quiz():
         body = request.get_json()
         previous_questions = body.get('previous_questions', [])
-        quiz_category = body.get('quiz_category', None)
+        category_id = quiz_category_id(body.get('quiz_category', None))
+        recent_answers = body.get('recent_answers', None)
 
-        if quiz_category is None:
+        if category_id is None or not is_id_list(previous_questions):
+            abort(422)
+        if recent_answers is not None and not isinstance(recent_answers, list):
             abort(422)
 
-        if quiz_category['id'] == 0:
-            questions = Question.query.all()
-        else:
-            questions = Question.query.filter(Question.category == quiz_category['id']).all()
-
-        questions = [question.format() for question in questions]
+        # Pick an unseen question from the in-memory id index, adaptive by
+        # difficulty when the client reports its recent answers. Skip ids
+        # whose question was deleted before the index heard of it.
         random_question = None
-
-        for question in questions:
-            if question['id'] not in previous_questions:
-                random_question = question
+        excluded = list(previous_questions)
+        question_id = get_question_index().next_question(category_id, excluded, recent_answers)
+        while question_id is not None:
+            random_question = load_question(question_id, QUIZ_COLUMNS)
+            if random_question is not None:
                 break
+            excluded.append(question_id)
+            question_id = get_question_index().next_question(category_id, excluded, recent_answers)
 
         return jsonify({
             'success': True,
             'question': random_question
         })
-    
+
+#----------------------------------------------------------------
+# POST /quizzes/batch
+#----------------------------------------------------------------
+
+    @app.route('/quizzes/batch', methods=['POST'])
+    def play_quiz_batch():
+        body = request.get_json(silent=True) or {}
+        previous_questions = body.get('previous_questions', [])
+        category_id = quiz_category_id(body.get('quiz_category', None))
+        count = body.get('count', None)
+
+        if (category_id is None or not is_id_list(previous_questions)
+                or not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= QUIZ_BATCH_MAX):
+            abort(422)
+
+        # Distinct unseen questions in random order, one IN query for all of them
+        question_ids = get_question_index().random_unseen_batch(category_id, previous_questions, count)
+        questions = load_questions(question_ids, QUIZ_COLUMNS)
+
+        return jsonify({
+            'success': True,
+            'questions': questions,
+            'total_questions': len(questions)
+        })
+
+#----------------------------------------------------------------
+# POST /quizzes/answers
+#----------------------------------------------------------------
+
+    @app.route('/quizzes/answers', methods=['POST'])
+    def check_quiz_answer():
+        body = request.get_json(silent=True) or {}
+        question_id = body.get('question_id', None)
+        answer = body.get('answer', None)
+
+        # A guess of only spaces or punctuation can't be checked
+        if (not isinstance(question_id, int) or not isinstance(answer, str)
+                or len(answer) > ANSWER_MAX_LENGTH or not normalize_answer(answer)):
+            abort(422)
+
+        # One primary key lookup, the answer's normalized form is stored with it
+        expected = load_answer(question_id)
+        if expected is None:
+            abort(404)
+        answer_text, normalized = expected
+        result = {
+            'success': True,
+            'question_id': question_id,
+            'correct': check_answer(answer, normalized, app.config['ANSWER_MAX_EDITS'])
+        }
+        # A wrong guess must not reveal the answer to a question open in a live room
+        if result['correct'] or question_id not in get_rooms().open_questions:
+            result['answer'] = answer_text
+
+        return jsonify(result)
+
+#----------------------------------------------------------------
+# POST /quizzes/sessions
+#----------------------------------------------------------------
+
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def start_quiz_session():
+        body = request.get_json(silent=True) or {}
+        category_id = quiz_category_id(body.get('quiz_category', None))
+
+        if category_id is None:
+            abort(422)
+
+        ids = get_question_index().ids(category_id)
+        token, total = app.extensions['quiz_sessions'].start(category_id, ids)
+
+        return jsonify({
+            'success': True,
+            'session_token': token,
+            'total_questions': total
+        })
+
+#----------------------------------------------------------------
+# POST /quizzes/sessions/<token>/next
+#----------------------------------------------------------------
+
+    @app.route('/quizzes/sessions/<token>/next', methods=['POST'])
+    def next_session_question(token):
+        sessions = app.extensions['quiz_sessions']
+        if sessions.get(token) is None:
+            abort(404)
+
+        # Skip ids whose question was deleted after the deck was dealt
+        question = None
+        question_id = sessions.next_question_id(token)
+        while question_id is not None:
+            question = load_question(question_id, QUIZ_COLUMNS)
+            if question is not None:
+                break
+            question_id = sessions.next_question_id(token)
+
+        return jsonify({
+            'success': True,
+            'question': question
+        })
+
+#----------------------------------------------------------------
+# DELETE /quizzes/sessions/<token>
+#----------------------------------------------------------------
+
+    @app.route('/quizzes/sessions/<token>', methods=['DELETE'])
+    def end_quiz_session(token):
+        sessions = app.extensions['quiz_sessions']
+        if sessions.get(token) is None:
+            abort(404)
+
+        sessions.end(token)
+
+        return jsonify({
+            'success': True,
+            'ended': token
+        })
+
+#----------------------------------------------------------------
+# POST /rooms
+#----------------------------------------------------------------
+
+    @app.route('/rooms', methods=['POST'])
+    def create_room():
+        body = request.get_json(silent=True) or {}
+        category_id = quiz_category_id(body.get('quiz_category', None))
+        count = body.get('questions', ROOM_QUESTIONS)
+
+        if (category_id is None
+                or not isinstance(count, int) or not 1 <= count <= ROOM_QUESTIONS_MAX):
+            abort(422)
+
+        # The question sequence is fixed here, with one query for all of it
+        question_ids = get_question_index().random_unseen_batch(category_id, [], count)
+        questions = load_questions(question_ids)
+        if not questions:
+            abort(422)
+        room = get_rooms().create(category_id, questions)
+        if room is None:
+            return jsonify({
+                'success': False,
+                'error': 503,
+                'message': 'Service unavailable: too many rooms'
+            }), 503, {'Retry-After': '60'}
+
+        return jsonify({
+            'success': True,
+            'code': room.code,
+            'host_token': room.host_token,
+            'total_questions': len(questions)
+        }), 201
+
+#----------------------------------------------------------------
+# GET /rooms/<code>
+#----------------------------------------------------------------
+
+    @app.route('/rooms/<code>')
+    def get_room(code):
+        room = get_rooms().get(code)
+        if room is None:
+            abort(404)
+
+        return jsonify({
+            'success': True,
+            **room.snapshot()
+        })
+
+#----------------------------------------------------------------
+# POST /rooms/<code>/players
+#----------------------------------------------------------------
+
+    @app.route('/rooms/<code>/players', methods=['POST'])
+    def join_room(code):
+        room = get_rooms().get(code)
+        if room is None:
+            abort(404)
+        body = request.get_json(silent=True) or {}
+        name = body.get('player', None)
+        if not isinstance(name, str) or not name.strip() or len(name) > 64:
+            abort(422)
+
+        return jsonify({
+            'success': True,
+            'player_token': room.join(name.strip())
+        }), 201
+
+#----------------------------------------------------------------
+# POST /rooms/<code>/next
+#----------------------------------------------------------------
+
+    @app.route('/rooms/<code>/next', methods=['POST'])
+    def advance_room(code):
+        room = get_rooms().get(code)
+        if room is None:
+            abort(404)
+        body = request.get_json(silent=True) or {}
+        if body.get('host_token') != room.host_token:
+            abort(403)
+
+        # Pushed to every participant as a single broadcast
+        state = room.advance()
+
+        return jsonify({
+            'success': True,
+            'state': state,
+            'index': room.index
+        })
+
+#----------------------------------------------------------------
+# POST /rooms/<code>/answers
+#----------------------------------------------------------------
+
+    @app.route('/rooms/<code>/answers', methods=['POST'])
+    def answer_room_question(code):
+        room = get_rooms().get(code)
+        if room is None:
+            abort(404)
+        body = request.get_json(silent=True) or {}
+        answer = body.get('answer', None)
+        if not isinstance(answer, str) or len(answer) > 200 or not normalize_answer(answer):
+            abort(422)
+        if not room.answer(body.get('player_token'), answer):
+            abort(403)
+
+        # Scored when the host closes the question, the results event tells
+        return jsonify({
+            'success': True,
+            'accepted': True
+        }), 202
+
+#----------------------------------------------------------------
+# GET /rooms/<code>/events
+#----------------------------------------------------------------
+
+    @app.route('/rooms/<code>/events')
+    def room_events(code):
+        room = get_rooms().get(code)
+        if room is None:
+            abort(404)
+
+        # One thread per connection here, the ASGI mode serves this route natively
+        rooms = get_rooms()
+        if not rooms.open_wsgi_stream():
+            return jsonify({
+                'success': False,
+                'error': 503,
+                'message': 'Service unavailable: too many event streams, serve them with the ASGI mode'
+            }), 503, {'Retry-After': '5'}
+        response = Response(event_stream(room, rooms.keepalive), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        response.call_on_close(rooms.close_wsgi_stream)
+        return response
+
+#----------------------------------------------------------------
+# GET /rooms/stats
+#----------------------------------------------------------------
+
+    @app.route('/rooms/stats')
+    def get_room_stats():
+        return jsonify({
+            'success': True,
+            **get_rooms().stats()
+        })
+
+#----------------------------------------------------------------
+# POST /scores
+#----------------------------------------------------------------
+
+    @app.route('/scores', methods=['POST'])
+    def submit_score():
+        body = request.get_json(silent=True) or {}
+        player = body.get('player', None)
+        score = body.get('score', None)
+        category_id = quiz_category_id(body.get('quiz_category', None))
+
+        if (not isinstance(player, str) or not player.strip() or len(player) > 64
+                or not isinstance(score, int) or isinstance(score, bool) or not 0 <= score <= SCORE_MAX
+                or category_id is None):
+            abort(422)
+        if category_id != 0 and category_id not in cached_categories():
+            abort(422)
+
+        # Queued for the batched writer, visible on the leaderboard right away
+        entry, rank = get_scores().submit(player.strip(), category_id, score)
+
+        return jsonify({
+            'success': True,
+            'score': entry,
+            'rank': rank
+        }), 202
+
+#----------------------------------------------------------------
+# GET /categories/<int:category_id>/leaderboard
+#----------------------------------------------------------------
+
+    @app.route('/categories/<int:category_id>/leaderboard')
+    def get_leaderboard(category_id):
+        if category_id != 0 and category_id not in cached_categories():
+            abort(404)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), get_scores().leaderboard_size)
+
+        return jsonify({
+            'success': True,
+            'category': category_id,
+            'leaderboard': get_scores().top(category_id, limit)
+        })
+
+#----------------------------------------------------------------
+# GET /cache/stats
+#----------------------------------------------------------------
+
+    @app.route('/cache/stats')
+    def get_cache_stats():
+        return jsonify({
+            'success': True,
+            **get_cache().stats()
+        })
+
+#----------------------------------------------------------------
+# GET /admission/stats
+#----------------------------------------------------------------
+
+    @app.route('/admission/stats')
+    def get_admission_stats():
+        return jsonify({
+            'success': True,
+            **get_admission().stats()
+        })
+
+#----------------------------------------------------------------
+# GET /metrics
+#----------------------------------------------------------------
+
+    metrics.add_collector(lambda: [
+        (f'trivia_cache_{name}_total', 'counter', f'Response cache {name}.', value)
+        for name, value in get_cache().stats().items() if name != 'entries'
+    ])
+    metrics.add_collector(lambda: [
+        (f'trivia_scores_{name}', 'gauge' if name == 'pending' else 'counter',
+         f'Scores {name.replace("_", " ")}.', value)
+        for name, value in get_scores().stats().items()
+    ])
+    metrics.add_collector(lambda: [
+        (f'trivia_admission_{name}' if name == 'in_flight' else f'trivia_admission_{name}_total',
+         'gauge' if name == 'in_flight' else 'counter', f'Admission control {name.replace("_", " ")}.', value)
+        for name, value in get_admission().stats().items()
+    ])
+    metrics.add_collector(lambda: [
+        (f'trivia_rooms_{name}' if name in ('rooms', 'subscribers', 'wsgi_streams') else f'trivia_rooms_{name}_total',
+         'gauge' if name in ('rooms', 'subscribers', 'wsgi_streams') else 'counter',
+         f'Live rooms {name.replace("_", " ")}.', value)
+        for name, value in get_rooms().stats().items()
+    ])
+    metrics.add_collector(lambda: [
+        (f'trivia_db_pool_{name}', 'gauge', f'Connection pool {name.replace("_", " ")}.', value)
+        for name, value in pool_status(app).items() if isinstance(value, (int, float))
+    ])
+
+    @app.route('/metrics')
+    def get_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/metrics/profile')
+    def get_profile():
+        route = request.args.get('route', None)
+        if route is None:
+            abort(400)
+        return Response(metrics.folded_profile(route), mimetype='text/plain')
+
+#----------------------------------------------------------------
+# GET /health/db
+#----------------------------------------------------------------
+
+    @app.route('/health/db')
+    def get_db_health():
+        return jsonify({
+            'success': True,
+            **pool_status(app)
+        })
+
 #----------------------------------------------------------------
 # Error Handling   
 #----------------------------------------------------------------   
@@ -268,6 +767,14 @@ def create_app(test_config=None):
             'message': 'Bad request'
         }), 400
     
+    @app.errorhandler(403)
+    def forbidden(error):
+        return jsonify({
+            'success': False,
+            'error': 403,
+            'message': 'Forbidden'
+        }), 403
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({
@@ -292,6 +799,56 @@ def create_app(test_config=None):
             'message': 'Unprocessable entity'
         }), 422
     
+    @app.errorhandler(RoomError)
+    def room_conflict(error):
+        return jsonify({
+            'success': False,
+            'error': 409,
+            'message': f'Conflict: {error}'
+        }), 409
+
+    @app.errorhandler(PoolTimeoutError)
+    def database_busy(error):
+        # Pool exhausted: fail fast instead of queueing more requests
+        return jsonify({
+            'success': False,
+            'error': 503,
+            'message': 'Service unavailable: database busy'
+        }), 503, {'Retry-After': '1'}
+
+    @app.errorhandler(ScoreBufferFull)
+    def score_buffer_full(error):
+        # Backpressure: the batched writer is behind, the client retries later
+        return jsonify({
+            'success': False,
+            'error': 503,
+            'message': 'Service unavailable: score buffer full'
+        }), 503, {'Retry-After': '1'}
+
+    @app.errorhandler(RateLimited)
+    def rate_limited(error):
+        return jsonify({
+            'success': False,
+            'error': 429,
+            'message': 'Too many requests'
+        }), 429, retry_after_header(error.retry_after)
+
+    @app.errorhandler(Overloaded)
+    def overloaded(error):
+        # Shed load early, the request never waits for a database connection
+        return jsonify({
+            'success': False,
+            'error': 503,
+            'message': 'Service unavailable: too many concurrent requests'
+        }), 503, {'Retry-After': '1'}
+
+    @app.errorhandler(OperationalError)
+    def database_error(error):
+        # 57014 = query_canceled, raised when DB_STATEMENT_TIMEOUT expires
+        if getattr(error.orig, 'pgcode', None) == '57014':
+            return database_busy(error)
+        return internal_server_error(error)
+
     @app.errorhandler(500)
     def internal_server_error(error):
         return jsonify({
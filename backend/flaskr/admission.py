@@ -0,0 +1,162 @@
+import math
+import os
+import threading
+
+from flask import current_app, g, request
+
+from .backends import create_backend
+
+# Rate limit groups of the expensive routes (Flask URL rules)
+ROUTE_GROUPS = {
+    '/questions/search': 'search',
+    '/quizzes': 'quiz',
+    '/quizzes/batch': 'quiz',
+    '/quizzes/answers': 'quiz',
+    '/quizzes/sessions': 'quiz',
+    '/rooms': 'quiz',
+}
+# Per client: ``group=rate:burst``, rate in requests per second
+RATE_LIMITS = 'search=5:20,quiz=20:60'
+MAX_CONCURRENT_REQUESTS = 32
+RATE_LIMIT_ENTRIES = 100000
+# Proxies in front of the app that append to RATE_LIMIT_CLIENT_HEADER
+RATE_LIMIT_TRUSTED_PROXIES = 1
+
+
+class RateLimited(Exception):
+    """The client used up its token bucket, it may retry after ``retry_after`` seconds."""
+
+    def __init__(self, group, retry_after):
+        super().__init__(group)
+        self.group = group
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    """All slots for expensive requests are taken."""
+
+
+def parse_limits(limits):
+    """``{group: (rate, burst)}`` from ``'search=5:20,quiz=20:60'``; ``'off'`` or empty disables all."""
+    if isinstance(limits, dict):
+        return dict(limits)
+    parsed = {}
+    if limits and limits.strip().lower() != 'off':
+        for limit in limits.split(','):
+            group, _, value = limit.partition('=')
+            rate, _, burst = value.partition(':')
+            parsed[group.strip()] = (float(rate), float(burst or rate))
+    return parsed
+
+
+class Admission:
+    """Admission control for the expensive routes.
+
+    Every client gets a token bucket per group in ``backend`` (in-process,
+    or shared between workers with a Redis store): ``rate`` requests per
+    second on average, bursts of up to ``burst``. On top of that at most
+    ``max_concurrent`` expensive requests of this process run at once; the
+    next one is turned away right away instead of queueing for a database
+    connection. A limit of 0 or None disables it.
+    """
+
+    def __init__(self, backend, limits, max_concurrent=MAX_CONCURRENT_REQUESTS):
+        self.backend = backend
+        self.limits = limits
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _count(self, group, outcome):
+        key = f'{group}_{outcome}'
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def admit(self, group, client):
+        """Take a token and a slot for ``client``, pair every successful call with ``release()``."""
+        limit = self.limits.get(group)
+        if limit:
+            rate, burst = limit
+            allowed, retry_after = self.backend.take(f'rate:{group}:{client}', rate, burst)
+            if not allowed:
+                with self._lock:
+                    self._count(group, 'rate_limited')
+                raise RateLimited(group, retry_after)
+        with self._lock:
+            if self.max_concurrent and self.in_flight >= self.max_concurrent:
+                self._count(group, 'shed')
+                raise Overloaded()
+            self.in_flight += 1
+            self._count(group, 'admitted')
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, in_flight=self.in_flight)
+
+
+def retry_after_header(retry_after):
+    return {'Retry-After': str(max(1, math.ceil(retry_after)))}
+
+
+def client_id(remote_addr, forwarded_for=None, trusted_proxies=RATE_LIMIT_TRUSTED_PROXIES):
+    """The client a bucket belongs to: the ``X-Forwarded-For`` hop our outermost proxy added, else the peer.
+
+    Clients can send the header themselves, and proxies only append to it,
+    so just the last ``trusted_proxies`` hops are known to be genuine.
+    """
+    hops = [hop.strip() for hop in forwarded_for.split(',')] if forwarded_for else []
+    if hops and trusted_proxies > 0:
+        return hops[max(len(hops) - trusted_proxies, 0)]
+    return remote_addr or 'unknown'
+
+
+def request_client_id():
+    config = current_app.config
+    header = config.get('RATE_LIMIT_CLIENT_HEADER')
+    return client_id(request.remote_addr, request.headers.get(header) if header else None,
+                     config['RATE_LIMIT_TRUSTED_PROXIES'])
+
+
+def init_admission(app):
+    """Check every request to an expensive route before its view runs.
+
+    ``RATE_LIMITS`` (``'search=5:20,quiz=20:60'``, ``'off'``),
+    ``MAX_CONCURRENT_REQUESTS`` (32), ``RATE_LIMIT_STORE`` (``memory://``
+    or ``redis://...``) and, behind proxies, ``RATE_LIMIT_CLIENT_HEADER``
+    (``X-Forwarded-For``) and ``RATE_LIMIT_TRUSTED_PROXIES`` (1) come from the
+    app config or the environment.
+    """
+    app.config.setdefault('RATE_LIMIT_STORE', os.environ.get('RATE_LIMIT_STORE', 'memory://'))
+    app.config.setdefault('RATE_LIMITS', os.environ.get('RATE_LIMITS', RATE_LIMITS))
+    app.config.setdefault('MAX_CONCURRENT_REQUESTS',
+                          int(os.environ.get('MAX_CONCURRENT_REQUESTS', MAX_CONCURRENT_REQUESTS)))
+    app.config.setdefault('RATE_LIMIT_CLIENT_HEADER', os.environ.get('RATE_LIMIT_CLIENT_HEADER'))
+    app.config.setdefault('RATE_LIMIT_TRUSTED_PROXIES',
+                          int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', RATE_LIMIT_TRUSTED_PROXIES)))
+    admission = app.extensions['admission'] = Admission(
+        create_backend(app.config['RATE_LIMIT_STORE'], max_entries=RATE_LIMIT_ENTRIES),
+        parse_limits(app.config['RATE_LIMITS']), app.config['MAX_CONCURRENT_REQUESTS'])
+
+    @app.before_request
+    def admit_request():
+        if request.url_rule is None or request.method == 'OPTIONS':
+            return
+        group = ROUTE_GROUPS.get(request.url_rule.rule)
+        if group is not None:
+            admission.admit(group, request_client_id())
+            g.admitted = True
+
+    @app.teardown_request
+    def release_request(exc):
+        if g.pop('admitted', False):
+            admission.release()
+
+    return admission
+
+
+def get_admission():
+    return current_app.extensions['admission']
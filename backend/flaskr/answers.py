@@ -0,0 +1,94 @@
+"""Server-side answer checking against a precomputed normalized answer.
+
+Answers are compared in a normalized form: case-folded, without
+diacritics, punctuation and articles, whitespace collapsed. The form of
+every question's answer is computed once, on insert and update (and by the
+bulk import), and kept in the ``answer_normalized`` column, so a check only
+normalizes the guess. Equal forms are a match; otherwise a guess within
+``max_edits`` typos still counts. The banded edit distance gives up as
+soon as the bound is exceeded, so a check costs O(bound * length) at most.
+"""
+import re
+import unicodedata
+
+from sqlalchemy import event
+from models import Question, db
+
+from .metrics import record_rows
+
+ARTICLES = frozenset({'a', 'an', 'the'})
+ANSWER_MAX_EDITS = 2
+ANSWER_MAX_LENGTH = 200
+NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_answer(text):
+    """``'  The Beatles!'`` -> ``'beatles'``, ``'Pelé'`` -> ``'pele'``."""
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    words = NON_WORD.sub(' ', text.casefold()).split()
+    # An answer that is nothing but an article ("A") keeps it
+    return ' '.join([word for word in words if word not in ARTICLES] or words)
+
+
+def max_edits(normalized, limit=ANSWER_MAX_EDITS):
+    """Typos tolerated for an answer: none for short answers and numbers, one up to 7 characters."""
+    if len(normalized) <= 3 or any(char.isdigit() for char in normalized):
+        return 0
+    return min(1 if len(normalized) <= 7 else 2, limit)
+
+
+def within_edits(a, b, limit):
+    """True if the Levenshtein distance of ``a`` and ``b`` is at most ``limit``.
+
+    Only the diagonal band of width ``2 * limit + 1`` is computed, and the
+    comparison stops at the first row whose minimum exceeds ``limit``.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return False
+    if limit == 0 or a == b:
+        return a == b
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i, char in enumerate(a, 1):
+        current = [i if i <= limit else over] + [over] * len(b)
+        best = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != b[j - 1]))
+            current[j] = value if value < over else over
+            if value < best:
+                best = value
+        if best > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def check_answer(guess, expected_normalized, limit=ANSWER_MAX_EDITS):
+    """Whether ``guess`` matches an answer in its normalized form."""
+    normalized = normalize_answer(guess)
+    if not normalized:
+        return False
+    if normalized == expected_normalized:
+        return True
+    return within_edits(normalized, expected_normalized, max_edits(expected_normalized, limit))
+
+
+def load_answer(question_id):
+    """``(answer, normalized answer)`` of a question, or None if it does not exist."""
+    row = db.session.query(Question.answer, Question.answer_normalized).filter(Question.id == question_id).first()
+    if row is None:
+        return None
+    record_rows(1)
+    return answer_with_normalized(row)
+
+
+def answer_with_normalized(row):
+    # Rows written around the app (SQL dumps, raw inserts) have no normalized answer yet
+    return row.answer, row.answer_normalized or normalize_answer(row.answer)
+
+
+@event.listens_for(Question, 'before_insert')
+@event.listens_for(Question, 'before_update')
+def _normalize_question_answer(mapper, connection, target):
+    target.answer_normalized = normalize_answer(target.answer)
@@ -0,0 +1,668 @@
+"""Async ASGI entry point for the trivia API.
+
+The read-heavy routes (question listings, categories, search and quiz play)
+are served natively with an async SQLAlchemy engine, so a request waiting on
+the database does not hold a worker thread. They share the question index,
+search index and response cache of the Flask app, so both modes return the
+same data. The event streams of live rooms are served natively too, one
+task per connection instead of a thread. Every other route (writes, quiz
+sessions, room actions, bulk import/export, ...) is handed to the Flask app
+on a thread pool.
+
+    uvicorn --factory flaskr.asgi:create_asgi_app --workers 4
+
+Requires ``sqlalchemy[asyncio]`` plus ``asyncpg`` for PostgreSQL or
+``aiosqlite`` for SQLite.
+"""
+import asyncio
+import contextvars
+import io
+import json
+import os
+import re
+import sys
+import time
+from urllib.parse import parse_qsl
+
+from sqlalchemy import func, select
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.http import parse_date, parse_etags
+from models import QUESTION_COLUMNS, QUIZ_COLUMNS, Question, Category, question_dict
+
+from . import create_app
+from .admission import ROUTE_GROUPS, Overloaded, RateLimited, client_id, retry_after_header
+from .answers import ANSWER_MAX_LENGTH, answer_with_normalized, check_answer, normalize_answer
+from .compression import COMPRESSION_LEVEL, COMPRESSION_MIN_SIZE, BROTLI_QUALITY, compress, is_compressible, negotiate
+from .conditional import cache_headers, is_not_modified, validators, variant
+from .encoding import COLUMNAR_MIMETYPE, to_columnar, wants_columnar
+from .metrics import instrument_engine, new_counters, record_rows, request_counters
+from .pagination import page_cache_key, page_selection, slice_page
+from .preload import refresh_indexes
+from .question_index import QUIZ_BATCH_MAX, is_id_list, quiz_category_id
+from .rooms import LoopWakeup
+from .search import InvertedIndexSearch
+
+ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+ERROR_MESSAGES = {
+    400: 'Bad request',
+    404: 'Resource not found',
+    405: 'Method not allowed',
+    413: 'Payload too large',
+    422: 'Unprocessable entity',
+    429: 'Too many requests',
+    500: 'Internal server error',
+    503: 'Service unavailable: too many concurrent requests',
+}
+
+CORS_HEADERS = [
+    (b'access-control-allow-headers', b'Content-Type, Authorization'),
+    (b'access-control-allow-methods', b'GET, POST, PATCH, DELETE, OPTIONS'),
+    (b'access-control-allow-origin', b'*'),
+]
+
+# Native routes answering with a question list, see encoding.to_columnar
+QUESTION_LIST_RULES = {'/questions', '/categories/<int:category_id>/questions', '/questions/search'}
+
+# Largest body a native route reads into memory, they all take small JSON objects
+NATIVE_BODY_MAX = 1024 * 1024
+
+ROOM_EVENTS = re.compile(r'/rooms/([\w-]+)/events')
+EVENT_STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def async_database_url(url):
+    """Swap the driver of a sync database URL for its asyncio counterpart."""
+    scheme, rest = url.split('://', 1)
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
+def pool_options(url):
+    if url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('ASYNC_DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('ASYNC_DB_POOL_TIMEOUT', 5)),
+        'pool_recycle': int(os.environ.get('ASYNC_DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or ERROR_MESSAGES[status])
+        self.status = status
+        self.message = message or ERROR_MESSAGES[status]
+
+
+async def read_body(receive, limit=NATIVE_BODY_MAX):
+    """The whole request body, HTTPError 413 once it exceeds ``limit`` bytes."""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise HTTPError(400)
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise HTTPError(413)
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+class ReceiveStream(io.RawIOBase):
+    """``wsgi.input`` for the bridged routes, reading from ASGI ``receive`` as the app consumes it.
+
+    Flask runs on a worker thread, each read that needs more data waits
+    for the next message on the event loop. The body is never held in
+    memory as a whole, so uploads like ``POST /questions/bulk`` stay
+    streamed.
+    """
+
+    def __init__(self, receive, loop):
+        self.receive = receive
+        self.loop = loop
+        self.chunk = memoryview(b'')
+        self.more_body = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.chunk and self.more_body:
+            message = asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+            if message['type'] == 'http.disconnect':
+                self.more_body = False
+                raise ClientDisconnected()
+            self.chunk = memoryview(message.get('body', b''))
+            self.more_body = message.get('more_body', False)
+        size = min(len(buffer), len(self.chunk))
+        buffer[:size] = self.chunk[:size]
+        self.chunk = self.chunk[size:]
+        return size
+
+
+class Request:
+    """The parts of an ASGI request the native handlers need.
+
+    ``args`` is a werkzeug MultiDict, like ``flask.request.args``, so the
+    pagination helpers work unchanged.
+    """
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.remote_addr = (scope.get('client') or (None,))[0]
+        self.query_string = scope.get('query_string', b'').decode('latin-1')
+        self.args = MultiDict(parse_qsl(self.query_string))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+        self.body = body
+
+    @property
+    def full_path(self):
+        return f'{self.path}?{self.query_string}'
+
+    def get_json(self):
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400)
+
+
+class AsyncTriviaApp:
+
+    def __init__(self, flask_app, engine):
+        self.flask_app = flask_app
+        self.engine = engine
+        self.cache = flask_app.extensions['cache']
+        self.question_index = flask_app.extensions['question_index']
+        self.search = flask_app.extensions['search']
+        self.metrics = flask_app.extensions['metrics']
+        self.admission = flask_app.extensions['admission']
+        self.rooms = flask_app.extensions['rooms']
+        self.wakeup = None
+        instrument_engine(engine.sync_engine)
+        # (method, pattern, Flask rule used as metrics label, handler, tables for conditional GETs)
+        self.routes = [
+            ('GET', re.compile(r'/questions'), '/questions', self.get_questions, ('questions', 'categories')),
+            ('GET', re.compile(r'/categories'), '/categories', self.get_categories, ('categories',)),
+            ('GET', re.compile(r'/categories/(\d+)/questions'), '/categories/<int:category_id>/questions',
+             self.get_questions_by_category, ('questions', 'categories')),
+            ('POST', re.compile(r'/questions/search'), '/questions/search', self.search_questions, None),
+            ('POST', re.compile(r'/quizzes'), '/quizzes', self.play_quiz, None),
+            ('POST', re.compile(r'/quizzes/batch'), '/quizzes/batch', self.play_quiz_batch, None),
+            ('POST', re.compile(r'/quizzes/answers'), '/quizzes/answers', self.check_quiz_answer, None),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        match = ROOM_EVENTS.fullmatch(scope['path'])
+        if match and scope['method'] == 'GET':
+            return await self.stream_room(receive, send, match.group(1))
+
+        for method, pattern, rule, handler, tables in self.routes:
+            match = pattern.fullmatch(scope['path'])
+            if match and scope['method'] == method:
+                try:
+                    body = await read_body(receive)
+                except HTTPError as e:
+                    return await self.send_error(send, e.status)
+                return await self.respond(send, rule, handler, tables, Request(scope, body), *match.groups())
+
+        # Everything else reads the body itself, while it arrives
+        await self.call_flask(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def respond(self, send, rule, handler, tables, request, *args):
+        started = time.perf_counter()
+        counters = new_counters()
+        request_counters.set(counters)
+        refresh_indexes(self.flask_app)
+
+        cache_header_list = []
+        if tables is not None:
+            representation = variant(request.full_path, request.headers.get('accept'), request.args)
+            etag, last_modified = validators(self.cache, tables, representation)
+            headers = cache_headers(etag, last_modified, self.flask_app.config.get('HTTP_CACHE_MAX_AGE', 0))
+            cache_header_list = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+            if_none_match = parse_etags(request.headers.get('if-none-match'))
+            if_modified_since = parse_date(request.headers.get('if-modified-since'))
+            if is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+                self.metrics.observe(rule, request.method, 304, time.perf_counter() - started, counters)
+                await send({'type': 'http.response.start', 'status': 304, 'headers': cache_header_list + CORS_HEADERS})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+
+        group = ROUTE_GROUPS.get(rule)
+        admitted, error_headers = False, []
+        try:
+            if group is not None:
+                config = self.flask_app.config
+                header = config.get('RATE_LIMIT_CLIENT_HEADER')
+                self.admission.admit(group, client_id(
+                    request.remote_addr, request.headers.get(header.lower()) if header else None,
+                    config['RATE_LIMIT_TRUSTED_PROXIES']))
+                admitted = True
+            status, body = 200, await handler(request, *args)
+        except RateLimited as e:
+            status, body = 429, {'success': False, 'error': 429, 'message': ERROR_MESSAGES[429]}
+            error_headers = [(name.lower().encode(), value.encode())
+                             for name, value in retry_after_header(e.retry_after).items()]
+        except Overloaded:
+            status, body = 503, {'success': False, 'error': 503, 'message': ERROR_MESSAGES[503]}
+            error_headers = [(b'retry-after', b'1')]
+        except HTTPError as e:
+            status, body = e.status, {'success': False, 'error': e.status, 'message': e.message}
+        except Exception:
+            self.flask_app.logger.exception('Unhandled error in %s %s', request.method, request.path)
+            status, body = 500, {'success': False, 'error': 500, 'message': ERROR_MESSAGES[500]}
+        finally:
+            if admitted:
+                self.admission.release()
+
+        mimetype, vary = 'application/json', []
+        if rule in QUESTION_LIST_RULES:
+            vary.append('Accept')
+            if status == 200 and wants_columnar(request.headers.get('accept'), request.args):
+                mimetype, body = COLUMNAR_MIMETYPE, to_columnar(body)
+
+        # The Flask app's JSON provider records the encode time in ``counters``
+        payload = self.flask_app.json.encode(body)
+        headers = [(b'content-type', mimetype.encode())] + error_headers
+
+        config = self.flask_app.config
+        if config.get('COMPRESS_RESPONSES', True) and is_compressible(status, mimetype, {}):
+            vary.append('Accept-Encoding')
+            encoding = negotiate(request.headers.get('accept-encoding'))
+            if encoding is not None and len(payload) >= config.get('COMPRESSION_MIN_SIZE', COMPRESSION_MIN_SIZE):
+                payload = compress(payload, encoding, config.get('COMPRESSION_LEVEL', COMPRESSION_LEVEL),
+                                   config.get('BROTLI_QUALITY', BROTLI_QUALITY))
+                headers.append((b'content-encoding', encoding.encode()))
+        if vary:
+            headers.append((b'vary', ', '.join(vary).encode()))
+        self.metrics.observe(rule, request.method, status, time.perf_counter() - started, counters)
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers + [(b'content-length', str(len(payload)).encode())]
+                       + (cache_header_list if status == 200 else []) + CORS_HEADERS,
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def stream_room(self, receive, send, code):
+        """Server-sent events of a room until it finishes, the client leaves or falls too far behind."""
+        room = self.rooms.get(code)
+        if room is None:
+            return await self.send_error(send, 404)
+
+        # Broadcasts come from the Flask routes' threads, one wakeup per event loop batches them
+        if self.wakeup is None:
+            self.wakeup = LoopWakeup(asyncio.get_running_loop())
+        ready = asyncio.Event()
+        subscriber = room.subscribe(self.wakeup.waker(ready))
+        left = False
+
+        async def watch_disconnect():
+            nonlocal left
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            left = True
+            ready.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': EVENT_STREAM_HEADERS + CORS_HEADERS})
+            loop = asyncio.get_running_loop()
+            while not left:
+                # A timer instead of wait_for, which would start a task per wakeup
+                keepalive = loop.call_later(self.rooms.keepalive, ready.set)
+                await ready.wait()
+                keepalive.cancel()
+                ready.clear()
+                chunk = subscriber.take()
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                elif not left and not subscriber.closed:
+                    await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                if subscriber.closed and not subscriber.buffer:
+                    break
+            if not left:
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            watcher.cancel()
+            room.unsubscribe(subscriber)
+
+    async def send_error(self, send, status):
+        payload = self.flask_app.json.encode({'success': False, 'error': status, 'message': ERROR_MESSAGES[status]})
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json')] + CORS_HEADERS})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def in_flask_context(self, function, *args):
+        """Run a sync function that needs the Flask app context on a thread."""
+        def run():
+            with self.flask_app.app_context():
+                return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, run)
+
+    async def cached(self, key, tables, loader):
+        cache_key, value = self.cache.lookup(key, tables)
+        if value is None:
+            value = await loader()
+            self.cache.store(cache_key, value)
+        return value
+
+    #----------------------------------------------------------------
+    # Queries
+    #----------------------------------------------------------------
+
+    async def fetch_page(self, request, condition=None, order_by=None):
+        statement = select(*QUESTION_COLUMNS)
+        if condition is not None:
+            statement = statement.where(condition)
+        if order_by is not None:
+            statement = page_selection(request, statement.order_by(*order_by), ranked=True)
+        else:
+            statement = page_selection(request, statement)
+        async with self.engine.connect() as connection:
+            questions = [question_dict(row) for row in await connection.execute(statement)]
+        record_rows(len(questions))
+        return questions
+
+    async def count(self, condition=None):
+        statement = select(func.count()).select_from(Question)
+        if condition is not None:
+            statement = statement.where(condition)
+        async with self.engine.connect() as connection:
+            return await connection.scalar(statement)
+
+    async def fetch_ids(self, ids, columns=QUESTION_COLUMNS):
+        if not ids:
+            return []
+        async with self.engine.connect() as connection:
+            rows = await connection.execute(select(*columns).where(Question.id.in_(ids)))
+        questions = {row.id: question_dict(row) for row in rows}
+        record_rows(len(questions))
+        return [questions[question_id] for question_id in ids if question_id in questions]
+
+    async def categories(self):
+        async def load():
+            async with self.engine.connect() as connection:
+                rows = await connection.execute(select(Category.id, Category.type).order_by(Category.id))
+            return {category_id: category_type for category_id, category_type in rows}
+        return await self.cached('categories', ('categories',), load)
+
+    #----------------------------------------------------------------
+    # Routes
+    #----------------------------------------------------------------
+
+    async def get_questions(self, request):
+        current_questions = await self.cached(
+            f'questions:{page_cache_key(request)}', ('questions',), lambda: self.fetch_page(request))
+        total_questions = await self.cached('count:questions', ('questions',), self.count)
+
+        if len(current_questions) == 0:
+            raise HTTPError(404)
+
+        return {
+            'success': True,
+            'questions': current_questions,
+            'total_questions': total_questions,
+            'categories': await self.categories()
+        }
+
+    async def get_categories(self, request):
+        categories = await self.categories()
+
+        if len(categories) == 0:
+            raise HTTPError(404)
+
+        return {
+            'success': True,
+            'categories': categories
+        }
+
+    async def get_questions_by_category(self, request, category_id):
+        category_id = int(category_id)
+        if category_id not in await self.categories():
+            raise HTTPError(404)
+
+        condition = Question.category == category_id
+        current_questions = await self.cached(
+            f'category:{category_id}:questions:{page_cache_key(request)}', ('questions',),
+            lambda: self.fetch_page(request, condition))
+        total_questions = await self.cached(
+            f'count:category:{category_id}', ('questions',), lambda: self.count(condition))
+
+        return {
+            'success': True,
+            'questions': current_questions,
+            'total_questions': total_questions,
+            'current_category': category_id
+        }
+
+    async def search_questions(self, request):
+        # Same responses as the Flask route: an unreadable body is a 500
+        try:
+            body = request.get_json()
+        except HTTPError:
+            raise HTTPError(500)
+
+        if not body:
+            raise HTTPError(400, 'Bad request: JSON body missing')
+
+        search_term = body.get('searchTerm', '')
+        if not isinstance(search_term, str):
+            raise HTTPError(422, 'Unprocessable entity: searchTerm must be a string')
+        search_term = search_term.strip()
+        if not search_term:
+            raise HTTPError(422, 'Unprocessable entity: searchTerm is required')
+
+        include_answers = bool(body.get('searchAnswers', False))
+        if isinstance(self.search, InvertedIndexSearch):
+            if self.search.is_built:
+                ids = self.search.ranked_ids(search_term, include_answers)
+            else:
+                ids = await self.in_flask_context(self.search.ranked_ids, search_term, include_answers)
+            current_questions, total_questions = await self.fetch_ids(slice_page(request, ids)), len(ids)
+        else:
+            condition, order_by = self.search.criteria(search_term, include_answers)
+            current_questions = await self.fetch_page(request, condition, order_by if self.search.ranked else None)
+            total_questions = await self.count(condition)
+
+        return {
+            'success': True,
+            'questions': current_questions,
+            'total_questions': total_questions,
+            'current_category': None
+        }
+
+    async def play_quiz(self, request):
+        body = request.get_json() or {}
+        previous_questions = body.get('previous_questions', [])
+        category_id = quiz_category_id(body.get('quiz_category', None))
+        recent_answers = body.get('recent_answers', None)
+
+        if category_id is None or not is_id_list(previous_questions):
+            raise HTTPError(422)
+        if recent_answers is not None and not isinstance(recent_answers, list):
+            raise HTTPError(422)
+
+        # Ids whose question was deleted before the index heard of it are skipped
+        index = self.question_index
+        excluded = list(previous_questions)
+        while True:
+            args = (category_id, excluded, recent_answers)
+            if index.is_loaded:
+                question_id = index.next_question(*args)
+            else:
+                question_id = await self.in_flask_context(index.next_question, *args)
+            if question_id is None:
+                questions = []
+                break
+            questions = await self.fetch_ids([question_id], QUIZ_COLUMNS)
+            if questions:
+                break
+            excluded.append(question_id)
+
+        return {
+            'success': True,
+            'question': questions[0] if questions else None
+        }
+
+    async def play_quiz_batch(self, request):
+        body = request.get_json() or {}
+        previous_questions = body.get('previous_questions', [])
+        category_id = quiz_category_id(body.get('quiz_category', None))
+        count = body.get('count', None)
+
+        if (category_id is None or not is_id_list(previous_questions)
+                or not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= QUIZ_BATCH_MAX):
+            raise HTTPError(422)
+
+        index = self.question_index
+        args = (category_id, previous_questions, count)
+        if index.is_loaded:
+            question_ids = index.random_unseen_batch(*args)
+        else:
+            question_ids = await self.in_flask_context(index.random_unseen_batch, *args)
+        questions = await self.fetch_ids(question_ids, QUIZ_COLUMNS)
+
+        return {
+            'success': True,
+            'questions': questions,
+            'total_questions': len(questions)
+        }
+
+    async def check_quiz_answer(self, request):
+        body = request.get_json() or {}
+        question_id = body.get('question_id', None)
+        answer = body.get('answer', None)
+
+        if (not isinstance(question_id, int) or not isinstance(answer, str)
+                or len(answer) > ANSWER_MAX_LENGTH or not normalize_answer(answer)):
+            raise HTTPError(422)
+
+        async with self.engine.connect() as connection:
+            row = (await connection.execute(select(Question.answer, Question.answer_normalized)
+                                            .where(Question.id == question_id))).first()
+        if row is None:
+            raise HTTPError(404)
+        record_rows(1)
+        answer_text, normalized = answer_with_normalized(row)
+        result = {
+            'success': True,
+            'question_id': question_id,
+            'correct': check_answer(answer, normalized, self.flask_app.config['ANSWER_MAX_EDITS'])
+        }
+        if result['correct'] or question_id not in self.rooms.open_questions:
+            result['answer'] = answer_text
+        return result
+
+    #----------------------------------------------------------------
+    # WSGI Bridge
+    #----------------------------------------------------------------
+
+    def wsgi_environ(self, scope, stream):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('127.0.0.1', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': stream,
+            # The stream ends with the body, with or without a Content-Length
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[name] = value
+            else:
+                key = f'HTTP_{name}'
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    async def call_flask(self, scope, receive, send):
+        """Run the Flask app for this request on the default thread pool.
+
+        The request body is read from ``receive`` as the app asks for it,
+        and the response iterable is advanced one chunk per thread hop, so
+        uploads like the bulk import and streamed responses like the export
+        stay streamed. All steps run in one copied context to keep Flask's
+        request context across threads.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        def call():
+            stream = io.BufferedReader(ReceiveStream(receive, loop))
+            response = self.flask_app(self.wsgi_environ(scope, stream), start_response)
+            return response, iter(response)
+
+        def close(response):
+            if hasattr(response, 'close'):
+                response.close()
+
+        response, chunks = await loop.run_in_executor(None, context.run, call)
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            while True:
+                chunk = await loop.run_in_executor(None, context.run, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await loop.run_in_executor(None, context.run, close, response)
+
+
+def create_asgi_app(test_config=None, flask_app=None):
+    """Build the ASGI app, on top of ``flask_app`` or a fresh ``create_app``."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    flask_app = flask_app or create_app(test_config)
+    database_url = async_database_url(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+    engine = create_async_engine(database_url, **pool_options(database_url))
+    return AsyncTriviaApp(flask_app, engine)
@@ -0,0 +1,195 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class MemoryBackend:
+    """Bounded in-process key/value store with TTL and LRU eviction.
+
+    Values are kept as-is, lists stored with ``push`` are deques so ``pop``
+    is O(1). Once ``max_entries`` is exceeded the least recently used key
+    is evicted.
+    """
+
+    def __init__(self, max_entries=10000, default_ttl=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expires(self, ttl):
+        ttl = self.default_ttl if ttl is None else ttl
+        return self.clock() + ttl if ttl else None
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, ttl):
+        self._entries[key] = (value, self._expires(ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._lookup(key)
+            return None if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def counter(self, key):
+        return self.get(key)
+
+    def add_counter(self, key, value):
+        """Create the integer counter ``key`` unless it exists (no TTL), returns its value."""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[0]
+            self._store(key, value, 0)
+            return value
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            entry = self._lookup(key)
+            value = (entry[0] if entry else 0) + amount
+            self._entries[key] = (value, entry[1] if entry else None)
+            return value
+
+    def push(self, key, values, ttl=None):
+        with self._lock:
+            self._store(key, deque(values), ttl)
+
+    def take(self, key, rate, burst, cost=1):
+        """Take ``cost`` tokens from the bucket ``key``, refilled at ``rate`` per second up to ``burst``.
+
+        Returns ``(allowed, retry_after)``, the seconds until enough tokens
+        are back if not. A bucket left alone refills completely within
+        ``burst / rate`` seconds, so that is its TTL.
+        """
+        with self._lock:
+            now = self.clock()
+            entry = self._lookup(key)
+            tokens, updated = entry[0] if entry is not None else (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._store(key, (tokens, now), burst / rate)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None or not entry[0]:
+                return None
+            return entry[0].popleft()
+
+
+# Token bucket as one atomic step on the server, see MemoryBackend.take
+TOKEN_BUCKET_SCRIPT = """
+local rate, burst, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """Same interface as MemoryBackend on top of a Redis server.
+
+    Shares state between worker processes. ``client`` can be any object
+    with the redis-py API, which makes it easy to point at a local stand-in.
+    Values are pickled. Counters (``counter``/``add_counter``/``incr``) are
+    plain integers, so that ``INCRBY`` works on them, and lists
+    (``push``/``pop``) hold integer ids.
+    """
+
+    def __init__(self, client, prefix='trivia:'):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def get(self, key):
+        value = self.client.get(self._key(key))
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self._key(key), pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def counter(self, key):
+        value = self.client.get(self._key(key))
+        return None if value is None else int(value)
+
+    def add_counter(self, key, value):
+        pipeline = self.client.pipeline()
+        pipeline.set(self._key(key), int(value), nx=True)
+        pipeline.get(self._key(key))
+        return int(pipeline.execute()[1])
+
+    def incr(self, key, amount=1):
+        return self.client.incrby(self._key(key), amount)
+
+    def push(self, key, values, ttl=None):
+        pipeline = self.client.pipeline()
+        pipeline.delete(self._key(key))
+        if values:
+            pipeline.rpush(self._key(key), *values)
+        if ttl:
+            pipeline.expire(self._key(key), ttl)
+        pipeline.execute()
+
+    def pop(self, key):
+        value = self.client.lpop(self._key(key))
+        return None if value is None else int(value)
+
+    def take(self, key, rate, burst, cost=1):
+        allowed, tokens = self.client.eval(TOKEN_BUCKET_SCRIPT, 1, self._key(key), rate, burst, cost, time.time())
+        return bool(allowed), 0.0 if allowed else (cost - float(tokens)) / rate
+
+
+def create_backend(url, **options):
+    """Build a backend from a URL: ``memory://`` or ``redis://host:port/db``."""
+    if not url or url.startswith('memory://'):
+        return MemoryBackend(**options)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(f"The redis package is required for the store at {url}")
+        return RedisBackend(redis.Redis.from_url(url))
+    raise ValueError(f"Unsupported store URL: {url}")
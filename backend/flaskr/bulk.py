@@ -0,0 +1,151 @@
+import csv
+import io
+import json
+
+from flask import current_app
+from sqlalchemy import insert
+from models import Question, db, record_bulk_change
+
+from .answers import normalize_answer
+from .encoding import get_encoder
+
+BULK_CHUNK_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+QUESTION_FIELDS = ('question', 'answer', 'category', 'difficulty')
+# Bulk statements skip the ORM events that normalize answers, the rows carry it
+IMPORT_COLUMNS = QUESTION_FIELDS + ('answer_normalized',)
+
+
+class BulkImportError(Exception):
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+#----------------------------------------------------------------
+# Parsing und Validierung
+#----------------------------------------------------------------
+
+def read_lines(stream):
+    """Decode a binary request stream line by line without buffering it."""
+    for line in stream:
+        yield line.decode('utf-8')
+
+
+def parse_ndjson(lines):
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            raise BulkImportError(line_number, "invalid JSON")
+
+
+def parse_csv(lines):
+    """CSV with a header row naming the question fields."""
+    for line_number, row in enumerate(csv.DictReader(lines), 2):
+        yield line_number, row
+
+
+def validate_row(line_number, row, categories):
+    if not isinstance(row, dict):
+        raise BulkImportError(line_number, "expected an object")
+    missing = [field for field in QUESTION_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise BulkImportError(line_number, f"missing {', '.join(missing)}")
+    try:
+        category = int(row['category'])
+        difficulty = int(row['difficulty'])
+    except (TypeError, ValueError):
+        raise BulkImportError(line_number, "category and difficulty must be integers")
+    if category not in categories:
+        raise BulkImportError(line_number, f"unknown category {category}")
+
+    answer = str(row['answer'])
+    return {
+        'question': str(row['question']),
+        'answer': answer,
+        'category': category,
+        'difficulty': difficulty,
+        'answer_normalized': normalize_answer(answer),
+    }
+
+
+#----------------------------------------------------------------
+# Import
+#----------------------------------------------------------------
+
+def _insert_chunk(chunk):
+    db.session.execute(insert(Question), chunk)
+
+
+def _copy_chunk(chunk):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in chunk:
+        writer.writerow([row[field] for field in IMPORT_COLUMNS])
+    buffer.seek(0)
+
+    connection = db.session.connection().connection
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {Question.__tablename__} ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    record_bulk_change(db.session, Question.__tablename__)
+
+
+def import_questions(rows, categories, chunk_size=BULK_CHUNK_SIZE):
+    """Validate and insert ``(line_number, row)`` pairs in chunks.
+
+    Everything happens in one transaction: the first invalid row rolls back
+    the whole import and raises ``BulkImportError``. Chunks are written with
+    COPY on PostgreSQL/psycopg2 and with an executemany INSERT elsewhere.
+    """
+    write_chunk = _insert_chunk
+    if db.engine.dialect.name == 'postgresql' and db.engine.dialect.driver == 'psycopg2':
+        write_chunk = _copy_chunk
+
+    imported = 0
+    chunk = []
+    try:
+        for line_number, row in rows:
+            chunk.append(validate_row(line_number, row, categories))
+            if len(chunk) >= chunk_size:
+                write_chunk(chunk)
+                imported += len(chunk)
+                chunk = []
+        if chunk:
+            write_chunk(chunk)
+            imported += len(chunk)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return imported
+
+
+#----------------------------------------------------------------
+# Export
+#----------------------------------------------------------------
+
+def export_questions(category_id=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield all questions as NDJSON, ``batch_size`` rows per chunk.
+
+    Rows are read through a server-side cursor, so memory use does not
+    depend on the size of the table.
+    """
+    selection = db.session.query(Question.id, *(getattr(Question, field) for field in QUESTION_FIELDS))
+    if category_id is not None:
+        selection = selection.filter(Question.category == category_id)
+    selection = selection.order_by(Question.id).execution_options(stream_results=True, yield_per=batch_size)
+
+    encode = get_encoder(current_app.config.get('JSON_ENCODER', 'auto'))
+    lines = []
+    for row in selection:
+        lines.append(encode(row._asdict()))
+        if len(lines) >= batch_size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
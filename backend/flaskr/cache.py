@@ -0,0 +1,151 @@
+import random
+import time
+
+from flask import current_app, has_app_context
+from models import Category, db, listen_for_changes
+
+CACHE_TTL = 300
+
+
+class Cache:
+    """Read-through cache for categories, question pages and counts.
+
+    Every entry is stored under the current generation of the tables it was
+    read from. A commit touching a table bumps its generation, which makes
+    all entries depending on it unreachable at once; they then age out of
+    the backend through TTL/LRU. Generations live in the backend as well,
+    so with a shared backend a write in one worker invalidates all of them.
+    """
+
+    def __init__(self, backend, ttl=CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, table):
+        generation = self.backend.counter(f'generation:{table}')
+        if generation is None:
+            # Start at a random value so a generation that was evicted can't
+            # come back and revive entries from before it was lost. Only the
+            # first worker to get here creates it, the others get its value.
+            generation = self.backend.add_counter(f'generation:{table}', random.getrandbits(48))
+            self.backend.set(f'modified:{table}', time.time(), ttl=0)
+        return generation
+
+    def last_modified(self, table):
+        """Unix time of the last change to ``table`` seen by this cache."""
+        modified = self.backend.get(f'modified:{table}')
+        if modified is None:
+            modified = time.time()
+            self.backend.set(f'modified:{table}', modified, ttl=0)
+        return modified
+
+    def invalidate(self, tables):
+        for table in tables:
+            if self.backend.counter(f'generation:{table}') is None:
+                self.generation(table)
+            else:
+                self.backend.incr(f'generation:{table}')
+                self.backend.set(f'modified:{table}', time.time(), ttl=0)
+
+    def lookup(self, key, tables):
+        """Return ``(cache_key, value)``, ``value`` is None on a miss.
+
+        ``cache_key`` pins the generations seen before loading, pass it to
+        ``store`` so a write racing with the load can't be cached as current.
+        """
+        generations = ':'.join(str(self.generation(table)) for table in tables)
+        cache_key = f'cache:{key}@{generations}'
+        value = self.backend.get(cache_key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cache_key, value
+
+    def store(self, cache_key, value):
+        self.backend.set(cache_key, value, self.ttl)
+
+    def get_or_load(self, key, tables, loader):
+        cache_key, value = self.lookup(key, tables)
+        if value is None:
+            value = loader()
+            if not loaded_from_lagging_replica(self, tables):
+                self.store(cache_key, value)
+        return value
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': getattr(self.backend, 'evictions', None),
+            'entries': len(self.backend) if hasattr(self.backend, '__len__') else None,
+        }
+
+
+class TableVersion:
+    """Tracks whether an in-process index still matches the cache generation of its table.
+
+    The index calls ``loading`` before it reads its rows and ``applied``
+    for every commit of this process it applied incrementally. Each such
+    commit bumped the generation by one, so any other difference between
+    the generation now and the one loaded means another worker wrote to
+    the table: ``is_stale`` is then True and the index has to be rebuilt.
+    Needs a shared ``CACHE_STORE`` to see other workers' writes.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.loaded = None
+        self.local_commits = 0
+
+    def loading(self, cache):
+        self.loaded = cache.generation(self.table)
+        self.local_commits = 0
+
+    def applied(self):
+        self.local_commits += 1
+
+    def is_stale(self, cache):
+        if self.loaded is None:
+            return False
+        current = cache.generation(self.table)
+        if current == self.loaded + self.local_commits:
+            self.loaded, self.local_commits = current, 0
+            return False
+        return True
+
+
+def loaded_from_lagging_replica(cache, tables):
+    """True if this request read from a replica and one of ``tables`` changed within the sticky window.
+
+    The replica may not have that change yet. Its result is returned but
+    not cached, or everyone, including the writer, would get it until the
+    TTL runs out.
+    """
+    router = current_app.extensions.get('replicas') if has_app_context() else None
+    if router is None or not router.read_from_replica():
+        return False
+    changed = max(cache.last_modified(table) for table in tables)
+    return time.time() - changed < router.sticky_seconds
+
+
+def get_cache():
+    return current_app.extensions['cache']
+
+
+def cached_categories():
+    """``{id: type}`` of all categories, ordered by id."""
+    return get_cache().get_or_load('categories', ('categories',), lambda: {
+        category.id: category.type
+        for category in db.session.query(Category).order_by(Category.id)
+    })
+
+
+@listen_for_changes
+def _invalidate_cache(changes):
+    if has_app_context():
+        cache = current_app.extensions.get('cache')
+        if cache is not None:
+            cache.invalidate({tablename for tablename, op, row in changes})
@@ -0,0 +1,92 @@
+import gzip
+import zlib
+
+from flask import request
+from werkzeug.http import parse_accept_header
+
+from .encoding import COLUMNAR_MIMETYPE
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip only without it
+    brotli = None
+
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', COLUMNAR_MIMETYPE, 'text/csv', 'text/plain'}
+
+#----------------------------------------------------------------
+# Negotiation and Compression
+#----------------------------------------------------------------
+
+
+def negotiate(accept_encoding):
+    """Best content coding the client accepts: ``br``, ``gzip`` or None."""
+    if not accept_encoding:
+        return None
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return parse_accept_header(accept_encoding).best_match(offered)
+
+
+def compress(data, encoding, level=COMPRESSION_LEVEL, quality=BROTLI_QUALITY):
+    if encoding == 'br':
+        return brotli.compress(data, quality=quality)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks, encoding, level=COMPRESSION_LEVEL, quality=BROTLI_QUALITY):
+    """Compress an iterable of chunks, flushing after each one so it streams."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=quality)
+        compress_chunk = lambda chunk: compressor.process(chunk) + compressor.flush()
+        finish = compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress_chunk = lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        finish = compressor.flush
+
+    for chunk in chunks:
+        yield compress_chunk(chunk.encode() if isinstance(chunk, str) else chunk)
+    yield finish()
+
+
+def is_compressible(status, mimetype, headers):
+    return (200 <= status < 300 and status != 204
+            and mimetype in COMPRESSIBLE_MIMETYPES
+            and 'Content-Encoding' not in headers)
+
+
+def init_compression(app):
+    """Compress responses with gzip or brotli, as negotiated by Accept-Encoding.
+
+    Bodies smaller than ``COMPRESSION_MIN_SIZE`` bytes are sent as they are,
+    streamed responses (the NDJSON export) are compressed chunk by chunk.
+    ``COMPRESS_RESPONSES = False`` turns it off, e.g. behind a proxy that
+    compresses already.
+    """
+    config = app.config
+
+    @app.after_request
+    def compress_response(response):
+        if not config.get('COMPRESS_RESPONSES', True):
+            return response
+        if not is_compressible(response.status_code, response.mimetype, response.headers):
+            return response
+        level = config.get('COMPRESSION_LEVEL', COMPRESSION_LEVEL)
+        quality = config.get('BROTLI_QUALITY', BROTLI_QUALITY)
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, level, quality)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config.get('COMPRESSION_MIN_SIZE', COMPRESSION_MIN_SIZE):
+                return response
+            response.set_data(compress(data, encoding, level, quality))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,69 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, make_response, request
+from werkzeug.http import http_date
+
+from .cache import get_cache
+from .encoding import wants_columnar
+
+
+def validators(cache, tables, full_path):
+    """ETag and Last-Modified of a response built from ``tables``.
+
+    Both only depend on the generation counters of the tables, so they are
+    computed without touching the database.
+    """
+    generations = '-'.join(str(cache.generation(table)) for table in tables)
+    etag = hashlib.blake2b(f'{full_path}|{generations}'.encode(), digest_size=8).hexdigest()
+    last_modified = max(cache.last_modified(table) for table in tables)
+    return etag, last_modified
+
+
+def variant(full_path, accept, args):
+    """Key of the representation a request asks for, part of the ETag."""
+    if wants_columnar(accept, args):
+        return f'{full_path}|columnar'
+    return full_path
+
+
+def is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    if if_modified_since is not None:
+        return int(last_modified) <= if_modified_since.timestamp()
+    return False
+
+
+def cache_headers(etag, last_modified, max_age):
+    return {
+        'ETag': f'W/"{etag}"',
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': f'public, max-age={max_age}, must-revalidate',
+    }
+
+
+def conditional(*tables):
+    """Answer conditional GETs for a view whose output only depends on ``tables``.
+
+    A matching ``If-None-Match``/``If-Modified-Since`` gets a 304 before the
+    view runs. Successful responses carry ETag, Last-Modified and a
+    Cache-Control header (``HTTP_CACHE_MAX_AGE`` seconds, default 0) so a
+    CDN or reverse proxy can revalidate instead of refetching.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            representation = variant(request.full_path, request.headers.get('Accept'), request.args)
+            etag, last_modified = validators(get_cache(), tables, representation)
+            headers = cache_headers(etag, last_modified, current_app.config.get('HTTP_CACHE_MAX_AGE', 0))
+
+            if is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+                return '', 304, headers
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.headers.update(headers)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,105 @@
+import json
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+JSON_ENCODERS = ('auto', 'orjson', 'stdlib')
+
+COLUMNAR_MIMETYPE = 'application/vnd.trivia.columnar+json'
+COLUMNAR_FIELDS = ('id', 'question', 'answer', 'category', 'difficulty')
+
+#----------------------------------------------------------------
+# JSON Encoding
+#----------------------------------------------------------------
+
+
+def stdlib_dumps(obj, default=None):
+    return json.dumps(obj, default=default, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def orjson_dumps(obj, default=None):
+    return orjson.dumps(obj, default=default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+
+def get_encoder(name='auto'):
+    """Return ``dumps(obj, default=None) -> bytes`` for the encoder ``name``.
+
+    ``auto`` uses orjson when it is installed and the standard library
+    otherwise. Both produce compact UTF-8 JSON with sorted keys.
+    """
+    if name not in JSON_ENCODERS:
+        raise ValueError(f"Unknown JSON encoder {name!r}, expected one of {', '.join(JSON_ENCODERS)}")
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_ENCODER = 'orjson' requires the orjson package")
+    if name == 'stdlib' or orjson is None:
+        return stdlib_dumps
+    return orjson_dumps
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding responses straight to bytes.
+
+    The encoder is picked by ``JSON_ENCODER`` (``auto``, ``orjson`` or
+    ``stdlib``). Types the encoder does not know natively go through
+    Flask's default conversion (dates, decimals, UUIDs, dataclasses).
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.encoder = get_encoder(app.config.get('JSON_ENCODER', 'auto'))
+
+    def encode(self, obj):
+        return self.encoder(obj, default=self.default)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj) + b'\n', mimetype=self.mimetype)
+
+
+#----------------------------------------------------------------
+# Columnar Question Lists
+#----------------------------------------------------------------
+
+def wants_columnar(accept, args):
+    """True for ``?format=columnar`` or an Accept header preferring COLUMNAR_MIMETYPE."""
+    if args.get('format') == 'columnar':
+        return True
+    if not accept:
+        return False
+    best = parse_accept_header(accept, MIMEAccept).best_match(['application/json', COLUMNAR_MIMETYPE])
+    return best == COLUMNAR_MIMETYPE
+
+
+def to_columnar(payload):
+    """Turn ``payload['questions']`` from a list of objects into one array per field.
+
+    ``{"questions": [{"id": 1, ...}, {"id": 2, ...}]}`` becomes
+    ``{"format": "columnar", "questions": {"id": [1, 2], ...}}``, which
+    leaves out the repeated keys.
+    """
+    questions = payload['questions']
+    columns = {field: [question[field] for question in questions] for field in COLUMNAR_FIELDS}
+    return {**payload, 'format': 'columnar', 'questions': columns}
+
+
+def questions_response(payload):
+    """JSON response for a question list, columnar when the client asks for it."""
+    if wants_columnar(request.headers.get('Accept'), request.args):
+        response = current_app.json.response(to_columnar(payload))
+        response.mimetype = COLUMNAR_MIMETYPE
+    else:
+        response = current_app.json.response(payload)
+    response.vary.add('Accept')
+    return response
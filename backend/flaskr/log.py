@@ -0,0 +1,31 @@
+import json
+import logging
+import os
+
+from flask.logging import default_handler
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line, with the ``extra={'fields': {...}}`` of the call."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(app):
+    """Set the app logger level from ``LOG_LEVEL`` and the format from ``LOG_FORMAT``.
+
+    ``LOG_FORMAT=json`` switches Flask's default handler to structured lines.
+    """
+    app.logger.setLevel(app.config.get('LOG_LEVEL', os.environ.get('LOG_LEVEL', 'INFO')).upper())
+    if app.config.get('LOG_FORMAT', os.environ.get('LOG_FORMAT')) == 'json':
+        default_handler.setFormatter(StructuredFormatter())
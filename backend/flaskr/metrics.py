@@ -0,0 +1,239 @@
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from models import Category, Question, db
+
+from .encoding import FastJSONProvider
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PROFILE_INTERVAL = 0.001
+
+
+class RouteStats:
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.statuses = Counter()
+        self.sql_statements = 0
+        self.sql_duration = 0.0
+        self.rows_loaded = 0
+        self.serialization = 0.0
+
+
+class Metrics:
+    """Per-route request metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = defaultdict(RouteStats)
+        self.profiles = defaultdict(Counter)
+        self.collectors = []
+
+    def observe(self, route, method, status, duration, counters):
+        with self.lock:
+            stats = self.routes[(route, method)]
+            stats.count += 1
+            stats.duration += duration
+            stats.statuses[status] += 1
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+            stats.sql_statements += counters['sql_statements']
+            stats.sql_duration += counters['sql_duration']
+            stats.rows_loaded += counters['rows_loaded']
+            stats.serialization += counters['serialization']
+
+    def add_collector(self, collector):
+        """Register ``collector()`` returning ``[(name, type, help, value)]`` gauges/counters."""
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            routes = sorted(self.routes.items())
+
+            family('trivia_request_duration_seconds', 'histogram', 'Request latency per route.')
+            for (route, method), stats in routes:
+                labels = f'route="{route}",method="{method}"'
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append(f'trivia_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'trivia_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'trivia_request_duration_seconds_sum{{{labels}}} {stats.duration}')
+                lines.append(f'trivia_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            family('trivia_requests_total', 'counter', 'Requests per route and status.')
+            for (route, method), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'trivia_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+
+            for name, attribute, help_text in (
+                ('trivia_sql_statements_total', 'sql_statements', 'SQL statements executed.'),
+                ('trivia_sql_duration_seconds_total', 'sql_duration', 'Time spent executing SQL.'),
+                ('trivia_rows_loaded_total', 'rows_loaded', 'Question and category rows loaded.'),
+                ('trivia_serialization_seconds_total', 'serialization', 'Time spent encoding JSON responses.'),
+            ):
+                family(name, 'counter', help_text)
+                for (route, method), stats in routes:
+                    lines.append(f'{name}{{route="{route}",method="{method}"}} {getattr(stats, attribute)}')
+
+        for collector in self.collectors:
+            for name, kind, help_text, value in collector():
+                if value is None:
+                    continue
+                family(name, kind, help_text)
+                lines.append(f'{name} {float(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+    def folded_profile(self, route):
+        """Samples of ``route`` in collapsed-stack format (flamegraph.pl, speedscope)."""
+        with self.lock:
+            samples = self.profiles.get(route, Counter())
+            return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+
+#----------------------------------------------------------------
+# Request Counters
+#----------------------------------------------------------------
+
+# Counters of requests served outside Flask (the native ASGI routes)
+request_counters = contextvars.ContextVar('request_counters', default=None)
+
+
+def new_counters():
+    return Counter(sql_statements=0, sql_duration=0.0, rows_loaded=0, serialization=0.0)
+
+
+def _counters():
+    if has_request_context():
+        return g.get('metrics_counters')
+    return request_counters.get()
+
+
+def record_rows(count):
+    counters = _counters()
+    if counters is not None:
+        counters['rows_loaded'] += count
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    counters = _counters()
+    if counters is not None:
+        counters['sql_statements'] += 1
+        counters['sql_duration'] += time.perf_counter() - started
+
+
+def _on_load(target, context):
+    record_rows(1)
+
+
+event.listen(Question, 'load', _on_load)
+event.listen(Category, 'load', _on_load)
+
+
+def instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """JSON provider recording encode time in the request counters."""
+
+    def encode(self, obj):
+        started = time.perf_counter()
+        try:
+            return super().encode(obj)
+        finally:
+            counters = _counters()
+            if counters is not None:
+                counters['serialization'] += time.perf_counter() - started
+
+
+#----------------------------------------------------------------
+# Sampling Profiler
+#----------------------------------------------------------------
+
+class SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval while running."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.samples
+
+
+def init_metrics(app):
+    """Install the request hooks, engine listeners and JSON provider on ``app``.
+
+    Profiling is opt-in: routes listed in ``PROFILE_ROUTES`` (URL rules like
+    ``/questions``) are sampled on every request and the folded stacks can be
+    fetched from ``GET /metrics/profile?route=/questions``.
+    """
+    metrics = app.extensions['metrics'] = Metrics()
+    profile_routes = set(filter(None, app.config.get('PROFILE_ROUTES', '').split(',')))
+
+    app.json = TimedJSONProvider(app)
+    db.on_engine_created(app, instrument_engine)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_counters = new_counters()
+        if request.url_rule is not None and request.url_rule.rule in profile_routes:
+            g.profiler = SamplingProfiler(threading.get_ident())
+            g.profiler.start()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe(route, request.method, response.status_code,
+                        time.perf_counter() - started, g.metrics_counters)
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            samples = profiler.stop()
+            with metrics.lock:
+                metrics.profiles[route].update(samples)
+        return response
+
+    return metrics
@@ -0,0 +1,106 @@
+from flask import current_app
+from sqlalchemy import text
+from models import QUESTION_COLUMNS, Question, db, question_dict
+
+from .metrics import record_rows
+
+QUESTIONS_PER_PAGE = 10
+
+#----------------------------------------------------------------
+# Pagination Funktion
+#----------------------------------------------------------------
+
+
+def page_selection(request, selection, ranked=False):
+    """Limit a Question query or select() to the page requested by ``request``.
+
+    Paging is pushed down into SQL: ``?page=N`` becomes LIMIT/OFFSET and
+    ``?after_id=ID`` becomes a keyset cursor on the primary key, so at most
+    QUESTIONS_PER_PAGE rows are ever loaded. ``ranked`` selections keep
+    their own ORDER BY and only support page numbers.
+    """
+    page = max(request.args.get('page', 1, type=int), 1)
+    after_id = request.args.get('after_id', None, type=int)
+
+    if ranked:
+        selection = selection.offset((page - 1) * QUESTIONS_PER_PAGE)
+    elif after_id is not None:
+        selection = selection.order_by(Question.id).filter(Question.id > after_id)
+    else:
+        selection = selection.order_by(Question.id).offset((page - 1) * QUESTIONS_PER_PAGE)
+
+    return selection.limit(QUESTIONS_PER_PAGE)
+
+
+def paginate_questions(request, selection, ranked=False):
+    """Return the requested page of a Question query as a list of dicts.
+
+    Only the formatted columns are selected, as plain row tuples.
+    """
+    rows = page_selection(request, selection.with_entities(*QUESTION_COLUMNS), ranked).all()
+    record_rows(len(rows))
+    return [question_dict(row) for row in rows]
+
+
+def page_cache_key(request):
+    """Cache key part identifying the page requested by ``request``."""
+    page = max(request.args.get('page', 1, type=int), 1)
+    after_id = request.args.get('after_id', None, type=int)
+    return f'page={page}' if after_id is None else f'after={after_id}'
+
+
+def slice_page(request, ids):
+    """Slice the requested page out of an already ranked list of ids."""
+    page = max(request.args.get('page', 1, type=int), 1)
+    return ids[(page - 1) * QUESTIONS_PER_PAGE:page * QUESTIONS_PER_PAGE]
+
+
+def paginate_ids(request, ids):
+    """Return the requested page of an already ranked list of question ids.
+
+    Only the ids of the page are looked up, in a single ``IN`` query.
+    """
+    return load_questions(slice_page(request, ids))
+
+
+def load_questions(ids, columns=QUESTION_COLUMNS):
+    """Return the questions with ``ids`` as dicts, in the order of ``ids``.
+
+    Ids of deleted questions are skipped. Quiz routes pass ``QUIZ_COLUMNS``
+    to leave the answers out.
+    """
+    if not ids:
+        return []
+
+    rows = db.session.query(*columns).filter(Question.id.in_(ids))
+    questions = {row.id: question_dict(row) for row in rows}
+    record_rows(len(questions))
+    return [questions[question_id] for question_id in ids if question_id in questions]
+
+
+def load_question(question_id, columns=QUESTION_COLUMNS):
+    """Return one question as a dict, or None if it does not exist."""
+    row = db.session.query(*columns).filter(Question.id == question_id).first()
+    if row is None:
+        return None
+    record_rows(1)
+    return question_dict(row)
+
+
+def count_questions(selection):
+    """Count the rows matched by a Question query with a SQL COUNT.
+
+    With ``QUESTION_COUNT_MODE = 'approximate'`` an unfiltered count on
+    PostgreSQL is answered from the planner statistics in ``pg_class``
+    instead of scanning the table.
+    """
+    if (current_app.config.get('QUESTION_COUNT_MODE') == 'approximate'
+            and selection.whereclause is None
+            and db.engine.dialect.name == 'postgresql'):
+        estimate = db.session.execute(text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = 'questions'::regclass"
+        )).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate
+
+    return selection.order_by(None).count()
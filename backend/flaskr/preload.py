@@ -0,0 +1,46 @@
+import gc
+import logging
+import time
+
+from .cache import cached_categories
+from .question_index import get_question_index
+from .search import InvertedIndexSearch, get_search
+
+logger = logging.getLogger(__name__)
+
+
+def preload(app):
+    """Load the read-mostly data into ``app`` before the server forks its workers.
+
+    Fills the category cache, the question index (per-category id lists)
+    and, with ``SEARCH_MODE=memory``, the search index, so every worker
+    starts with them instead of loading its own copy on the first request.
+    The loaded objects are moved out of the garbage collector's reach with
+    ``gc.freeze()``: otherwise the first collection in a worker writes to
+    every object header and copies the shared pages.
+    """
+    started = time.perf_counter()
+    with app.app_context():
+        categories = cached_categories()
+        get_question_index().ids(0)
+        search = get_search()
+        if isinstance(search, InvertedIndexSearch):
+            search.build()
+    gc.collect()
+    gc.freeze()
+    logger.info('Preloaded %s categories and the question index in %.2f s',
+                len(categories), time.perf_counter() - started)
+
+
+def refresh_indexes(app):
+    """Drop the in-process indexes that missed writes of other workers, they reload on next use.
+
+    Runs before every request. Other workers' commits are seen through the
+    cache generations, so this needs a shared ``CACHE_STORE`` with more
+    than one worker process.
+    """
+    cache = app.extensions['cache']
+    app.extensions['question_index'].refresh(cache)
+    search = app.extensions['search']
+    if isinstance(search, InvertedIndexSearch):
+        search.refresh(cache)
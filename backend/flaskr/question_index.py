@@ -0,0 +1,261 @@
+import random
+import threading
+
+from flask import current_app, has_app_context
+from sqlalchemy import select
+from models import Question, listen_for_changes, read_primary
+
+from .cache import TableVersion, get_cache
+
+# How many random draws play_quiz makes before it falls back to filtering
+# the id list. With a history covering a fraction f of the category the
+# expected number of draws is 1 / (1 - f), so this only kicks in near the
+# end of a category.
+REJECTION_ATTEMPTS = 16
+
+# Most questions POST /quizzes/batch hands out in one call
+QUIZ_BATCH_MAX = 50
+
+
+class IdSet:
+    """List of ids with O(1) add, discard and uniform random choice."""
+
+    def __init__(self, ids=()):
+        self.items = []
+        self.positions = {}
+        for question_id in ids:
+            self.add(question_id)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, question_id):
+        return question_id in self.positions
+
+    def add(self, question_id):
+        if question_id not in self.positions:
+            self.positions[question_id] = len(self.items)
+            self.items.append(question_id)
+
+    def discard(self, question_id):
+        position = self.positions.pop(question_id, None)
+        if position is None:
+            return
+        last = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last
+            self.positions[last] = position
+
+    def choice_excluding(self, excluded):
+        """Pick a uniformly random id that is not in the set ``excluded``."""
+        items = self.items
+        if not items:
+            return None
+        for _ in range(REJECTION_ATTEMPTS):
+            question_id = random.choice(items)
+            if question_id not in excluded:
+                return question_id
+        remaining = [question_id for question_id in items if question_id not in excluded]
+        return random.choice(remaining) if remaining else None
+
+    def sample_excluding(self, excluded, count):
+        """Up to ``count`` distinct random ids, none of them in ``excluded``."""
+        items = self.items
+        seen = set(excluded)
+        picked = []
+        for _ in range(REJECTION_ATTEMPTS * count):
+            if len(picked) == count or not items:
+                return picked
+            question_id = random.choice(items)
+            if question_id not in seen:
+                seen.add(question_id)
+                picked.append(question_id)
+        remaining = [question_id for question_id in items if question_id not in seen]
+        return picked + random.sample(remaining, min(count - len(picked), len(remaining)))
+
+
+def quiz_category_id(quiz_category):
+    """The category id of a quiz request's ``quiz_category`` as an int, None if it is missing or malformed.
+
+    The frontend sends ids as strings (they are the keys of its categories
+    object), the index is keyed by int.
+    """
+    if not isinstance(quiz_category, dict) or isinstance(quiz_category.get('id'), bool):
+        return None
+    try:
+        return int(quiz_category['id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def is_id_list(value):
+    """True if ``value`` is a list of ids, ints but not bools, like a quiz request's ``previous_questions``."""
+    return isinstance(value, list) and all(type(item) is int for item in value)
+
+
+# Adaptive play: the next difficulty follows the share of correct answers
+# among the last ADAPTIVE_WINDOW answers the client reports.
+ADAPTIVE_WINDOW = 4
+STEP_UP_SHARE = 0.75
+STEP_DOWN_SHARE = 0.25
+DEFAULT_DIFFICULTY = 1
+
+
+def target_difficulty(current, recent_answers):
+    """Difficulty of the next question for a player at ``current``.
+
+    ``recent_answers`` are booleans, oldest first. Mostly right moves one
+    level up, mostly wrong one level down, anything else stays.
+    """
+    window = recent_answers[-ADAPTIVE_WINDOW:]
+    if not window:
+        return current
+    share = sum(1 for correct in window if correct) / len(window)
+    if share >= STEP_UP_SHARE:
+        return current + 1
+    if share <= STEP_DOWN_SHARE:
+        return max(current - 1, DEFAULT_DIFFICULTY)
+    return current
+
+
+class IndexData:
+    """Id sets per category and per (category, difficulty) bucket."""
+
+    def __init__(self):
+        self.categories = {0: IdSet()}
+        self.buckets = {}
+        self.difficulties = {}
+        self.rows = {}
+
+    def add(self, question_id, category_id, difficulty):
+        self.rows[question_id] = (category_id, difficulty)
+        for key in (0, category_id):
+            self.categories.setdefault(key, IdSet()).add(question_id)
+            self.buckets.setdefault((key, difficulty), IdSet()).add(question_id)
+            self.difficulties.setdefault(key, set()).add(difficulty)
+
+    def discard(self, question_id):
+        row = self.rows.pop(question_id, None)
+        if row is None:
+            return
+        category_id, difficulty = row
+        for key in (0, category_id):
+            self.categories[key].discard(question_id)
+            self.buckets[(key, difficulty)].discard(question_id)
+
+
+class QuestionIndex:
+    """In-memory question ids per category and difficulty, kept current by model commits.
+
+    The index is built lazily with a single ``SELECT id, category,
+    difficulty`` and afterwards maintained incrementally from the change
+    notifications in ``models``. Category ``0`` holds every question
+    ("All" in the quiz). Writes of other worker processes are not seen
+    here; ``refresh`` drops the index once they moved the cache generation
+    of the questions table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = TableVersion(Question.__tablename__)
+
+    @property
+    def is_loaded(self):
+        return self._data is not None
+
+    def load(self, rows):
+        """Replace the index with ``(id, category, difficulty)`` rows."""
+        data = IndexData()
+        for question_id, category_id, difficulty in rows:
+            data.add(question_id, category_id, difficulty)
+        with self._lock:
+            self._data = data
+
+    def _loaded(self):
+        data = self._data
+        if data is None:
+            with self._lock:
+                if self._data is None:
+                    self._version.loading(get_cache())
+                    self._data = IndexData()
+                    for question_id, category_id, difficulty in read_primary(
+                            select(Question.id, Question.category, Question.difficulty)):
+                        self._data.add(question_id, category_id, difficulty)
+                data = self._data
+        return data
+
+    def refresh(self, cache):
+        """Drop the index if another worker changed the questions since it was loaded."""
+        with self._lock:
+            if self._data is not None and self._version.is_stale(cache):
+                self._data = None
+
+    def ids(self, category_id):
+        return self._loaded().categories.get(category_id) or IdSet()
+
+    def random_unseen(self, category_id, previous_questions):
+        return self.ids(category_id).choice_excluding(set(previous_questions))
+
+    def random_unseen_batch(self, category_id, previous_questions, count):
+        return self.ids(category_id).sample_excluding(previous_questions, count)
+
+    def adaptive_unseen(self, category_id, previous_questions, recent_answers):
+        """Pick an unseen question at the difficulty the recent answers call for.
+
+        The player's current level is the difficulty of the last question
+        in ``previous_questions``. If the target bucket is used up, the
+        nearest difficulty with unseen questions is served instead, easier
+        before harder.
+        """
+        data = self._loaded()
+        excluded = set(previous_questions)
+        last = data.rows.get(previous_questions[-1]) if previous_questions else None
+        current = last[1] if last is not None else DEFAULT_DIFFICULTY
+        target = target_difficulty(current, recent_answers)
+
+        difficulties = sorted(data.difficulties.get(category_id, ()),
+                              key=lambda difficulty: (abs(difficulty - target), difficulty))
+        for difficulty in difficulties:
+            question_id = data.buckets[(category_id, difficulty)].choice_excluding(excluded)
+            if question_id is not None:
+                return question_id
+        return None
+
+    def next_question(self, category_id, previous_questions, recent_answers=None):
+        """Adaptive pick when the client reports ``recent_answers``, random otherwise."""
+        if recent_answers is None:
+            return self.random_unseen(category_id, previous_questions)
+        return self.adaptive_unseen(category_id, previous_questions, recent_answers)
+
+    def apply(self, changes):
+        with self._lock:
+            data = self._data
+            if data is None:
+                return
+            # The cache listener runs first and bumped the generation for this commit
+            touched = False
+            for tablename, op, row in changes:
+                if tablename != Question.__tablename__:
+                    continue
+                if op == 'bulk':
+                    self._data = None
+                    return
+                touched = True
+                data.discard(row['id'])
+                if op != 'delete':
+                    data.add(row['id'], row['category'], row['difficulty'])
+            if touched:
+                self._version.applied()
+
+
+def get_question_index():
+    return current_app.extensions['question_index']
+
+
+@listen_for_changes
+def _update_question_index(changes):
+    if has_app_context():
+        index = current_app.extensions.get('question_index')
+        if index is not None:
+            index.apply(changes)
@@ -0,0 +1,38 @@
+import random
+import secrets
+
+# Questions dealt into a session deck. A round in the frontend has 5
+# questions, so this keeps the start cost bounded even for "All".
+DECK_SIZE = 100
+SESSION_TTL = 60 * 60
+
+
+class QuizSessions:
+    """Server-side quiz sessions holding a pre-shuffled deck of question ids.
+
+    Starting a session samples the deck once from the question index;
+    every ``next_question_id`` call pops a single id from the backend, so
+    its cost does not depend on how many questions were already played.
+    """
+
+    def __init__(self, backend, deck_size=DECK_SIZE, ttl=SESSION_TTL):
+        self.backend = backend
+        self.deck_size = deck_size
+        self.ttl = ttl
+
+    def start(self, category_id, ids):
+        token = secrets.token_urlsafe(16)
+        deck = random.sample(ids.items, min(len(ids), self.deck_size))
+        self.backend.set(f'quiz:{token}', {'category': category_id, 'total': len(deck)}, self.ttl)
+        self.backend.push(f'quiz:{token}:deck', deck, self.ttl)
+        return token, len(deck)
+
+    def get(self, token):
+        return self.backend.get(f'quiz:{token}')
+
+    def next_question_id(self, token):
+        return self.backend.pop(f'quiz:{token}:deck')
+
+    def end(self, token):
+        self.backend.delete(f'quiz:{token}')
+        self.backend.delete(f'quiz:{token}:deck')
@@ -0,0 +1,409 @@
+"""Live quiz rooms: one question sequence, pushed to every participant.
+
+A host creates a room for a category. The questions are picked from the
+question index and loaded with one query when the room is created, so
+nothing a participant does reaches the database. Players join, open the
+event stream (server-sent events) and answer; every step of the host
+(question, results, end) is one broadcast: the event is encoded once and
+the same bytes are appended to the buffer of each connection.
+
+Buffers are bounded. A connection with ``max_buffer`` events waiting is
+dropped instead of holding the room back or growing without limit; its
+client reconnects and catches up from the ``state`` event every stream
+starts with.
+
+Rooms live in the memory of the process that created them, all requests
+of a room have to reach that process (one worker, or routing by room code).
+
+A WSGI event stream holds a server thread for as long as it is open, so
+``max_wsgi_streams`` caps how many a process serves at once and leaves the
+other threads to regular requests. The ASGI mode streams without threads
+and is not capped.
+"""
+import secrets
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+from .answers import ANSWER_MAX_EDITS, check_answer, normalize_answer
+from .encoding import get_encoder
+
+ROOM_QUESTIONS = 10
+ROOM_QUESTIONS_MAX = 50
+ROOM_MAX_PLAYERS = 10000
+ROOM_BUFFER_SIZE = 16
+ROOM_TTL = 2 * 60 * 60
+ROOM_KEEPALIVE = 15.0
+# Event streams served by WSGI threads at once, 0 for no limit
+ROOM_WSGI_STREAMS = 0
+MAX_ROOMS = 1000
+LEADERBOARD_LIMIT = 10
+
+
+class RoomError(Exception):
+    """A room action that does not fit the room's state, answered with a 409."""
+
+
+def sse_event(event, data, event_id, dumps):
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (event_id, event.encode(), dumps(data))
+
+
+#----------------------------------------------------------------
+# Subscribers
+#----------------------------------------------------------------
+
+class Subscriber:
+    """One event stream: a bounded buffer of encoded events.
+
+    ``wake(subscriber)`` is called after every push, from the thread that
+    broadcasts; the stream then sends what ``take`` returns.
+    """
+
+    def __init__(self, wake, max_buffer=ROOM_BUFFER_SIZE):
+        self.wake = wake
+        self.max_buffer = max_buffer
+        self.buffer = deque()
+        self.dropped = False
+        self.finished = False
+
+    @property
+    def closed(self):
+        return self.dropped or self.finished
+
+    def push(self, chunk):
+        """Append ``chunk``, returns False once the buffer overflowed and the subscriber is dropped."""
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped = True
+        else:
+            self.buffer.append(chunk)
+        self.wake(self)
+        return not self.dropped
+
+    def finish(self):
+        self.finished = True
+        self.wake(self)
+
+    def take(self):
+        chunks = []
+        while self.buffer:
+            chunks.append(self.buffer.popleft())
+        return b''.join(chunks)
+
+
+class LoopWakeup:
+    """Wakes the stream tasks of one event loop from any thread.
+
+    Pushing one event to thousands of subscribers schedules a single
+    callback on the loop, which then sets each subscriber's event, instead
+    of one ``call_soon_threadsafe`` (and one self-pipe write) per subscriber.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.lock = threading.Lock()
+        self.pending = []
+        self.scheduled = False
+
+    def waker(self, event):
+        return lambda subscriber: self.wake(event)
+
+    def wake(self, event):
+        with self.lock:
+            self.pending.append(event)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.loop.call_soon_threadsafe(self.flush)
+
+    def flush(self):
+        with self.lock:
+            events, self.pending, self.scheduled = self.pending, [], False
+        for event in events:
+            event.set()
+
+
+#----------------------------------------------------------------
+# Rooms
+#----------------------------------------------------------------
+
+class OpenQuestions:
+    """Ids of the questions open in a room of this process.
+
+    ``POST /quizzes/answers`` withholds the answer to a wrong guess for
+    these, or a player could look it up before answering in the room.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, question_id):
+        with self.lock:
+            self.counts[question_id] = self.counts.get(question_id, 0) + 1
+
+    def discard(self, question_id):
+        with self.lock:
+            if self.counts.get(question_id, 0) > 1:
+                self.counts[question_id] -= 1
+            else:
+                self.counts.pop(question_id, None)
+
+    def __contains__(self, question_id):
+        return question_id in self.counts
+
+
+class Room:
+    """State of one live quiz: ``waiting``, ``question``, ``results`` and ``finished``.
+
+    The host calls ``advance`` to go from one state to the next; each
+    transition is broadcast to all subscribers. All methods hold the room's
+    lock, so the order of events is the same on every connection.
+    """
+
+    def __init__(self, code, category_id, questions, host_token, dumps,
+                 max_players=ROOM_MAX_PLAYERS, max_buffer=ROOM_BUFFER_SIZE, max_edits=ANSWER_MAX_EDITS,
+                 open_questions=None):
+        self.code = code
+        self.category_id = category_id
+        self.questions = questions
+        self.normalized_answers = [normalize_answer(question['answer']) for question in questions]
+        self.host_token = host_token
+        self.dumps = dumps
+        self.max_players = max_players
+        self.max_buffer = max_buffer
+        self.max_edits = max_edits
+        self.open_questions = open_questions if open_questions is not None else OpenQuestions()
+        self.lock = threading.Lock()
+        self.state = 'waiting'
+        self.index = -1
+        self.players = {}
+        self.answers = {}
+        self.subscribers = set()
+        self.sequence = 0
+        self.touched = time.monotonic()
+        self.counters = {'broadcasts': 0, 'deliveries': 0, 'dropped': 0}
+
+    def public_question(self):
+        """The current question without its answer or id, the id would let players look the answer up."""
+        question = self.questions[self.index]
+        return {
+            'index': self.index,
+            'total_questions': len(self.questions),
+            'question': {key: question[key] for key in ('question', 'category', 'difficulty')},
+        }
+
+    def leaderboard(self, limit=LEADERBOARD_LIMIT):
+        ranked = sorted(self.players.values(), key=lambda player: (-player['score'], player['joined']))
+        return [{'rank': rank, 'player': player['name'], 'score': player['score']}
+                for rank, player in enumerate(ranked[:limit], 1)]
+
+    def snapshot(self):
+        with self.lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            'code': self.code,
+            'category': self.category_id,
+            'state': self.state,
+            'players': len(self.players),
+            'subscribers': len(self.subscribers),
+            'total_questions': len(self.questions),
+            'current': self.public_question() if self.state == 'question' else None,
+            'leaderboard': self.leaderboard(),
+        }
+
+    def join(self, name):
+        """Add a player, returns their token."""
+        with self.lock:
+            if self.state == 'finished':
+                raise RoomError('Room is finished')
+            if len(self.players) >= self.max_players:
+                raise RoomError('Room is full')
+            token = secrets.token_urlsafe(16)
+            self.players[token] = {'name': name, 'score': 0, 'joined': len(self.players)}
+            self.touched = time.monotonic()
+            return token
+
+    def answer(self, player_token, answer):
+        """Record the player's answer to the open question, the first one counts."""
+        with self.lock:
+            if player_token not in self.players:
+                return False
+            if self.state != 'question':
+                raise RoomError('No question open')
+            if player_token in self.answers:
+                raise RoomError('Already answered')
+            self.answers[player_token] = answer
+            return True
+
+    def advance(self):
+        """Close the open question or open the next one; returns the new state."""
+        with self.lock:
+            if self.state == 'question':
+                expected = self.questions[self.index]['answer']
+                normalized = self.normalized_answers[self.index]
+                correct = 0
+                for token, answer in self.answers.items():
+                    if check_answer(answer, normalized, self.max_edits):
+                        self.players[token]['score'] += 1
+                        correct += 1
+                self.open_questions.discard(self.questions[self.index]['id'])
+                self.state = 'results'
+                self._broadcast('results', {
+                    'index': self.index,
+                    'answer': expected,
+                    'answered': len(self.answers),
+                    'correct': correct,
+                    'leaderboard': self.leaderboard(),
+                })
+            elif self.state in ('waiting', 'results') and self.index + 1 < len(self.questions):
+                self.index += 1
+                self.answers = {}
+                self.open_questions.add(self.questions[self.index]['id'])
+                self.state = 'question'
+                self._broadcast('question', self.public_question())
+            elif self.state != 'finished':
+                self.state = 'finished'
+                self._broadcast('finished', {'leaderboard': self.leaderboard()})
+                for subscriber in self.subscribers:
+                    subscriber.finish()
+                self.subscribers.clear()
+            self.touched = time.monotonic()
+            return self.state
+
+    def _broadcast(self, event, data):
+        self.sequence += 1
+        chunk = sse_event(event, data, self.sequence, self.dumps)
+        dropped = [subscriber for subscriber in self.subscribers if not subscriber.push(chunk)]
+        self.subscribers.difference_update(dropped)
+        self.counters['broadcasts'] += 1
+        self.counters['deliveries'] += len(self.subscribers)
+        self.counters['dropped'] += len(dropped)
+
+    def subscribe(self, wake):
+        """A new subscriber, starting with a ``state`` event of the room as it is now."""
+        subscriber = Subscriber(wake, self.max_buffer)
+        with self.lock:
+            subscriber.push(sse_event('state', self._snapshot(), self.sequence, self.dumps))
+            if self.state == 'finished':
+                subscriber.finish()
+            else:
+                self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def close(self):
+        with self.lock:
+            if self.state == 'question':
+                self.open_questions.discard(self.questions[self.index]['id'])
+            self.state = 'finished'
+            for subscriber in self.subscribers:
+                subscriber.finish()
+            self.subscribers.clear()
+
+
+class Rooms:
+    """The rooms of this process, by code. Rooms idle for ``ttl`` seconds are removed."""
+
+    def __init__(self, max_rooms=MAX_ROOMS, ttl=ROOM_TTL, max_players=ROOM_MAX_PLAYERS,
+                 max_buffer=ROOM_BUFFER_SIZE, keepalive=ROOM_KEEPALIVE, max_edits=ANSWER_MAX_EDITS, dumps=None,
+                 max_wsgi_streams=ROOM_WSGI_STREAMS):
+        self.max_rooms = max_rooms
+        self.ttl = ttl
+        self.max_players = max_players
+        self.max_buffer = max_buffer
+        self.keepalive = keepalive
+        self.max_edits = max_edits
+        self.dumps = dumps or get_encoder()
+        self.max_wsgi_streams = max_wsgi_streams
+        self.open_questions = OpenQuestions()
+        self.rooms = {}
+        self.lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.wsgi_streams = 0
+        self.refused_streams = 0
+
+    def create(self, category_id, questions):
+        """A new room over ``questions`` (dicts with answers), or None when ``max_rooms`` are open."""
+        self.expire()
+        with self.lock:
+            if len(self.rooms) >= self.max_rooms:
+                return None
+            code = secrets.token_urlsafe(6)
+            room = self.rooms[code] = Room(code, category_id, questions, secrets.token_urlsafe(16), self.dumps,
+                                           self.max_players, self.max_buffer, self.max_edits, self.open_questions)
+            self.created += 1
+            return room
+
+    def get(self, code):
+        room = self.rooms.get(code)
+        if room is not None and time.monotonic() - room.touched > self.ttl:
+            self.expire()
+            return None
+        return room
+
+    def expire(self):
+        now = time.monotonic()
+        with self.lock:
+            stale = [code for code, room in self.rooms.items() if now - room.touched > self.ttl]
+            for code in stale:
+                self.rooms.pop(code).close()
+            self.expired += len(stale)
+
+    def open_wsgi_stream(self):
+        """Take a slot for a WSGI event stream, False when ``max_wsgi_streams`` are open."""
+        with self.lock:
+            if self.max_wsgi_streams and self.wsgi_streams >= self.max_wsgi_streams:
+                self.refused_streams += 1
+                return False
+            self.wsgi_streams += 1
+            return True
+
+    def close_wsgi_stream(self):
+        with self.lock:
+            self.wsgi_streams -= 1
+
+    def stats(self):
+        with self.lock:
+            rooms = list(self.rooms.values())
+        return {
+            'rooms': len(rooms),
+            'created': self.created,
+            'expired': self.expired,
+            'subscribers': sum(len(room.subscribers) for room in rooms),
+            'wsgi_streams': self.wsgi_streams,
+            'refused_streams': self.refused_streams,
+            'broadcasts': sum(room.counters['broadcasts'] for room in rooms),
+            'deliveries': sum(room.counters['deliveries'] for room in rooms),
+            'dropped': sum(room.counters['dropped'] for room in rooms),
+        }
+
+
+def event_stream(room, keepalive=ROOM_KEEPALIVE):
+    """Server-sent events of ``room`` for a WSGI response, holding one thread per connection."""
+    ready = threading.Event()
+    subscriber = room.subscribe(lambda subscriber: ready.set())
+    try:
+        while True:
+            woke = ready.wait(keepalive)
+            ready.clear()
+            chunk = subscriber.take()
+            if chunk:
+                yield chunk
+            elif not woke:
+                yield b': keepalive\n\n'
+            if subscriber.closed and not subscriber.buffer:
+                return
+    finally:
+        room.unsubscribe(subscriber)
+
+
+def get_rooms():
+    return current_app.extensions['rooms']
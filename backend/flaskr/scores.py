@@ -0,0 +1,234 @@
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+from sqlalchemy import func, insert, select
+from models import Score, db
+
+logger = logging.getLogger(__name__)
+
+SCORE_BUFFER_SIZE = 10000
+SCORE_BATCH_SIZE = 500
+SCORE_FLUSH_INTERVAL = 1.0
+SCORE_SUBMIT_TIMEOUT = 0.05
+SCORE_FLUSH_ATTEMPTS = 3
+# scores.score is a 32-bit INTEGER
+SCORE_MAX = 2 ** 31 - 1
+LEADERBOARD_SIZE = 100
+
+
+class ScoreBufferFull(Exception):
+    """Raised when the write buffer stays full for longer than the submit timeout."""
+
+
+#----------------------------------------------------------------
+# Leaderboard
+#----------------------------------------------------------------
+
+class Leaderboard:
+    """Top ``size`` scores per category as sorted lists.
+
+    Entries are ``(-score, created_at, player)`` so the natural sort order
+    is best first, earlier games winning ties. Adding an entry is a binary
+    search plus an insert into a list of at most ``size`` items.
+    """
+
+    def __init__(self, size=LEADERBOARD_SIZE):
+        self.size = size
+        self.categories = {}
+
+    def add(self, category_id, player, score, created_at):
+        """Add a score, returns its 1-based rank or None if it did not make the board."""
+        entries = self.categories.setdefault(category_id, [])
+        entry = (-score, created_at, player)
+        if len(entries) >= self.size and entry >= entries[-1]:
+            return None
+        position = bisect.bisect_right(entries, entry)
+        entries.insert(position, entry)
+        del entries[self.size:]
+        return position + 1
+
+    def top(self, category_id, limit):
+        return [{'rank': rank, 'player': player, 'score': -score}
+                for rank, (score, created_at, player) in enumerate(self.categories.get(category_id, [])[:limit], 1)]
+
+
+#----------------------------------------------------------------
+# Score Pipeline
+#----------------------------------------------------------------
+
+class ScorePipeline:
+    """Accepts scores into a bounded buffer and writes them in batches.
+
+    ``submit`` only appends to an in-memory queue and updates the
+    leaderboard; a background thread inserts the queued scores with one
+    multi-row INSERT per batch once ``batch_size`` are pending or every
+    ``flush_interval`` seconds. When ``max_pending`` scores are queued,
+    ``submit`` waits up to ``submit_timeout`` seconds for the flush to make
+    room and then raises ScoreBufferFull. A batch that failed to write
+    ``flush_attempts`` times in a row is logged and dropped, so one bad
+    batch can't hold up every score queued behind it.
+
+    The leaderboard is loaded with one windowed query on first use and
+    afterwards kept current in memory. Every ``refresh_interval`` seconds
+    the flush thread reloads it so scores written by other workers show up.
+    """
+
+    def __init__(self, app, max_pending=SCORE_BUFFER_SIZE, batch_size=SCORE_BATCH_SIZE,
+                 flush_interval=SCORE_FLUSH_INTERVAL, submit_timeout=SCORE_SUBMIT_TIMEOUT,
+                 leaderboard_size=LEADERBOARD_SIZE, refresh_interval=60.0, flush_attempts=SCORE_FLUSH_ATTEMPTS):
+        self.app = app
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self.leaderboard_size = leaderboard_size
+        self.refresh_interval = refresh_interval
+        self.flush_attempts = flush_attempts
+        self.counters = {'accepted': 0, 'rejected': 0, 'flushed': 0, 'flush_errors': 0, 'dropped': 0}
+        # Failed attempts of the batch at the front of the queue
+        self._failures = 0
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._leaderboard = None
+        self._loaded_at = 0.0
+        self._worker = None
+        self._stopping = False
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    #----------------------------------------------------------------
+    # Leaderboard
+    #----------------------------------------------------------------
+
+    def _load(self):
+        ranked = select(
+            Score.player, Score.category, Score.score, Score.created_at,
+            func.row_number().over(partition_by=Score.category,
+                                   order_by=(Score.score.desc(), Score.created_at)).label('rank'),
+        ).subquery()
+        leaderboard = Leaderboard(self.leaderboard_size)
+        for row in db.session.execute(select(ranked).where(ranked.c.rank <= self.leaderboard_size)):
+            leaderboard.add(row.category, row.player, row.score, row.created_at)
+        return leaderboard
+
+    def _loaded(self):
+        """Leaderboard, loaded on first use. Call with ``_condition`` held."""
+        if self._leaderboard is None:
+            with self.app.app_context():
+                self._leaderboard = self._load()
+            for entry in self._pending:
+                self._leaderboard.add(entry['category'], entry['player'], entry['score'], entry['created_at'])
+            self._loaded_at = time.monotonic()
+        return self._leaderboard
+
+    def top(self, category_id, limit):
+        with self._condition:
+            return self._loaded().top(category_id, limit)
+
+    #----------------------------------------------------------------
+    # Writes
+    #----------------------------------------------------------------
+
+    def submit(self, player, category_id, score):
+        """Queue a score, returns ``(entry, rank)``; rank is None below the board."""
+        self._start()
+        with self._condition:
+            deadline = time.monotonic() + self.submit_timeout
+            while len(self._pending) >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters['rejected'] += 1
+                    raise ScoreBufferFull()
+                self._condition.notify_all()
+                self._condition.wait(remaining)
+
+            entry = {'player': player, 'category': category_id, 'score': score, 'created_at': time.time()}
+            rank = self._loaded().add(category_id, player, score, entry['created_at'])
+            self._pending.append(entry)
+            self.counters['accepted'] += 1
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify_all()
+        return entry, rank
+
+    def flush(self):
+        """Write everything queued so far, returns the number of scores written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._condition:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                    self._condition.notify_all()
+                if not batch:
+                    return written
+                try:
+                    with self.app.app_context():
+                        db.session.execute(insert(Score), batch)
+                        db.session.commit()
+                except Exception:
+                    with self._condition:
+                        self.counters['flush_errors'] += 1
+                        self._failures += 1
+                        if self._failures < self.flush_attempts:
+                            logger.exception('Writing %s scores failed, retrying with the next flush', len(batch))
+                            self._pending.extendleft(reversed(batch))
+                            return written
+                        logger.exception('Writing %s scores failed %s times, dropping them: %r',
+                                         len(batch), self._failures, batch)
+                        self.counters['dropped'] += len(batch)
+                        self._failures = 0
+                    continue
+                written += len(batch)
+                with self._condition:
+                    self.counters['flushed'] += len(batch)
+                    self._failures = 0
+
+    def _refresh(self):
+        """Reload the leaderboard, it then includes other workers' scores."""
+        with self._flush_lock, self._condition:
+            self._leaderboard = None
+            self._loaded()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+            if self._leaderboard is not None and time.monotonic() - self._loaded_at >= self.refresh_interval:
+                try:
+                    self._refresh()
+                except Exception:
+                    logger.exception('Reloading the leaderboard failed')
+
+    def _start(self):
+        if self._worker is None:
+            with self._condition:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='score-flush', daemon=True)
+                    self._worker.start()
+
+    def stop(self):
+        """Stop the flush thread after writing what is still queued."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+
+    def stats(self):
+        with self._condition:
+            return dict(self.counters, pending=len(self._pending))
+
+
+def get_scores():
+    return current_app.extensions['scores']
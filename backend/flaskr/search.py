@@ -0,0 +1,233 @@
+import bisect
+import re
+import threading
+
+from flask import current_app, has_app_context
+from sqlalchemy import DDL, event, false, func, literal_column, or_, select
+from models import Question, db, listen_for_changes, read_primary
+
+from .cache import TableVersion, get_cache
+from .pagination import paginate_ids, paginate_questions, count_questions
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Field bits stored per posting
+IN_QUESTION = 1
+IN_ANSWER = 2
+
+# Weighted tsvector over question (A) and answer (B), backed by a GIN index
+# on PostgreSQL. The expression must match the index definition exactly.
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(question, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(answer, '')), 'B')"
+)
+
+event.listen(
+    Question.__table__,
+    'after_create',
+    DDL(f"CREATE INDEX IF NOT EXISTS ix_questions_search ON questions USING gin (({SEARCH_DOCUMENT}))")
+    .execute_if(dialect='postgresql'),
+)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+#----------------------------------------------------------------
+# Search Modes
+#----------------------------------------------------------------
+
+class LikeSearch:
+    """Substring search with ILIKE, a sequential scan on every call."""
+
+    ranked = False
+
+    def criteria(self, term, include_answers=False):
+        """WHERE clause and ORDER BY for ``term``, shared with the async app."""
+        pattern = f"%{term}%"
+        condition = Question.question.ilike(pattern)
+        if include_answers:
+            condition = or_(condition, Question.answer.ilike(pattern))
+        return condition, (Question.id,)
+
+    def search(self, request, term, include_answers=False):
+        condition, order_by = self.criteria(term, include_answers)
+        selection = Question.query.filter(condition)
+        if self.ranked:
+            questions = paginate_questions(request, selection.order_by(*order_by), ranked=True)
+        else:
+            questions = paginate_questions(request, selection)
+        return questions, count_questions(selection)
+
+
+class FullTextSearch(LikeSearch):
+    """PostgreSQL full-text search on the GIN-indexed ``SEARCH_DOCUMENT``.
+
+    Every search word is matched as a prefix, results are ordered by
+    ``ts_rank`` and paginated in SQL.
+    """
+
+    ranked = True
+
+    def criteria(self, term, include_answers=False):
+        words = tokenize(term)
+        if not words:
+            return false(), (Question.id,)
+
+        weight = '' if include_answers else 'A'
+        query = func.to_tsquery('simple', ' & '.join(f"{word}:*{weight}" for word in words))
+        document = literal_column(f"({SEARCH_DOCUMENT})")
+        return document.op('@@')(query), (func.ts_rank(document, query).desc(), Question.id)
+
+
+class InvertedIndexSearch:
+    """In-process token index for SQLite and test deployments.
+
+    Maps every token of question and answer to the ids containing it. Search
+    words are matched as token prefixes via a sorted vocabulary, the same
+    semantics as ``FullTextSearch``. The index is built on first use and
+    then maintained from the commit notifications of ``models``; like the
+    question index it is dropped by ``refresh`` after writes of other
+    workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._vocabulary = []
+        self._documents = {}
+        self._version = TableVersion(Question.__tablename__)
+
+    @property
+    def is_built(self):
+        return self._postings is not None
+
+    def _add(self, row):
+        tokens = {}
+        for field, text in ((IN_QUESTION, row['question']), (IN_ANSWER, row['answer'])):
+            for token in tokenize(text):
+                tokens[token] = tokens.get(token, 0) | field
+        for token, fields in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            postings[row['id']] = fields
+        self._documents[row['id']] = tuple(tokens)
+
+    def _remove(self, question_id):
+        for token in self._documents.pop(question_id, ()):
+            postings = self._postings[token]
+            postings.pop(question_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _build(self):
+        self._version.loading(get_cache())
+        self._postings = {}
+        self._vocabulary = []
+        self._documents = {}
+        rows = read_primary(select(Question.id, Question.question, Question.answer))
+        for question_id, question, answer in rows:
+            self._add({'id': question_id, 'question': question, 'answer': answer})
+
+    def build(self):
+        """Build the index now instead of on the first search."""
+        with self._lock:
+            if self._postings is None:
+                self._build()
+
+    def refresh(self, cache):
+        with self._lock:
+            if self._postings is not None and self._version.is_stale(cache):
+                self._postings = None
+
+    def _matches(self, word):
+        """Ids whose tokens start with ``word``, mapped to the fields they match in."""
+        matches = {}
+        start = bisect.bisect_left(self._vocabulary, word)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(word):
+                break
+            for question_id, fields in self._postings[token].items():
+                matches[question_id] = matches.get(question_id, 0) | fields
+        return matches
+
+    def ranked_ids(self, term, include_answers=False):
+        words = tokenize(term)
+        if not words:
+            return []
+
+        with self._lock:
+            if self._postings is None:
+                self._build()
+            scores = None
+            for word in sorted(set(words), key=len, reverse=True):
+                matches = self._matches(word)
+                if not include_answers:
+                    matches = {i: f for i, f in matches.items() if f & IN_QUESTION}
+                if scores is None:
+                    scores = dict.fromkeys(matches, 0)
+                for question_id in list(scores):
+                    fields = matches.get(question_id)
+                    if fields is None:
+                        del scores[question_id]
+                    else:
+                        scores[question_id] += 2 if fields & IN_QUESTION else 1
+
+        return sorted(scores, key=lambda question_id: (-scores[question_id], question_id))
+
+    def search(self, request, term, include_answers=False):
+        ids = self.ranked_ids(term, include_answers)
+        return paginate_ids(request, ids), len(ids)
+
+    def apply(self, changes):
+        with self._lock:
+            if self._postings is None:
+                return
+            touched = False
+            for tablename, op, row in changes:
+                if tablename != Question.__tablename__:
+                    continue
+                if op == 'bulk':
+                    self._postings = None
+                    return
+                touched = True
+                self._remove(row['id'])
+                if op != 'delete':
+                    self._add(row)
+            if touched:
+                self._version.applied()
+
+
+SEARCH_MODES = {
+    'like': LikeSearch,
+    'fulltext': FullTextSearch,
+    'memory': InvertedIndexSearch,
+}
+
+
+def create_search(app, mode=None):
+    """Pick the search mode from ``SEARCH_MODE``, ``'auto'`` by default.
+
+    ``auto`` uses full-text search on PostgreSQL and the in-process index
+    everywhere else.
+    """
+    mode = mode or app.config.get('SEARCH_MODE', 'auto')
+    if mode == 'auto':
+        mode = 'fulltext' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres') else 'memory'
+    return SEARCH_MODES[mode]()
+
+
+def get_search():
+    return current_app.extensions['search']
+
+
+@listen_for_changes
+def _update_search_index(changes):
+    if has_app_context():
+        search = current_app.extensions.get('search')
+        if isinstance(search, InvertedIndexSearch):
+            search.apply(changes)
@@ -0,0 +1,67 @@
+"""Gunicorn settings for production.
+
+    gunicorn -c gunicorn.conf.py
+
+The app is imported and preloaded once in the master (``wsgi.py``), then
+forked into one worker per available CPU. Workers share the preloaded
+data copy-on-write.
+
+Each worker keeps its own question and search index. They see the writes
+of other workers through the cache generations, so more than one worker
+needs a shared ``CACHE_STORE`` (``redis://...``); with the default
+``memory://`` store there is a single worker. Environment variables:
+
+- ``WEB_CONCURRENCY``: number of workers, default the CPUs this process may run on
+  (1 without a shared ``CACHE_STORE``)
+- ``GUNICORN_THREADS``: threads per worker, default 8
+- ``ROOM_WSGI_STREAMS``: room event streams per worker, default half the threads
+- ``PORT``: port to listen on, default 5000
+- ``PRELOAD_APP``: ``0`` loads the app in every worker instead (slower start, no sharing)
+
+Workers are ``gthread`` workers. A room event stream (``GET /rooms/<code>/events``)
+holds one thread until the client leaves; the worker's main loop keeps
+reporting to the master meanwhile, so ``timeout`` does not kill it. Streams
+beyond ``ROOM_WSGI_STREAMS`` are refused with a 503, the remaining threads
+serve regular requests. For many players use the ASGI mode instead.
+"""
+import os
+
+
+def shared_cache_store():
+    return not (os.environ.get('CACHE_STORE') or 'memory://').startswith('memory://')
+
+
+def cpu_count():
+    """CPUs available to this process, respecting affinity masks set by containers."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+wsgi_app = 'wsgi:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', cpu_count() if shared_cache_store() else 1))
+if workers > 1 and not shared_cache_store():
+    raise RuntimeError(f'WEB_CONCURRENCY={workers} needs a shared CACHE_STORE (redis://...), '
+                       'otherwise workers keep serving questions other workers changed or deleted')
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# Read by create_app() when the app is loaded, after this file
+os.environ.setdefault('ROOM_WSGI_STREAMS', str(max(threads // 2, 1)))
+preload_app = os.environ.get('PRELOAD_APP', '1').lower() not in ('0', 'false', 'no')
+accesslog = None
+
+
+def post_fork(server, worker):
+    # The pool was filled in the master while preloading; a worker must not
+    # use the master's connections, so it drops them without closing them.
+    if server.cfg.preload_app:
+        from models import db
+        from wsgi import app
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    worker.log.info('Worker ready (pid: %s)', worker.pid)
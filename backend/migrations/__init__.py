@@ -0,0 +1,129 @@
+"""Versioned schema migrations.
+
+Every module in ``migrations/versions`` is one revision: an integer
+``revision`` plus ``upgrade(connection)`` and ``downgrade(connection)``.
+The revision a database is at is kept in the ``schema_version`` table.
+Each revision runs in its own transaction, so a failed migration leaves
+the database at the previous revision.
+
+    flask --app flaskr db upgrade             # to the newest revision
+    flask --app flaskr db downgrade --revision 1
+    flask --app flaskr db current
+"""
+import importlib
+import logging
+import pkgutil
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import Column, Integer, MetaData, Table, select, text
+
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+# Serializes migrations of several workers starting at once (PostgreSQL)
+MIGRATION_LOCK_ID = 7261
+
+version_table = Table('schema_version', MetaData(), Column('version', Integer, nullable=False))
+
+
+def load_migrations():
+    """All revisions, oldest first."""
+    migrations = [importlib.import_module(f'{versions.__name__}.{module.name}')
+                  for module in pkgutil.iter_modules(versions.__path__)]
+    migrations.sort(key=lambda migration: migration.revision)
+    if [migration.revision for migration in migrations] != list(range(1, len(migrations) + 1)):
+        raise RuntimeError('Migration revisions must be numbered 1, 2, 3, ... without gaps')
+    return migrations
+
+
+def head_revision():
+    return len(load_migrations())
+
+
+def _lock(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+
+
+def current_revision(connection):
+    version_table.create(connection, checkfirst=True)
+    return connection.execute(select(version_table.c.version)).scalar() or 0
+
+
+def _set_revision(connection, revision):
+    connection.execute(version_table.delete())
+    connection.execute(version_table.insert().values(version=revision))
+
+
+def upgrade(engine, target=None):
+    """Apply the revisions above the current one, up to ``target`` (default: newest).
+
+    Returns the revisions applied.
+    """
+    applied = []
+    for migration in load_migrations():
+        if target is not None and migration.revision > target:
+            break
+        with engine.begin() as connection:
+            _lock(connection)
+            if migration.revision <= current_revision(connection):
+                continue
+            logger.info('Upgrading schema to revision %s: %s', migration.revision, migration.__doc__.strip())
+            migration.upgrade(connection)
+            _set_revision(connection, migration.revision)
+        applied.append(migration.revision)
+    return applied
+
+
+def downgrade(engine, target):
+    """Revert the revisions above ``target``, newest first. Returns the revisions reverted."""
+    reverted = []
+    for migration in reversed(load_migrations()):
+        if migration.revision <= target:
+            break
+        with engine.begin() as connection:
+            _lock(connection)
+            if migration.revision > current_revision(connection):
+                continue
+            logger.info('Downgrading schema from revision %s: %s', migration.revision, migration.__doc__.strip())
+            migration.downgrade(connection)
+            _set_revision(connection, migration.revision - 1)
+        reverted.append(migration.revision)
+    return reverted
+
+
+#----------------------------------------------------------------
+# flask db ...
+#----------------------------------------------------------------
+
+db_cli = AppGroup('db', help='Manage the database schema.')
+
+
+def _engine():
+    return current_app.extensions['sqlalchemy'].engine
+
+
+@db_cli.command('upgrade')
+@click.option('--revision', type=int, default=None, help='Target revision, the newest by default.')
+def upgrade_command(revision):
+    """Upgrade the schema."""
+    applied = upgrade(_engine(), revision)
+    click.echo(f"Applied revisions {', '.join(map(str, applied))}" if applied else 'Schema is up to date')
+
+
+@db_cli.command('downgrade')
+@click.option('--revision', type=int, required=True, help='Target revision, 0 drops everything.')
+def downgrade_command(revision):
+    """Downgrade the schema."""
+    reverted = downgrade(_engine(), revision)
+    click.echo(f"Reverted revisions {', '.join(map(str, reverted))}" if reverted else 'Nothing to downgrade')
+
+
+@db_cli.command('current')
+def current_command():
+    """Show the revision of the database."""
+    with _engine().begin() as connection:
+        click.echo(f'{current_revision(connection)} (newest: {head_revision()})')
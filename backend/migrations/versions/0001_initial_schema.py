@@ -0,0 +1,30 @@
+"""Initial schema: categories and questions."""
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table
+
+revision = 1
+
+metadata = MetaData()
+
+categories = Table(
+    'categories', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('type', String, nullable=False),
+)
+
+questions = Table(
+    'questions', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('question', String, nullable=False),
+    Column('answer', String, nullable=False),
+    Column('category', Integer, ForeignKey('categories.id'), nullable=False),
+    Column('difficulty', Integer, nullable=False),
+)
+
+
+def upgrade(connection):
+    # Databases restored from trivia.psql already have both tables
+    metadata.create_all(connection, checkfirst=True)
+
+
+def downgrade(connection):
+    metadata.drop_all(connection, checkfirst=True)
@@ -0,0 +1,26 @@
+"""Indexes for category listings, difficulty buckets and full-text search."""
+from sqlalchemy import text
+
+revision = 2
+
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(question, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(answer, '')), 'B')"
+)
+
+
+def upgrade(connection):
+    # (category, id) serves the category filter and its ORDER BY id paging
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_questions_category ON questions (category, id)'))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_questions_category_difficulty ON questions (category, difficulty)'))
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            f'CREATE INDEX IF NOT EXISTS ix_questions_search ON questions USING gin (({SEARCH_DOCUMENT}))'))
+        connection.execute(text('ANALYZE questions'))
+
+
+def downgrade(connection):
+    connection.execute(text('DROP INDEX IF EXISTS ix_questions_search'))
+    connection.execute(text('DROP INDEX IF EXISTS ix_questions_category_difficulty'))
+    connection.execute(text('DROP INDEX IF EXISTS ix_questions_category'))
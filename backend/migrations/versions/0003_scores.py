@@ -0,0 +1,24 @@
+"""Scores table for the leaderboard."""
+from sqlalchemy import Column, Float, Index, Integer, MetaData, String, Table
+
+revision = 3
+
+metadata = MetaData()
+
+scores = Table(
+    'scores', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('player', String, nullable=False),
+    Column('category', Integer, nullable=False),
+    Column('score', Integer, nullable=False),
+    Column('created_at', Float, nullable=False),
+    Index('ix_scores_category_score', 'category', 'score'),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
+
+
+def downgrade(connection):
+    metadata.drop_all(connection, checkfirst=True)
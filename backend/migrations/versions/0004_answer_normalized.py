@@ -0,0 +1,32 @@
+"""Normalized answers for server-side answer checking."""
+from sqlalchemy import bindparam, column, select, table, text
+
+revision = 4
+
+BATCH_SIZE = 5000
+
+questions = table('questions', column('id'), column('answer'), column('answer_normalized'))
+
+
+def upgrade(connection):
+    # The normalization is code, not SQL: fill the column from Python, in batches
+    from flaskr.answers import normalize_answer
+
+    connection.execute(text('ALTER TABLE questions ADD COLUMN answer_normalized VARCHAR'))
+    update = questions.update().where(questions.c.id == bindparam('question_id')).values(
+        answer_normalized=bindparam('normalized'))
+    last_id = None
+    while True:
+        selection = select(questions.c.id, questions.c.answer).order_by(questions.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            selection = selection.where(questions.c.id > last_id)
+        rows = connection.execute(selection).all()
+        if not rows:
+            break
+        connection.execute(update, [{'question_id': question_id, 'normalized': normalize_answer(answer)}
+                                    for question_id, answer in rows])
+        last_id = rows[-1].id
+
+
+def downgrade(connection):
+    connection.execute(text('ALTER TABLE questions DROP COLUMN answer_normalized'))
@@ -1,30 +1,534 @@
+import functools
+import itertools
+import logging
+import math
 import os
-from sqlalchemy import Column, ForeignKey, String, Integer
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import Column, Float, ForeignKey, Index, String, Integer, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
 from flask_sqlalchemy import SQLAlchemy
-from dotenv import load_dotenv
+from flask_sqlalchemy.session import Session
 
-load_dotenv()
+from migrations import upgrade
 
-database_name = os.environ.get('DB_NAME')
-database_user = os.environ.get('DB_USER')
-database_password = os.environ.get('DB_PASSWORD')
-database_host = os.environ.get('DB_HOST')
-database_port = os.environ.get('DB_PORT')
-database_path = f'postgresql://{database_user}:{database_password}@{database_host}/{database_name}'
 
-db = SQLAlchemy()
+def database_url():
+    """``DATABASE_URL``, or the URL built from the ``DB_*`` variables.
+
+    Read on first use, together with ``.env``, instead of when this module
+    is imported.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    if os.environ.get('DATABASE_URL'):
+        return os.environ['DATABASE_URL']
+    database_name = os.environ.get('DB_NAME')
+    database_user = os.environ.get('DB_USER')
+    database_password = os.environ.get('DB_PASSWORD')
+    database_host = os.environ.get('DB_HOST')
+    return f'postgresql://{database_user}:{database_password}@{database_host}/{database_name}'
+
+
+class LazyEngines(dict):
+    """An app's engines by bind key, each created when it is first used.
+
+    Creating an engine imports the dialect and the database driver, a good
+    part of a cold start; requests that never reach the database should not
+    wait for it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.factories = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def on_create(self, listener):
+        """Call ``listener(engine)`` for every engine, as soon as it is created."""
+        with self.lock:
+            self.listeners.append(listener)
+            engines = list(self.values())
+        for engine in engines:
+            listener(engine)
+
+    def __setitem__(self, key, value):
+        if isinstance(value, Engine):
+            super().__setitem__(key, value)
+        else:
+            self.factories[key] = value
+
+    def __missing__(self, key):
+        factory = self.factories[key]
+        with self.lock:
+            if not super().__contains__(key):
+                engine = factory()
+                for listener in self.listeners:
+                    listener(engine)
+                super().__setitem__(key, engine)
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        return key in self.factories or super().__contains__(key)
+
+
+class LazySQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy with engines created on first use instead of in ``init_app``."""
+
+    def init_app(self, app):
+        self._app_engines[app] = LazyEngines()
+        super().init_app(app)
+
+    def _make_engine(self, bind_key, options, app):
+        return functools.partial(super()._make_engine, bind_key, options, app)
+
+    def on_engine_created(self, app, listener):
+        """Call ``listener(engine)`` for each of ``app``'s engines once it exists."""
+        self._app_engines[app].on_create(listener)
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of read-only requests to a replica, see ``ReplicaRouter``."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase) and has_request_context():
+            router = current_app.extensions.get('replicas')
+            engine = router.engine_for_request(self._db.engines) if router is not None else None
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = LazySQLAlchemy(session_options={'class_': RoutingSession})
+logger = logging.getLogger(__name__)
 
 ###----------------------------------------------------------------------------
 ###  Setup Database
 ###----------------------------------------------------------------------------
 
-def setup_db(app, database_path=database_path):
+def setup_db(app, database_path=None):
+    """Bind ``db`` to ``app``.
+
+    The database is ``database_path``, else ``SQLALCHEMY_DATABASE_URI``
+    from the app config (e.g. ``create_app``'s test_config), else
+    ``database_url()``.
+    """
+    database_path = database_path or app.config.get('SQLALCHEMY_DATABASE_URI') or database_url()
     app.config['SQLALCHEMY_DATABASE_URI'] = database_path
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in app.config:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app, database_path)
+    replica_urls = app.config.get('DATABASE_REPLICA_URLS', os.environ.get('DATABASE_REPLICA_URLS'))
+    if replica_urls:
+        setup_replicas(app, replica_urls)
     db.app = app
     db.init_app(app)
-    with app.app_context():  
-        db.create_all()
+    # Off by default: DDL at boot slows every cold start, run `flask db upgrade` instead
+    auto_migrate = app.config.get('AUTO_MIGRATE', os.environ.get('AUTO_MIGRATE', ''))
+    if auto_migrate is True or str(auto_migrate).lower() in ('1', 'true', 'yes'):
+        with app.app_context():
+            upgrade(db.engine)
+
+
+###----------------------------------------------------------------------------
+###  Connection Pool
+###----------------------------------------------------------------------------
+
+# Every value can be set in the app config (e.g. via test_config) or as an
+# environment variable of the same name.
+POOL_DEFAULTS = {
+    'DB_POOL_SIZE': 10,
+    'DB_MAX_OVERFLOW': 20,
+    'DB_POOL_TIMEOUT': 5.0,
+    'DB_POOL_RECYCLE': 1800,
+    'DB_POOL_PRE_PING': True,
+    'DB_STATEMENT_TIMEOUT': 10000,
+}
+
+
+def pool_setting(app, key):
+    value = app.config.get(key, os.environ.get(key))
+    default = POOL_DEFAULTS[key]
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'yes')
+    return type(default)(value)
+
+
+class PoolStats:
+    """Counters for connection checkouts, filled in by InstrumentedQueuePool."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait and how often they time out."""
+
+    stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self.stats.lock:
+                self.stats.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self.stats.lock:
+                self.stats.checkouts += 1
+                self.stats.wait_time_total += waited
+                self.stats.wait_time_max = max(self.stats.wait_time_max, waited)
+
+
+def engine_options(app, database_path, stats=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured pool.
+
+    In-memory SQLite keeps Flask-SQLAlchemy's single shared connection. On
+    PostgreSQL every connection gets ``DB_STATEMENT_TIMEOUT`` (ms) so a
+    runaway query is cancelled instead of pinning a pooled connection.
+    Checkouts are counted in ``stats``, by default the app's ``pool_stats``.
+    """
+    if database_path in ('sqlite://', 'sqlite:///') or ':memory:' in database_path:
+        return {}
+
+    if stats is None:
+        stats = app.extensions['pool_stats'] = PoolStats()
+    options = {
+        'poolclass': type('InstrumentedQueuePool', (InstrumentedQueuePool,), {'stats': stats}),
+        'pool_size': pool_setting(app, 'DB_POOL_SIZE'),
+        'max_overflow': pool_setting(app, 'DB_MAX_OVERFLOW'),
+        'pool_timeout': pool_setting(app, 'DB_POOL_TIMEOUT'),
+        'pool_recycle': pool_setting(app, 'DB_POOL_RECYCLE'),
+        'pool_pre_ping': pool_setting(app, 'DB_POOL_PRE_PING'),
+    }
+    if database_path.startswith('postgres'):
+        options['connect_args'] = {'options': f"-c statement_timeout={pool_setting(app, 'DB_STATEMENT_TIMEOUT')}"}
+    return options
+
+
+def pool_status(app):
+    """Live pool metrics for the health endpoint."""
+    pool = db.engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool_setting(app, 'DB_MAX_OVERFLOW'),
+        })
+        status['saturated'] = status['checked_out'] >= status['size'] + status['max_overflow']
+    stats = app.extensions.get('pool_stats')
+    if stats is not None:
+        with stats.lock:
+            status.update({
+                'checkouts': stats.checkouts,
+                'timeouts': stats.timeouts,
+                'wait_time_avg_ms': stats.wait_time_total / stats.checkouts * 1000 if stats.checkouts else 0.0,
+                'wait_time_max_ms': stats.wait_time_max * 1000,
+            })
+    router = app.extensions.get('replicas')
+    if router is not None:
+        status['replicas'] = router.status()
+    return status
+
+
+###----------------------------------------------------------------------------
+###  Read Replicas
+###----------------------------------------------------------------------------
+
+REPLICA_SELECTION = 'round-robin'
+REPLICA_STICKY_SECONDS = 5.0
+REPLICA_HEALTH_INTERVAL = 5.0
+STICKY_COOKIE = 'trivia_primary_until'
+
+
+class Replica:
+
+    def __init__(self, bind_key, url, stats):
+        self.bind_key = bind_key
+        self.url = url
+        self.stats = stats
+        self.healthy = True
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+
+class ReplicaRouter:
+    """Sends the reads of read-only requests to a healthy replica.
+
+    GET and HEAD requests are read-only, and POST requests to a URL rule in
+    ``read_routes``. Each of them gets one replica, in turn (``round-robin``)
+    or the one with the fewest requests in flight (``least-loaded``), for
+    all of its queries. Writes and every other request use the primary.
+
+    After a request committed a write, the client gets a cookie that keeps
+    its reads on the primary for ``sticky_seconds``, so it sees its own
+    writes however far the replicas lag behind. A background thread pings
+    the replicas every ``health_interval`` seconds; a replica that fails a
+    ping or a request is skipped until it answers again. Without a healthy
+    replica, reads go to the primary.
+    """
+
+    def __init__(self, app, replicas, selection=REPLICA_SELECTION, sticky_seconds=REPLICA_STICKY_SECONDS,
+                 health_interval=REPLICA_HEALTH_INTERVAL, read_routes=()):
+        if selection not in ('round-robin', 'least-loaded'):
+            raise ValueError(f'Unknown REPLICA_SELECTION {selection!r}')
+        self.app = app
+        self.replicas = replicas
+        self.selection = selection
+        self.sticky_seconds = sticky_seconds
+        self.health_interval = health_interval
+        self.read_routes = set(read_routes)
+        self.counters = {'replica_reads': 0, 'primary_reads': 0, 'sticky_reads': 0}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._checker = None
+        self._stopping = False
+
+    def init_app(self, app):
+        app.after_request(self._set_sticky_cookie)
+        app.teardown_request(self._release)
+
+    def read_only(self):
+        if request.method in ('GET', 'HEAD'):
+            return True
+        return request.url_rule is not None and request.url_rule.rule in self.read_routes
+
+    def sticky(self):
+        """True while the client's last write is younger than ``sticky_seconds``."""
+        try:
+            return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def engine_for_request(self, engines):
+        """The replica engine of the current request, or None for the primary."""
+        if 'replica' not in g:
+            g.replica = None
+            if self.read_only():
+                if self.sticky():
+                    self._count('sticky_reads')
+                else:
+                    g.replica = self.pick()
+                    self._count('replica_reads' if g.replica is not None else 'primary_reads')
+        return engines[g.replica.bind_key] if g.replica is not None else None
+
+    def pick(self):
+        self._start()
+        with self._lock:
+            healthy = [replica for replica in self.replicas if replica.healthy]
+            if not healthy:
+                return None
+            if self.selection == 'least-loaded':
+                replica = min(healthy, key=lambda replica: replica.in_flight)
+            else:
+                replica = healthy[next(self._turn) % len(healthy)]
+            replica.in_flight += 1
+            replica.requests += 1
+            return replica
+
+    def read_from_replica(self):
+        """True if the current request's queries went to a replica."""
+        return has_request_context() and g.get('replica') is not None
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _release(self, exc):
+        replica = g.pop('replica', None)
+        if replica is None:
+            return
+        with self._lock:
+            replica.in_flight -= 1
+        if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+            self.mark(replica, False, exc)
+
+    def _set_sticky_cookie(self, response):
+        if g.get('db_wrote') and self.sticky_seconds > 0:
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + self.sticky_seconds:.3f}',
+                                max_age=math.ceil(self.sticky_seconds), httponly=True, samesite='Lax')
+        return response
+
+    #----------------------------------------------------------------
+    # Health Checks
+    #----------------------------------------------------------------
+
+    def mark(self, replica, healthy, error=None):
+        with self._lock:
+            changed = replica.healthy != healthy
+            replica.healthy = healthy
+            if not healthy:
+                replica.failures += 1
+        if changed and healthy:
+            logger.info('Replica %s is back', replica.bind_key)
+        elif changed:
+            logger.warning('Replica %s is unavailable: %s', replica.bind_key, error)
+
+    def check(self):
+        """Ping every replica once and update its health."""
+        with self.app.app_context():
+            for replica in self.replicas:
+                try:
+                    with db.engines[replica.bind_key].connect() as connection:
+                        connection.exec_driver_sql('SELECT 1')
+                except Exception as error:
+                    self.mark(replica, False, error)
+                else:
+                    self.mark(replica, True)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                self._condition.wait(self.health_interval)
+                if self._stopping:
+                    return
+            self.check()
+
+    def _start(self):
+        if self._checker is None and self.health_interval:
+            with self._condition:
+                if self._checker is None:
+                    self._checker = threading.Thread(target=self._run, name='replica-health', daemon=True)
+                    self._checker.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._checker is not None:
+            self._checker.join()
+
+    def status(self):
+        with self._lock:
+            return {
+                'selection': self.selection,
+                **self.counters,
+                'nodes': [{
+                    'name': replica.bind_key,
+                    'healthy': replica.healthy,
+                    'in_flight': replica.in_flight,
+                    'requests': replica.requests,
+                    'failures': replica.failures,
+                } for replica in self.replicas],
+            }
+
+
+def setup_replicas(app, urls):
+    """Register the replicas in ``urls`` (a list or comma-separated) as binds and route reads to them.
+
+    ``REPLICA_SELECTION``, ``REPLICA_STICKY_SECONDS``, ``REPLICA_HEALTH_INTERVAL``
+    and ``REPLICA_READ_ROUTES`` come from the app config or the environment.
+    """
+    if isinstance(urls, str):
+        urls = [url.strip() for url in urls.split(',') if url.strip()]
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    replicas = []
+    for number, url in enumerate(urls, 1):
+        replica = Replica(f'replica{number}', url, PoolStats())
+        binds[replica.bind_key] = {'url': url, **engine_options(app, url, replica.stats)}
+        replicas.append(replica)
+
+    def setting(key, default):
+        return type(default)(app.config.get(key, os.environ.get(key, default)))
+
+    read_routes = app.config.get('REPLICA_READ_ROUTES', os.environ.get('REPLICA_READ_ROUTES', ()))
+    if isinstance(read_routes, str):
+        read_routes = [rule.strip() for rule in read_routes.split(',') if rule.strip()]
+    router = app.extensions['replicas'] = ReplicaRouter(
+        app, replicas, setting('REPLICA_SELECTION', REPLICA_SELECTION),
+        setting('REPLICA_STICKY_SECONDS', REPLICA_STICKY_SECONDS),
+        setting('REPLICA_HEALTH_INTERVAL', REPLICA_HEALTH_INTERVAL), read_routes)
+    router.init_app(app)
+    return router
+
+
+def read_primary(statement):
+    """Execute ``statement`` on the primary, also inside a read-only request.
+
+    For data kept beyond the request, like the in-process indexes: built
+    from a lagging replica they would miss writes that the cache generation
+    they record already counts.
+    """
+    return db.session.execute(statement, bind_arguments={'bind': db.engine})
+
+
+###----------------------------------------------------------------------------
+###  Change Notifications
+###----------------------------------------------------------------------------
+
+_change_listeners = []
+
+
+def listen_for_changes(listener):
+    """Register ``listener(changes)`` to run after every successful commit.
+
+    ``changes`` is a list of ``(tablename, op, row)`` tuples. ``op`` is
+    ``'insert'``, ``'update'`` or ``'delete'`` and ``row`` the ``format()``
+    dict of the affected instance. Bulk statements that bypass the unit of
+    work (``Query.delete()``, ``insert(Question)`` with a list of rows, ...)
+    are reported as ``(tablename, 'bulk', None)``.
+    """
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+    return listener
+
+
+def _pending_changes(session):
+    return session.info.setdefault('pending_changes', [])
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_flushed_changes(session, flush_context):
+    pending = _pending_changes(session)
+    for op, instances in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for instance in instances:
+            if isinstance(instance, (Question, Category)):
+                pending.append((instance.__tablename__, op, instance.format()))
+
+
+def record_bulk_change(session, tablename):
+    """Report a write done outside the ORM (raw SQL, COPY) to the listeners."""
+    _pending_changes(session).append((tablename, 'bulk', None))
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _collect_bulk_changes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        record_bulk_change(orm_execute_state.session, orm_execute_state.statement.table.name)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _notify_changes(session):
+    changes = session.info.pop('pending_changes', None)
+    if changes:
+        if has_request_context():
+            # Read-your-writes: this client's next reads go to the primary
+            g.db_wrote = True
+        for listener in _change_listeners:
+            listener(changes)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('pending_changes', None)
 
 
 ###----------------------------------------------------------------------------
@@ -33,12 +537,19 @@ def setup_db(app, database_path=database_path):
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    # Keep in sync with migrations/versions/0002_question_indexes.py
+    __table_args__ = (
+        Index('ix_questions_category', 'category', 'id'),
+        Index('ix_questions_category_difficulty', 'category', 'difficulty'),
+    )
 
     id = Column(Integer, primary_key=True)
     question = Column(String, nullable=False)
     answer = Column(String, nullable=False)
     category = Column(Integer, ForeignKey('categories.id'), nullable=False)
     difficulty = Column(Integer, nullable=False)
+    # Kept up to date by flaskr.answers on insert and update, see migrations/versions/0004_answer_normalized.py
+    answer_normalized = Column(String, nullable=True)
 
     def __init__(self, question, answer, category, difficulty):
         self.question = question
@@ -66,6 +577,18 @@ class Question(db.Model):
             'difficulty': self.difficulty
         }
 
+
+# Columns of Question.format(): selecting them yields plain row tuples, which
+# skips the identity map and attribute instrumentation of full ORM objects
+QUESTION_COLUMNS = (Question.id, Question.question, Question.answer, Question.category, Question.difficulty)
+# The same without the answer, for quiz play: answers are checked server-side
+QUIZ_COLUMNS = (Question.id, Question.question, Question.category, Question.difficulty)
+
+
+def question_dict(row):
+    """Same dict as Question.format() for a row of QUESTION_COLUMNS."""
+    return dict(row._mapping)
+
 ###----------------------------------------------------------------------------
 ###  Category odel
 ###----------------------------------------------------------------------------
@@ -84,3 +607,31 @@ class Category(db.Model):
             'id': self.id,
             'type': self.type
         }
+
+
+###----------------------------------------------------------------------------
+###  Score Model
+###----------------------------------------------------------------------------
+
+class Score(db.Model):
+    """A finished quiz game. ``category`` 0 is a game over all categories."""
+    __tablename__ = 'scores'
+    # Keep in sync with migrations/versions/0003_scores.py
+    __table_args__ = (
+        Index('ix_scores_category_score', 'category', 'score'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    player = Column(String, nullable=False)
+    category = Column(Integer, nullable=False)
+    score = Column(Integer, nullable=False)
+    created_at = Column(Float, nullable=False)
+
+    def format(self):
+        return {
+            'id': self.id,
+            'player': self.player,
+            'category': self.category,
+            'score': self.score,
+            'created_at': self.created_at
+        }
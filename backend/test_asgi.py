@@ -0,0 +1,195 @@
+import asyncio
+import json
+import unittest
+from json import dumps
+from urllib.parse import urlsplit
+
+from werkzeug.datastructures import Headers
+
+import test_flaskr
+from flaskr.asgi import NATIVE_BODY_MAX, create_asgi_app
+from models import Category
+
+
+class AsgiResponse:
+
+    def __init__(self, status_code, headers, data):
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+        self.mimetype = headers.get('content-type', '').split(';')[0]
+
+
+class AsgiTestClient:
+    """Synchronous client for an ASGI app with the API of Flask's test client.
+
+    Keeps one event loop for all requests, the async engine's connections
+    are bound to it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+
+    def scope(self, method, url, headers):
+        url = urlsplit(url)
+        return {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': url.path,
+            'root_path': '',
+            'query_string': url.query.encode(),
+            'headers': headers,
+            'server': ('localhost', 80),
+            'client': ('127.0.0.1', 50000),
+        }
+
+    def open(self, method, url, json=None, data=None, content_type=None, headers=None, chunk_size=None):
+        if json is not None:
+            data = dumps(json)
+            content_type = 'application/json'
+        if isinstance(data, str):
+            data = data.encode()
+        headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+        if content_type:
+            headers.append((b'content-type', content_type.encode()))
+        scope = self.scope(method, url, headers)
+        data = data or b''
+        # Mit chunk_size kommt der Body in mehreren Nachrichten, wie bei einem Upload
+        step = chunk_size or len(data) or 1
+        chunks = [data[offset:offset + step] for offset in range(0, len(data), step)] or [b'']
+        messages = [{'type': 'http.request', 'body': chunk, 'more_body': True} for chunk in chunks]
+        messages[-1]['more_body'] = False
+        self.unread = messages
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        self.loop.run_until_complete(self.app(scope, receive, send))
+        start = sent[0]
+        headers = Headers([(name.decode(), value.decode()) for name, value in start['headers']])
+        return AsgiResponse(start['status'], headers, b''.join(message.get('body', b'') for message in sent[1:]))
+
+    def get(self, url, **kwargs):
+        return self.open('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.open('POST', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.open('DELETE', url, **kwargs)
+
+    def close(self):
+        self.loop.run_until_complete(self.app.engine.dispose())
+        self.loop.close()
+
+
+class AsgiTriviaTestCase(test_flaskr.TriviaTestCase):
+    """Fuehrt alle Endpunkt-Tests gegen den ASGI-Modus aus."""
+
+    # Die async Engine hat eigene Verbindungen und saehe die Testtransaktion nicht
+    TRANSACTIONAL = False
+
+    def setUp(self):
+        super().setUp()
+        self.client = AsgiTestClient(create_asgi_app(flask_app=self.app))
+
+    def tearDown(self):
+        self.client.close()
+        super().tearDown()
+
+    def open_stream(self, url):
+        """Startet einen Stream als Task auf der Schleife des Clients, bis disconnect gesetzt wird."""
+        sent, disconnect, requested = [], asyncio.Event(), []
+
+        async def receive():
+            if not requested:
+                requested.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        task = self.client.loop.create_task(self.client.app(self.client.scope('GET', url, []), receive, send))
+        self.client.loop.run_until_complete(asyncio.sleep(0.01))
+        return task, sent, disconnect
+
+    def finish_stream(self, task):
+        self.client.loop.run_until_complete(asyncio.wait_for(task, 5))
+
+    def test_room_event_stream(self):
+        code, host_token, _ = self.start_room(questions=1)
+        task, sent, disconnect = self.open_stream(f'/rooms/{code}/events')
+        for state in ('question', 'results', 'finished'):
+            self.assertEqual(self.advance_room(code, host_token)['state'], state)
+        self.finish_stream(task)
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        events = self.parse_events(b''.join(message.get('body', b'') for message in sent[1:]))
+        self.assertEqual([event for event, data in events], ['state', 'question', 'results', 'finished'])
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    def test_room_limits_wsgi_streams(self):
+        # Der native Stream belegt keinen Thread und faellt nicht unter die Grenze
+        self.app.extensions['rooms'].max_wsgi_streams = 1
+        code, host_token, _ = self.start_room()
+        streams = [self.open_stream(f'/rooms/{code}/events') for _ in range(3)]
+        for task, sent, disconnect in streams:
+            self.assertEqual(sent[0]['status'], 200)
+            disconnect.set()
+            self.finish_stream(task)
+        self.assertEqual(self.app.extensions['rooms'].stats()['wsgi_streams'], 0)
+
+    def test_room_event_stream_client_leaves(self):
+        code, host_token, _ = self.start_room()
+        task, sent, disconnect = self.open_stream(f'/rooms/{code}/events')
+        self.assertEqual(self.app.extensions['rooms'].stats()['subscribers'], 1)
+        disconnect.set()
+        self.finish_stream(task)
+        self.assertEqual(self.app.extensions['rooms'].stats()['subscribers'], 0)
+        self.assertEqual(self.client.get('/rooms/does-not-exist/events').status_code, 404)
+
+    def test_bulk_import_streams_request_body(self):
+        with self.app.app_context():
+            category_id = Category.query.first().id
+        lines = [json.dumps({"question": f"Streamed question {i}?", "answer": "A", "category": category_id,
+                             "difficulty": 1}) for i in range(200)]
+        res = self.client.post('/questions/bulk?chunk_size=50', data='\n'.join(lines),
+                               content_type='application/x-ndjson', chunk_size=100)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.data)['imported'], 200)
+
+        # Bei einem Fehler in Zeile 2 wird der Rest des Uploads gar nicht erst gelesen
+        body = '\n'.join([lines[0], '{not json'] + lines[1:])
+        res = self.client.post('/questions/bulk', data=body, content_type='application/x-ndjson', chunk_size=100)
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(json.loads(res.data)['line'], 2)
+        self.assertGreater(len(self.client.unread), 100)
+
+    def test_native_routes_limit_body_size(self):
+        res = self.client.post('/questions/search', data=b'{"searchTerm": "' + b'x' * NATIVE_BODY_MAX + b'"}',
+                               content_type='application/json', chunk_size=64 * 1024)
+        self.assertEqual(res.status_code, 413)
+        self.assertFalse(json.loads(res.data)['success'])
+        res = self.client.post('/questions/search', json={"searchTerm": "cat"}, chunk_size=4)
+        self.assertEqual(res.status_code, 200)
+
+    def test_native_routes_do_not_use_flask(self):
+        with self.count_queries() as counts:
+            res = self.client.get('/categories')
+            self.client.get('/questions')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(counts['statements'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
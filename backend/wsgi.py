@@ -0,0 +1,12 @@
+"""Production entry point, see ``gunicorn.conf.py``.
+
+    gunicorn -c gunicorn.conf.py
+
+The schema is not touched here: run ``flask --app flaskr db upgrade`` as a
+deploy step before starting the server.
+"""
+from flaskr import create_app
+from flaskr.preload import preload
+
+app = create_app()
+preload(app)
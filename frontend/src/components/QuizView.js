@@ -14,7 +14,9 @@ class QuizView extends Component {
       categories: {},
       numCorrect: 0,
       currentQuestion: {},
+      upcomingQuestions: [],
       guess: '',
+      result: null,
       forceEnd: false,
     };
   }
@@ -48,27 +50,35 @@ class QuizView extends Component {
       previousQuestions.push(this.state.currentQuestion.id);
     }
 
+    if (previousQuestions.length >= questionsPerPlay) {
+      this.setState({ previousQuestions: previousQuestions });
+      return;
+    }
+
+    // Play from the prefetched round, only go to the server when it is used up
+    if (this.state.upcomingQuestions.length > 0) {
+      const [nextQuestion, ...upcomingQuestions] = this.state.upcomingQuestions;
+      this.showQuestion(previousQuestions, nextQuestion, upcomingQuestions);
+      return;
+    }
+
     $.ajax({
-      url: '/quizzes', //TODO: update request URL
+      url: '/quizzes/batch',
       type: 'POST',
       dataType: 'json',
       contentType: 'application/json',
       data: JSON.stringify({
         previous_questions: previousQuestions,
         quiz_category: this.state.quizCategory,
+        count: questionsPerPlay - previousQuestions.length,
       }),
       xhrFields: {
         withCredentials: true,
       },
       crossDomain: true,
       success: (result) => {
-        this.setState({
-          showAnswer: false,
-          previousQuestions: previousQuestions,
-          currentQuestion: result.question,
-          guess: '',
-          forceEnd: result.question ? false : true,
-        });
+        const [nextQuestion, ...upcomingQuestions] = result.questions;
+        this.showQuestion(previousQuestions, nextQuestion, upcomingQuestions);
         return;
       },
       error: (error) => {
@@ -78,12 +88,52 @@ class QuizView extends Component {
     });
   };
 
+  showQuestion = (previousQuestions, nextQuestion, upcomingQuestions) => {
+    this.setState({
+      showAnswer: false,
+      previousQuestions: previousQuestions,
+      currentQuestion: nextQuestion || {},
+      upcomingQuestions: upcomingQuestions,
+      guess: '',
+      result: null,
+      forceEnd: nextQuestion ? false : true,
+    });
+  };
+
   submitGuess = (event) => {
     event.preventDefault();
-    let evaluate = this.evaluateAnswer();
-    this.setState({
-      numCorrect: !evaluate ? this.state.numCorrect : this.state.numCorrect + 1,
-      showAnswer: true,
+    // The server refuses an empty guess
+    if (!this.state.guess.trim()) {
+      return;
+    }
+    // Questions come without their answer, the server checks the guess
+    $.ajax({
+      url: '/quizzes/answers',
+      type: 'POST',
+      dataType: 'json',
+      contentType: 'application/json',
+      data: JSON.stringify({
+        question_id: this.state.currentQuestion.id,
+        answer: this.state.guess,
+      }),
+      xhrFields: {
+        withCredentials: true,
+      },
+      crossDomain: true,
+      success: (result) => {
+        this.setState({
+          numCorrect: result.correct
+            ? this.state.numCorrect + 1
+            : this.state.numCorrect,
+          result: result,
+          showAnswer: true,
+        });
+        return;
+      },
+      error: (error) => {
+        alert('Unable to check the answer. Please try your request again');
+        return;
+      },
     });
   };
 
@@ -94,7 +144,9 @@ class QuizView extends Component {
       showAnswer: false,
       numCorrect: 0,
       currentQuestion: {},
+      upcomingQuestions: [],
       guess: '',
+      result: null,
       forceEnd: false,
     });
   };
@@ -139,28 +191,17 @@ class QuizView extends Component {
     );
   }
 
-  evaluateAnswer = () => {
-    const formatGuess = this.state.guess
-      // eslint-disable-next-line
-      .replace(/[.,\/#!$%\^&\*;:{}=\-_`~()]/g, '')
-      .toLowerCase();
-    const answerArray = this.state.currentQuestion.answer
-      .toLowerCase()
-      .split(' ');
-    return answerArray.every((el) => formatGuess.includes(el));
-  };
-
   renderCorrectAnswer() {
-    let evaluate = this.evaluateAnswer();
+    const { correct, answer } = this.state.result;
     return (
       <div className='quiz-play-holder'>
         <div className='quiz-question'>
           {this.state.currentQuestion.question}
         </div>
-        <div className={`${evaluate ? 'correct' : 'wrong'}`}>
-          {evaluate ? 'You were correct!' : 'You were incorrect'}
+        <div className={`${correct ? 'correct' : 'wrong'}`}>
+          {correct ? 'You were correct!' : 'You were incorrect'}
         </div>
-        <div className='quiz-answer'>{this.state.currentQuestion.answer}</div>
+        <div className='quiz-answer'>{answer}</div>
         <div className='next-question button' onClick={this.getNextQuestion}>
           {' '}
           Next Question{' '}